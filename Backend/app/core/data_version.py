@@ -0,0 +1,55 @@
+"""
+Per-user data version used to build ETags for read endpoints.
+
+Every write to a user's sessions bumps `user:{id}:version` after the write is
+stored, so a version seen by a reader never predates the data it describes.
+The key lives under the client-side cache's "user:" prefix: with
+REDIS_CLIENT_CACHE_ENABLED a version check is served from worker memory until
+the next bump, otherwise it is a single GET.
+
+A missing key (never written, or expired after DATA_VERSION_TTL_SECONDS) is
+initialised from the Redis clock in microseconds rather than from zero, so a
+recreated version can never repeat one a client still holds.
+"""
+from redis.asyncio import Redis
+
+from app.core.config import settings
+from app.core.redis_Client import redisClient
+from app.core.redis_cache import client_cache
+
+# ARGV[1] = 1 increments an existing version, 0 only creates a missing one.
+VERSION_LUA = """
+local current = redis.call('GET', KEYS[1])
+if current and ARGV[1] == '0' then
+    return current
+end
+if current then
+    current = redis.call('INCR', KEYS[1])
+else
+    local now = redis.call('TIME')
+    current = now[1] .. string.format('%06d', tonumber(now[2]))
+    redis.call('SET', KEYS[1], current)
+end
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return tostring(current)
+"""
+version_script = redisClient.register_script(VERSION_LUA)
+
+
+def version_key(user_id: str) -> str:
+    return f"user:{user_id}:version"
+
+
+async def current_version(user_id: str) -> str:
+    version = await client_cache.get(version_key(user_id))
+    if version is None:
+        version = await version_script(
+            keys=[version_key(user_id)], args=[0, settings.DATA_VERSION_TTL_SECONDS], client=redisClient
+        )
+    return str(version)
+
+
+async def bump_version(user_id: str, redis: Redis | None = None) -> None:
+    await version_script(
+        keys=[version_key(user_id)], args=[1, settings.DATA_VERSION_TTL_SECONDS], client=redis or redisClient
+    )
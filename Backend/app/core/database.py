@@ -2,44 +2,14 @@
 Database connection and session management.
 This file should be in: app/core/database.py
 """
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy.pool import NullPool
-from app.core.config import settings
-from typing import AsyncGenerator
-
-# Create async engine
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    echo=settings.DEBUG,  # Log SQL queries in debug mode
-    future=True,
-    pool_pre_ping=True,  # Verify connections before using them
-)
-
-# Create session factory
-AsyncSessionLocal = async_sessionmaker(
-    engine,
-    class_=AsyncSession,
-    expire_on_commit=False,
-    autocommit=False,
-    autoflush=False,
-)
-
-
-async def get_db() -> AsyncGenerator[AsyncSession, None]:
-    """
-    Dependency that provides a database session.
-    
-    Usage in routes:
-        @router.get("/users")
-        async def get_users(db: AsyncSession = Depends(get_db)):
-            result = await db.execute(select(User))
-            return result.scalars().all()
-    """
-    async with AsyncSessionLocal() as session:
-        try:
-            yield session
-        finally:
-            await session.close()
+from app.db.postgres import AsyncSessionLocal, engine, get_db
+
+# The engine, session factory and get_db dependency live in app.db.postgres so
+# the process has a single connection pool. Usage in routes:
+#     @router.get("/users")
+#     async def get_users(db: AsyncSession = Depends(get_db)):
+#         result = await db.execute(select(User))
+#         return result.scalars().all()
 
 
 async def init_db():
@@ -0,0 +1,122 @@
+"""
+Bounded worker pool for bcrypt hashing and verification.
+
+bcrypt at cost 12 takes hundreds of milliseconds per call, so running it on the
+event loop stalls every other request on the worker. Calls are dispatched to a
+thread or process pool, rejected with 503 when the queue is full and abandoned
+after a per-call timeout. An abandoned call that already started keeps its slot
+until the worker actually finishes it, so the queue bound holds under overload.
+"""
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable
+
+from fastapi import HTTPException, status
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.security import hash_password, verify_password
+
+
+class HashingPool:
+    def __init__(self, kind: str, workers: int, max_queue: int, timeout: float) -> None:
+        self.kind = kind
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self.timeout = timeout
+        self._executor: Executor | None = None
+        self._pending = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._timeouts = 0
+        self._total_seconds = 0.0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        # All bookkeeping happens on the event loop thread, so plain ints are safe.
+        if self._pending >= self.workers + self.max_queue:
+            self._rejected += 1
+            metrics.incr("hashing.rejected")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication is busy, try again shortly",
+            )
+
+        self._pending += 1
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        work = self._get_executor().submit(fn, *args)
+        # Released when the call really ends: a timed-out call still occupies its worker.
+        work.add_done_callback(lambda _: self._release(loop))
+        try:
+            # Cancelling the wrapped future also cancels calls still waiting in the queue.
+            result = await asyncio.wait_for(asyncio.wrap_future(work), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self._timeouts += 1
+            metrics.incr("hashing.timeouts")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication timed out, try again shortly",
+            )
+        except Exception:
+            self._failed += 1
+            raise
+        self._completed += 1
+        self._total_seconds += time.perf_counter() - started
+        return result
+
+    def _release(self, loop: asyncio.AbstractEventLoop) -> None:
+        # Runs on the executor's thread; hand the bookkeeping back to the loop.
+        try:
+            loop.call_soon_threadsafe(self._finish)
+        except RuntimeError:
+            # The loop is already closed (shutdown).
+            pass
+
+    def _finish(self) -> None:
+        self._pending -= 1
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "executor": self.kind,
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "in_flight": min(self._pending, self.workers),
+            "queue_depth": max(0, self._pending - self.workers),
+            "completed": self._completed,
+            "failed": self._failed,
+            "rejected": self._rejected,
+            "timeouts": self._timeouts,
+            "avg_ms": round(self._total_seconds * 1000 / self._completed, 2) if self._completed else 0.0,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+hashing_pool = HashingPool(
+    kind=settings.PASSWORD_HASH_EXECUTOR,
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+    timeout=settings.PASSWORD_HASH_TIMEOUT_SECONDS,
+)
+metrics.register_provider("hashing", hashing_pool.stats)
+
+
+async def hash_password_async(password: str) -> str:
+    return await hashing_pool.run(hash_password, password)
+
+
+async def verify_password_async(password: str, hashed_password: str) -> bool:
+    return await hashing_pool.run(verify_password, password, hashed_password)
@@ -0,0 +1,63 @@
+"""
+Shared outbound HTTP clients.
+
+One httpx.AsyncClient per upstream and worker keeps connections (and TLS
+sessions) alive across requests instead of paying a handshake per call. The
+client is created lazily, so scripts that never call the upstream open
+nothing, and closed by ResourceManager on shutdown. HTTP/2 is used when
+GEMINI_HTTP2 is set and the h2 package is installed.
+"""
+import importlib.util
+
+import httpx
+
+from app.core.config import settings
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+class SharedHttpClient:
+    def __init__(self, base_url: str, limits: httpx.Limits, connect_timeout: float, http2: bool) -> None:
+        self.base_url = base_url
+        self.limits = limits
+        self.connect_timeout = connect_timeout
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self._client: httpx.AsyncClient | None = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                limits=self.limits,
+                # Read/write/pool timeouts are set per request from the caller's deadline.
+                timeout=httpx.Timeout(None, connect=self.connect_timeout),
+                http2=self.http2,
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> dict:
+        return {
+            "base_url": self.base_url,
+            "open": self._client is not None and not self._client.is_closed,
+            "http2": self.http2,
+            "max_connections": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+        }
+
+
+gemini_http = SharedHttpClient(
+    base_url=settings.GEMINI_BASE_URL,
+    limits=httpx.Limits(
+        max_connections=settings.GEMINI_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.GEMINI_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.GEMINI_KEEPALIVE_EXPIRY_SECONDS,
+    ),
+    connect_timeout=settings.GEMINI_CONNECT_TIMEOUT_SECONDS,
+    http2=settings.GEMINI_HTTP2,
+)
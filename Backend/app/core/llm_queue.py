@@ -0,0 +1,183 @@
+"""
+Bounded execution of LLM calls.
+
+Two limits keep a traffic spike from turning into unbounded outbound Gemini
+traffic:
+
+- `llm_slot` is a per-worker semaphore (LLM_MAX_CONCURRENCY) held around
+  every Gemini request, inline or queued.
+- `llm_jobs` is a priority queue in Redis shared by all workers: a sorted set
+  `llm:queue` scored by priority then enqueue time, plus one hash per job
+  (`llm:job:{id}`) holding its status and result. Every worker runs
+  LLM_QUEUE_WORKERS consumers that pop the lowest score and run it, so
+  interactive jobs overtake queued background ones.
+
+Job ids are derived from a caller-supplied key, so enqueueing work that is
+already queued or running returns the existing job (raising its priority if
+needed) instead of adding a duplicate. A consumer claims a popped job with a
+script that checks it is still queued and marks it running in one step; the
+priority bump only touches ids still in the queue (ZADD XX), so an enqueue
+racing a pop can never put the popped job back.
+"""
+import asyncio
+import hashlib
+import statistics
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any
+
+from redis.asyncio import Redis
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.redis_Client import redisClient
+
+INTERACTIVE = 0
+BACKGROUND = 1
+QUEUE_KEY = "llm:queue"
+# Below REDIS_SOCKET_TIMEOUT_SECONDS, so a blocking pop never trips the socket timeout.
+POP_TIMEOUT_SECONDS = 1
+
+# KEYS[1] job hash, KEYS[2] queue; ARGV[1] job id, ARGV[2] score, ARGV[3] ttl seconds,
+# ARGV[4] running jobs started before this are presumed dead, ARGV[5..] field, value, ...
+ENQUEUE_LUA = """
+local status = redis.call('HGET', KEYS[1], 'status')
+local started = tonumber(redis.call('HGET', KEYS[1], 'started_at') or '0')
+if status == 'queued' or (status == 'running' and started > tonumber(ARGV[4])) then
+    if status == 'queued' then
+        redis.call('ZADD', KEYS[2], 'XX', 'LT', ARGV[2], ARGV[1])
+    end
+    return {0, redis.call('ZCARD', KEYS[2])}
+end
+redis.call('DEL', KEYS[1])
+redis.call('HSET', KEYS[1], unpack(ARGV, 5))
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+redis.call('ZADD', KEYS[2], ARGV[2], ARGV[1])
+return {1, redis.call('ZCARD', KEYS[2])}
+"""
+# KEYS[1] job hash; ARGV[1] now. Returns the job's fields, or nothing if it is gone or already claimed.
+CLAIM_LUA = """
+if redis.call('HGET', KEYS[1], 'status') ~= 'queued' then
+    return false
+end
+redis.call('HSET', KEYS[1], 'status', 'running', 'started_at', ARGV[1])
+return redis.call('HGETALL', KEYS[1])
+"""
+enqueue_script = redisClient.register_script(ENQUEUE_LUA)
+claim_script = redisClient.register_script(CLAIM_LUA)
+
+_slots = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY)
+_slots_in_use = 0
+
+
+@asynccontextmanager
+async def llm_slot(timeout: float):
+    """Hold one of this worker's LLM slots; raises asyncio.TimeoutError if none frees up in time."""
+    global _slots_in_use
+    await asyncio.wait_for(_slots.acquire(), timeout)
+    _slots_in_use += 1
+    try:
+        yield
+    finally:
+        _slots_in_use -= 1
+        _slots.release()
+
+
+def slots_exhausted() -> bool:
+    return _slots.locked()
+
+
+class LLMJobQueue:
+    def __init__(self, redis: Redis = redisClient) -> None:
+        self.redis = redis
+        self._depth = 0
+        self._waits_ms: deque[float] = deque(maxlen=512)
+
+    def job_id(self, key: str) -> str:
+        return hashlib.sha1(key.encode()).hexdigest()[:20]
+
+    async def depth(self) -> int:
+        self._depth = await self.redis.zcard(QUEUE_KEY)
+        return self._depth
+
+    async def enqueue(self, key: str, priority: int, **fields: str) -> str:
+        """Queue a job for `key` unless one is already pending; returns the job id."""
+        job_id = self.job_id(key)
+        now = time.time()
+        job = {
+            "key": key,
+            "priority": str(priority),
+            "status": "queued",
+            "enqueued_at": str(now),
+            **fields,
+        }
+        created, self._depth = await enqueue_script(
+            keys=[self._job_key(job_id), QUEUE_KEY],
+            args=[
+                job_id,
+                priority * 10**13 + int(now * 1000),
+                settings.LLM_JOB_TTL_SECONDS,
+                now - settings.AI_SUMMARY_LOCK_TTL_SECONDS * 2,
+                *[item for pair in job.items() for item in pair],
+            ],
+            client=self.redis,
+        )
+        metrics.incr("llm_queue.enqueued" if created else "llm_queue.coalesced")
+        return job_id
+
+    async def get(self, job_id: str) -> dict[str, str] | None:
+        job = await self.redis.hgetall(self._job_key(job_id))
+        return job or None
+
+    async def pop(self) -> tuple[str, dict[str, str]] | None:
+        """Wait briefly for the next job and mark it running."""
+        popped = await self.redis.bzpopmin(QUEUE_KEY, timeout=POP_TIMEOUT_SECONDS)
+        if not popped:
+            return None
+        _, job_id, _ = popped
+        now = time.time()
+        fields = await claim_script(keys=[self._job_key(job_id)], args=[str(now)], client=self.redis)
+        if not fields:
+            # Expired while queued, or claimed by another consumer.
+            return None
+        job = dict(zip(fields[::2], fields[1::2]))
+        wait_ms = (now - float(job["enqueued_at"])) * 1000
+        self._waits_ms.append(wait_ms)
+        metrics.incr("llm_queue.dequeued")
+        return job_id, job
+
+    async def finish(self, job_id: str, status: str, **fields: str) -> None:
+        key = self._job_key(job_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(key, mapping={"status": status, "finished_at": str(time.time()), **fields})
+            pipe.expire(key, settings.LLM_JOB_TTL_SECONDS)
+            await pipe.execute()
+        metrics.incr(f"llm_queue.{status}")
+
+    def stats(self) -> dict:
+        waits = sorted(self._waits_ms)
+        return {
+            "max_concurrency": settings.LLM_MAX_CONCURRENCY,
+            "slots_in_use": _slots_in_use,
+            "queue_depth": self._depth,
+            "defer_depth": settings.LLM_QUEUE_DEFER_DEPTH,
+            "wait_ms_p50": round(statistics.median(waits), 1) if waits else None,
+            "wait_ms_p95": round(waits[int(len(waits) * 0.95) - 1], 1) if len(waits) >= 20 else None,
+        }
+
+    def _job_key(self, job_id: str) -> str:
+        return f"llm:job:{job_id}"
+
+
+def job_status(job_id: str, job: dict[str, Any]) -> dict[str, Any]:
+    return {
+        "job_id": job_id,
+        "status": job["status"],
+        "wait_seconds": round(time.time() - float(job["enqueued_at"]), 1),
+        "poll_after_seconds": settings.LLM_QUEUE_POLL_SECONDS,
+    }
+
+
+llm_jobs = LLMJobQueue()
+metrics.register_provider("llm_queue", llm_jobs.stats)
@@ -0,0 +1,32 @@
+"""
+In-process counters and stats providers.
+Exposed as JSON on GET /metrics, to loopback clients or holders of METRICS_TOKEN.
+"""
+from collections import defaultdict
+from typing import Any, Callable
+
+_counters: dict[str, int] = defaultdict(int)
+_providers: dict[str, Callable[[], dict[str, Any]]] = {}
+
+
+def incr(name: str, value: int = 1) -> None:
+    _counters[name] += value
+
+
+def get(name: str) -> int:
+    return _counters.get(name, 0)
+
+
+def register_provider(name: str, provider: Callable[[], dict[str, Any]]) -> None:
+    """Register a callable whose stats are included in every snapshot."""
+    _providers[name] = provider
+
+
+def snapshot() -> dict[str, Any]:
+    data: dict[str, Any] = {"counters": dict(_counters)}
+    for name, provider in _providers.items():
+        try:
+            data[name] = provider()
+        except Exception as e:
+            data[name] = {"error": str(e)}
+    return data
@@ -0,0 +1,145 @@
+"""
+Two-level cache of authenticated principals keyed by user id.
+
+Level one is a per-worker LRU with a short TTL, level two is Redis shared by
+all workers. Both TTLs are capped at the access token lifetime. Invalidation
+clears the local entry and the Redis entry; other workers' local entries expire
+within PRINCIPAL_CACHE_LOCAL_TTL_SECONDS. Every committed ORM change to a users
+row invalidates that user (see app.db.postgres), so callers need not remember to.
+
+Claims-only access tokens (ACCESS_TOKEN_CLAIMS_ONLY) carry the user's
+generation. A change that makes their claims stale records the new generation
+here, under its own key that invalidation leaves alone, and older tokens are
+rejected until they expire. The recorded generation is read through the same
+two levels, so other workers see it within PRINCIPAL_CACHE_LOCAL_TTL_SECONDS.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.redis_Client import redisClient
+from app.schemas.auth import Principal
+
+
+class PrincipalCache:
+    def __init__(self, max_entries: int, local_ttl: int, redis_ttl: int) -> None:
+        token_ttl = settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+        self.max_entries = max_entries
+        self.token_ttl = token_ttl
+        self.local_ttl = min(local_ttl, token_ttl)
+        self.redis_ttl = min(redis_ttl, token_ttl)
+        self._entries: OrderedDict[str, tuple[float, Principal]] = OrderedDict()
+        self._generations: OrderedDict[str, tuple[float, int]] = OrderedDict()
+        self._tasks: set[asyncio.Task] = set()
+
+    async def get(self, user_id: str) -> Principal | None:
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            expires_at, principal = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(user_id)
+                metrics.incr("principal_cache.local_hits")
+                return principal
+            del self._entries[user_id]
+
+        try:
+            raw = await redisClient.get(self._key(user_id))
+        except Exception:
+            raw = None
+        if raw:
+            principal = Principal.model_validate_json(raw)
+            self._store_local(user_id, principal)
+            metrics.incr("principal_cache.redis_hits")
+            return principal
+
+        metrics.incr("principal_cache.misses")
+        return None
+
+    async def set(self, principal: Principal) -> None:
+        user_id = str(principal.user_id)
+        self._store_local(user_id, principal)
+        try:
+            await redisClient.set(self._key(user_id), principal.model_dump_json(), ex=self.redis_ttl)
+        except Exception:
+            pass
+
+    async def invalidate(self, user_id: str) -> None:
+        self._entries.pop(user_id, None)
+        metrics.incr("principal_cache.invalidations")
+        try:
+            await redisClient.delete(self._key(user_id))
+        except Exception as e:
+            # The update itself succeeded; the Redis copy expires within PRINCIPAL_CACHE_REDIS_TTL_SECONDS.
+            metrics.incr("principal_cache.invalidation_errors")
+            print(f"❌ Principal cache invalidation failed for {user_id}: {e}")
+
+    async def min_generation(self, user_id: str) -> int:
+        """Oldest token generation still accepted for the user; 0 when none was recorded."""
+        entry = self._generations.get(user_id)
+        if entry is not None and entry[0] > time.monotonic():
+            self._generations.move_to_end(user_id)
+            return entry[1]
+        try:
+            raw = await redisClient.get(self._generation_key(user_id))
+        except Exception:
+            # Accept the claims rather than fail every request while Redis is down.
+            return 0
+        generation = int(raw or 0)
+        self._store_generation(user_id, generation)
+        return generation
+
+    async def record_generation(self, user_id: str, generation: int) -> None:
+        """Reject claims-only tokens issued before `generation` for as long as they can live."""
+        self._store_generation(user_id, generation)
+        try:
+            await redisClient.set(self._generation_key(user_id), generation, ex=self.token_ttl)
+        except Exception as e:
+            metrics.incr("principal_cache.generation_errors")
+            print(f"❌ Recording token generation failed for {user_id}: {e}")
+
+    def invalidate_soon(self, user_id: str) -> None:
+        """Invalidate from synchronous code: the local entry now, the Redis entry in a task."""
+        self._entries.pop(user_id, None)
+        try:
+            task = asyncio.get_running_loop().create_task(self.invalidate(user_id))
+        except RuntimeError:
+            # No event loop (a sync script); nothing local to protect either.
+            return
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def stats(self) -> dict:
+        return {
+            "local_entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "local_ttl_seconds": self.local_ttl,
+            "redis_ttl_seconds": self.redis_ttl,
+        }
+
+    def _store_local(self, user_id: str, principal: Principal) -> None:
+        self._entries[user_id] = (time.monotonic() + self.local_ttl, principal)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _store_generation(self, user_id: str, generation: int) -> None:
+        self._generations[user_id] = (time.monotonic() + self.local_ttl, generation)
+        self._generations.move_to_end(user_id)
+        while len(self._generations) > self.max_entries:
+            self._generations.popitem(last=False)
+
+    def _key(self, user_id: str) -> str:
+        return f"principal:{user_id}"
+
+    def _generation_key(self, user_id: str) -> str:
+        return f"principal:gen:{user_id}"
+
+
+principal_cache = PrincipalCache(
+    max_entries=settings.PRINCIPAL_CACHE_MAX_ENTRIES,
+    local_ttl=settings.PRINCIPAL_CACHE_LOCAL_TTL_SECONDS,
+    redis_ttl=settings.PRINCIPAL_CACHE_REDIS_TTL_SECONDS,
+)
+metrics.register_provider("principal_cache", principal_cache.stats)
@@ -0,0 +1,68 @@
+"""
+Content-addressed cache of LLM completions.
+
+Entries are keyed by a hash of the model name and the fully rendered request
+payload, so any two calls that would send Gemini the same prompt (different
+users with the same stats, or the same user in another week) share one
+generation. Only successful completions are stored. Redis errors degrade to a
+miss, never to a failed request.
+
+With AI_PROMPT_QUANTIZE the weekly stats are rounded before rendering (see
+gemini_service.weekly_summary_payload), which trades a little precision in
+the summary for a higher hit rate.
+"""
+import hashlib
+import json
+from typing import Any
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.redis_Client import redisClient
+
+
+class PromptCache:
+    def __init__(self, enabled: bool, ttl_seconds: int) -> None:
+        self.enabled = enabled
+        self.ttl_seconds = ttl_seconds
+
+    def key(self, model: str, payload: dict[str, Any]) -> str:
+        rendered = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+        digest = hashlib.sha256(f"{model}\0{rendered}".encode()).hexdigest()
+        return f"ai:prompt:{digest}"
+
+    async def get(self, key: str) -> str | None:
+        if not self.enabled:
+            return None
+        try:
+            text = await redisClient.get(key)
+        except Exception:
+            text = None
+        metrics.incr("prompt_cache.hits" if text else "prompt_cache.misses")
+        return text
+
+    async def set(self, key: str, text: str) -> None:
+        if not self.enabled or not text:
+            return
+        try:
+            await redisClient.set(key, text, ex=self.ttl_seconds)
+        except Exception:
+            pass
+
+    def stats(self) -> dict:
+        hits = metrics.get("prompt_cache.hits")
+        lookups = hits + metrics.get("prompt_cache.misses")
+        return {
+            "enabled": self.enabled,
+            "quantize": settings.AI_PROMPT_QUANTIZE,
+            "ttl_seconds": self.ttl_seconds,
+            # Every hit is a Gemini call this worker did not make.
+            "llm_calls_avoided": hits,
+            "hit_rate": round(hits / lookups, 3) if lookups else None,
+        }
+
+
+prompt_cache = PromptCache(
+    enabled=settings.AI_PROMPT_CACHE_ENABLED,
+    ttl_seconds=settings.AI_PROMPT_CACHE_TTL_SECONDS,
+)
+metrics.register_provider("prompt_cache", prompt_cache.stats)
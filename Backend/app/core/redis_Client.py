@@ -1,6 +1,18 @@
-from redis.asyncio import Redis
+from redis.asyncio import BlockingConnectionPool, Redis
 
-redisClient = Redis(host="localhost", port=6379, decode_responses=True)
+from app.core.config import settings
+
+# A burst beyond REDIS_MAX_CONNECTIONS waits briefly for a free connection
+# instead of failing at once with "Too many connections".
+redisPool = BlockingConnectionPool.from_url(
+    settings.get_redis_url(),
+    max_connections=settings.REDIS_MAX_CONNECTIONS,
+    timeout=settings.REDIS_POOL_TIMEOUT_SECONDS,
+    socket_timeout=settings.REDIS_SOCKET_TIMEOUT_SECONDS,
+    socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT_SECONDS,
+    decode_responses=True,
+)
+redisClient = Redis(connection_pool=redisPool)
 
 
 async def connect_redis():
@@ -10,3 +22,8 @@ async def connect_redis():
             print("✅ Connected to Redis!")
     except Exception as e:
         print("❌ Failed to connect:", e)
+
+
+async def close_redis():
+    await redisClient.aclose()
+    await redisPool.disconnect()
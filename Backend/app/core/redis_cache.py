@@ -0,0 +1,189 @@
+"""
+Opt-in client-side cache for hot Redis read keys.
+
+Reads of keys under REDIS_CLIENT_CACHE_PREFIXES are served from worker memory
+after the first fetch. Freshness comes from Redis key tracking: one dedicated
+connection enables CLIENT TRACKING in BCAST mode for the configured prefixes
+and redirects invalidations to a second connection subscribed to
+__redis__:invalidate. Any write, expiry or eviction of a tracked key drops the
+local copy. If the listener loses its connection the whole local cache is
+cleared and reads go to Redis until tracking is re-established.
+
+redis-py's asyncio client does not surface RESP3 invalidation push messages,
+so this uses the REDIRECT form of the same server-assisted tracking.
+"""
+import asyncio
+import itertools
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.redis_Client import redisClient, redisPool
+
+COMMANDS = ("get", "hgetall")
+ENTRY_OVERHEAD_BYTES = 64
+
+
+def _size(key: str, value: Any) -> int:
+    if value is None:
+        size = 0
+    elif isinstance(value, dict):
+        size = sum(len(str(k)) + len(str(v)) for k, v in value.items())
+    else:
+        size = len(str(value))
+    return len(key) + size + ENTRY_OVERHEAD_BYTES
+
+
+class ClientSideCache:
+    def __init__(self, prefixes: list[str], max_bytes: int) -> None:
+        self.prefixes = tuple(p.strip() for p in prefixes if p.strip())
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[tuple[str, str], tuple[Any, int]] = OrderedDict()
+        self._bytes = 0
+        # Keys with a fetch in flight; an invalidation removes the key so a
+        # value read before the write is not stored afterwards.
+        self._pending: dict[str, int] = {}
+        self._tokens = itertools.count()
+        self._ready = False
+        self._task: asyncio.Task | None = None
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+        self._evictions = 0
+
+    async def get(self, key: str) -> Any:
+        return await self._read("get", key, redisClient.get)
+
+    async def hgetall(self, key: str) -> Any:
+        return await self._read("hgetall", key, redisClient.hgetall)
+
+    async def start(self) -> None:
+        if self.prefixes and self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._ready = False
+        self.clear()
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._pending.clear()
+        self._bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self._hits + self._misses
+        return {
+            "enabled": self._ready,
+            "prefixes": list(self.prefixes),
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_ratio": round(self._hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self._invalidations,
+            "evictions": self._evictions,
+        }
+
+    async def _read(self, command: str, key: str, fetch: Callable[[str], Awaitable[Any]]) -> Any:
+        if not self._ready or not key.startswith(self.prefixes):
+            return await fetch(key)
+
+        entry = self._entries.get((command, key))
+        if entry is not None:
+            self._entries.move_to_end((command, key))
+            self._hits += 1
+            metrics.incr("redis_client_cache.hits")
+            return entry[0]
+
+        self._misses += 1
+        metrics.incr("redis_client_cache.misses")
+        token = next(self._tokens)
+        self._pending[key] = token
+        try:
+            value = await fetch(key)
+        finally:
+            still_valid = self._pending.get(key) == token
+            if still_valid:
+                del self._pending[key]
+        if still_valid and self._ready:
+            self._store(command, key, value)
+        return value
+
+    def _store(self, command: str, key: str, value: Any) -> None:
+        size = _size(key, value)
+        if size > self.max_bytes:
+            return
+        self._evict((command, key))
+        self._entries[(command, key)] = (value, size)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self._evictions += 1
+
+    def _evict(self, entry_key: tuple[str, str]) -> None:
+        entry = self._entries.pop(entry_key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def _on_invalidate(self, message: list) -> None:
+        if not message or message[0] != "message":
+            return
+        keys = message[2]
+        if keys is None:
+            # Sent on FLUSHALL/FLUSHDB.
+            self.clear()
+            return
+        for key in keys:
+            self._pending.pop(key, None)
+            for command in COMMANDS:
+                self._evict((command, key))
+            self._invalidations += 1
+
+    async def _listen(self) -> None:
+        # Idle subscribers must not hit the pool's socket timeout.
+        kwargs = dict(redisPool.connection_kwargs, socket_timeout=None)
+        while True:
+            listener = redisPool.connection_class(**kwargs)
+            tracker = redisPool.connection_class(**kwargs)
+            try:
+                await listener.connect()
+                await listener.send_command("CLIENT", "ID")
+                client_id = await listener.read_response()
+                await listener.send_command("SUBSCRIBE", "__redis__:invalidate")
+                await listener.read_response()
+
+                await tracker.connect()
+                args: list[Any] = ["CLIENT", "TRACKING", "ON", "REDIRECT", client_id, "BCAST"]
+                for prefix in self.prefixes:
+                    args += ["PREFIX", prefix]
+                await tracker.send_command(*args)
+                await tracker.read_response()
+
+                self._ready = True
+                print("✅ Redis client-side cache tracking enabled")
+                while True:
+                    self._on_invalidate(await listener.read_response())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ Redis client-side cache listener failed: {e}")
+            finally:
+                # Invalidations may have been missed; stop serving from memory.
+                self._ready = False
+                self.clear()
+                await listener.disconnect()
+                await tracker.disconnect()
+            await asyncio.sleep(1)
+
+
+client_cache = ClientSideCache(
+    prefixes=settings.REDIS_CLIENT_CACHE_PREFIXES.split(","),
+    max_bytes=settings.REDIS_CLIENT_CACHE_MAX_BYTES,
+)
+metrics.register_provider("redis_client_cache", client_cache.stats)
@@ -0,0 +1,83 @@
+"""
+Lifespan management for the Postgres, Mongo and Redis pools and the shared
+outbound HTTP clients.
+
+Each pool is a per-worker singleton built from Settings in its own module
+(app.db.postgres, app.db.mongo, app.core.redis_Client, app.core.http_clients).
+The manager warms the database pools at startup so the first requests do not
+pay for connection setup, reports their statistics on /metrics, and closes all
+of them on shutdown.
+"""
+import asyncio
+
+from sqlalchemy import text
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.http_clients import gemini_http
+from app.core.redis_Client import close_redis, redisClient, redisPool
+from app.core.redis_cache import client_cache
+from app.db.mongo import client as mongo_client
+from app.db.postgres import engine
+
+
+class ResourceManager:
+    async def startup(self) -> None:
+        results = await asyncio.gather(
+            self._warm_postgres(), self._warm_mongo(), self._warm_redis(), return_exceptions=True
+        )
+        for name, result in zip(("Postgres", "Mongo", "Redis"), results):
+            if isinstance(result, Exception):
+                print(f"❌ {name} warm-up failed: {result}")
+            else:
+                print(f"✅ {name} connected")
+
+        if settings.REDIS_CLIENT_CACHE_ENABLED:
+            await client_cache.start()
+
+    async def shutdown(self) -> None:
+        await client_cache.stop()
+        await gemini_http.aclose()
+        await engine.dispose()
+        mongo_client.close()
+        await close_redis()
+        print("👋 Database connections closed")
+
+    def stats(self) -> dict:
+        pool = engine.pool
+        return {
+            "postgres": {
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": pool.overflow(),
+                "max": settings.POSTGRES_POOL_SIZE + settings.POSTGRES_MAX_OVERFLOW,
+            },
+            "mongo": {
+                "min_pool_size": settings.MONGO_MIN_POOL_SIZE,
+                "max_pool_size": settings.MONGO_MAX_POOL_SIZE,
+            },
+            "redis": {
+                "in_use": len(redisPool._in_use_connections),
+                "available": len(redisPool._available_connections),
+                "max": settings.REDIS_MAX_CONNECTIONS,
+            },
+            "gemini_http": gemini_http.stats(),
+        }
+
+    async def _warm_postgres(self) -> None:
+        async def ping():
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+
+        await asyncio.gather(*[ping() for _ in range(settings.POSTGRES_POOL_WARM)])
+
+    async def _warm_mongo(self) -> None:
+        await mongo_client.admin.command("ping")
+
+    async def _warm_redis(self) -> None:
+        await asyncio.gather(*[redisClient.ping() for _ in range(settings.REDIS_POOL_WARM)])
+
+
+resources = ResourceManager()
+metrics.register_provider("pools", resources.stats)
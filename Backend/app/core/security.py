@@ -6,6 +6,8 @@ from typing import Any
 import jwt
 import bcrypt
 
+from app.core.config import settings
+
 # Configuration
 ACCESS_TOKEN_TTL_MINUTES = int(os.getenv("ACCESS_TOKEN_TTL_MINUTES", "15"))
 REFRESH_TOKEN_TTL_DAYS = int(os.getenv("REFRESH_TOKEN_TTL_DAYS", "14"))
@@ -40,7 +42,9 @@ def verify_password(password: str, hashed_password: str) -> bool:
     return bcrypt.checkpw(prehashed.encode('utf-8'), hashed_password.encode('utf-8'))
 
 
-def create_access_token(user_id: uuid.UUID, email: str) -> dict[str, Any]:
+def create_access_token(
+    user_id: uuid.UUID, email: str, has_onboarded: bool = False, generation: int = 0
+) -> dict[str, Any]:
     now = datetime.now(tz=timezone.utc)
     expires_at = now + timedelta(minutes=ACCESS_TOKEN_TTL_MINUTES)
     payload = {
@@ -51,6 +55,9 @@ def create_access_token(user_id: uuid.UUID, email: str) -> dict[str, Any]:
         "exp": int(expires_at.timestamp()),
         "jti": str(uuid.uuid4()),
     }
+    if settings.ACCESS_TOKEN_CLAIMS_ONLY:
+        payload["onb"] = has_onboarded
+        payload["gen"] = generation
     token = jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
     return {"token": token, "expires_at": expires_at}
 
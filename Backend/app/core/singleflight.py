@@ -0,0 +1,137 @@
+"""
+Duplicate-work suppression for expensive, keyed computations.
+
+SingleFlight coalesces concurrent calls for the same key inside one worker:
+the first caller starts the function as a task and everyone, the first caller
+included, awaits that task. Cancelling one caller (a client disconnect) does
+not cancel the work the others are waiting for.
+
+RedisLock extends that across workers. Every acquisition takes a fencing
+token from a per-key counter, so a holder whose lock expired mid-work can be
+told apart from the current one: writes made through `fenced_hset` are
+rejected if a newer token has already written. The counter must outlive every
+entry written under it, or a late holder would draw a low token again and
+lose to the stale marker; a fenced write therefore extends the counter to the
+entry's TTL, and acquiring only ever lengthens it.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable
+
+from redis.asyncio import Redis
+
+from app.core import metrics
+from app.core.redis_Client import redisClient
+
+# KEYS[1] lock, KEYS[2] fence counter; ARGV[1] lock ttl ms.
+ACQUIRE_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return false
+end
+local token = redis.call('INCR', KEYS[2])
+redis.call('SET', KEYS[1], token, 'PX', ARGV[1])
+local ttl = math.max(tonumber(ARGV[1]) * 10, 86400000)
+if redis.call('PTTL', KEYS[2]) < ttl then
+    redis.call('PEXPIRE', KEYS[2], ttl)
+end
+return token
+"""
+# KEYS[1] lock; ARGV[1] token.
+RELEASE_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+# KEYS[1] lock; ARGV[1] token, ARGV[2] ttl ms.
+EXTEND_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+# KEYS[1] hash, KEYS[2] last written token, KEYS[3] fence counter;
+# ARGV[1] token, ARGV[2] ttl seconds, ARGV[3..] field, value, ...
+FENCED_HSET_LUA = """
+local last = tonumber(redis.call('GET', KEYS[2]) or '0')
+if tonumber(ARGV[1]) < last then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+redis.call('HSET', KEYS[1], unpack(ARGV, 3))
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+redis.call('SET', KEYS[2], ARGV[1], 'EX', ARGV[2])
+if redis.call('TTL', KEYS[3]) < tonumber(ARGV[2]) then
+    redis.call('EXPIRE', KEYS[3], ARGV[2])
+end
+return 1
+"""
+acquire_script = redisClient.register_script(ACQUIRE_LUA)
+release_script = redisClient.register_script(RELEASE_LUA)
+extend_script = redisClient.register_script(EXTEND_LUA)
+fenced_hset_script = redisClient.register_script(FENCED_HSET_LUA)
+
+
+class SingleFlight:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._calls: dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        call = self._calls.get(key)
+        if call is not None:
+            metrics.incr(f"{self.name}.coalesced_local")
+        else:
+            call = asyncio.ensure_future(fn())
+            self._calls[key] = call
+            call.add_done_callback(lambda task: self._done(key, task))
+        return await asyncio.shield(call)
+
+    def _done(self, key: str, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Retrieve the exception so it is not reported when every caller went away.
+        if not task.cancelled():
+            task.exception()
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+
+class RedisLock:
+    def __init__(self, key: str, ttl_seconds: float, redis: Redis = redisClient) -> None:
+        self.key = f"lock:{key}"
+        self.fence_key = f"fence:{key}"
+        self.ttl_ms = int(ttl_seconds * 1000)
+        self.redis = redis
+        self.token: int | None = None
+
+    async def acquire(self) -> bool:
+        token = await acquire_script(keys=[self.key, self.fence_key], args=[self.ttl_ms], client=self.redis)
+        self.token = int(token) if token else None
+        return self.token is not None
+
+    async def release(self) -> None:
+        if self.token is not None:
+            await release_script(keys=[self.key], args=[self.token], client=self.redis)
+
+    async def extend(self) -> bool:
+        """Reset the TTL if the lock is still ours; False means it was lost."""
+        if self.token is None:
+            return False
+        return bool(await extend_script(keys=[self.key], args=[self.token, self.ttl_ms], client=self.redis))
+
+    async def held_by_other(self) -> bool:
+        holder = await self.redis.get(self.key)
+        return holder is not None and holder != str(self.token)
+
+    async def fenced_hset(self, key: str, mapping: dict[str, Any], ttl_seconds: int) -> bool:
+        """Replace hash `key` with `mapping` unless a holder with a newer token has already written it."""
+        fields = [item for pair in mapping.items() for item in pair]
+        written = await fenced_hset_script(
+            keys=[key, f"{key}:fence", self.fence_key],
+            args=[self.token or 0, ttl_seconds, *fields],
+            client=self.redis,
+        )
+        if not written:
+            metrics.incr("redis_lock.fenced_writes_rejected")
+        return bool(written)
@@ -0,0 +1,120 @@
+"""
+User timezones and the user-local time fields derived from them.
+
+Sessions are stored with local_date, local_hour and local_weekday computed in
+the user's UserPreferences.timezone at write time, so day boundaries for the
+today cache and the rollups, and hour/weekday matches, follow the user's own
+clock. Users without a (valid) timezone get UTC.
+
+The timezone is cached like principals: a per-worker LRU with a short TTL in
+front of Redis (`user:{id}:tz`), in front of Postgres. Whatever changes a
+user's timezone must call `user_timezones.invalidate`; sessions already
+stored keep the fields they were written with.
+"""
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timezone, tzinfo
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.redis_Client import redisClient
+from app.core.redis_cache import client_cache
+from app.db.postgres import AsyncSessionLocal
+from app.repositories.users import UserRepository
+
+
+def resolve_timezone(name: str | None) -> tzinfo:
+    if not name:
+        return timezone.utc
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return timezone.utc
+
+
+def local_fields(timestamp: datetime, tz: tzinfo) -> dict:
+    """local_date (YYYY-MM-DD), local_hour and local_weekday (0 = Sunday, like $dayOfWeek - 1)."""
+    if timestamp.tzinfo is None:
+        # Mongo returns naive UTC datetimes.
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    local = timestamp.astimezone(tz)
+    return {
+        "local_date": local.date().isoformat(),
+        "local_hour": local.hour,
+        "local_weekday": (local.weekday() + 1) % 7,
+    }
+
+
+def local_today(tz: tzinfo) -> date:
+    return datetime.now(tz=tz).date()
+
+
+def end_of_local_day(day: date, tz: tzinfo) -> datetime:
+    """First instant of the following local day, as an aware datetime."""
+    following = date.fromordinal(day.toordinal() + 1)
+    return datetime(following.year, following.month, following.day, tzinfo=tz)
+
+
+class TimezoneCache:
+    def __init__(self, max_entries: int, local_ttl: int, redis_ttl: int) -> None:
+        self.max_entries = max_entries
+        self.local_ttl = local_ttl
+        self.redis_ttl = redis_ttl
+        self._entries: OrderedDict[str, tuple[float, tzinfo]] = OrderedDict()
+
+    async def get(self, user_id: str) -> tzinfo:
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            expires_at, tz = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(user_id)
+                metrics.incr("user_timezone.local_hits")
+                return tz
+            del self._entries[user_id]
+
+        try:
+            # "" records that the user has no timezone.
+            name = await client_cache.get(self._key(user_id))
+        except Exception:
+            name = None
+        if name is not None:
+            metrics.incr("user_timezone.redis_hits")
+        else:
+            metrics.incr("user_timezone.misses")
+            async with AsyncSessionLocal() as session:
+                name = await UserRepository(session).get_timezone(user_id) or ""
+            try:
+                await redisClient.set(self._key(user_id), name, ex=self.redis_ttl)
+            except Exception:
+                pass
+
+        tz = resolve_timezone(name)
+        self._entries[user_id] = (time.monotonic() + self.local_ttl, tz)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return tz
+
+    async def invalidate(self, user_id: str) -> None:
+        self._entries.pop(user_id, None)
+        await redisClient.delete(self._key(user_id))
+
+    def stats(self) -> dict:
+        return {
+            "local_entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "local_ttl_seconds": self.local_ttl,
+            "redis_ttl_seconds": self.redis_ttl,
+        }
+
+    def _key(self, user_id: str) -> str:
+        return f"user:{user_id}:tz"
+
+
+user_timezones = TimezoneCache(
+    max_entries=settings.USER_TIMEZONE_CACHE_MAX_ENTRIES,
+    local_ttl=settings.USER_TIMEZONE_LOCAL_TTL_SECONDS,
+    redis_ttl=settings.USER_TIMEZONE_REDIS_TTL_SECONDS,
+)
+metrics.register_provider("user_timezone", user_timezones.stats)
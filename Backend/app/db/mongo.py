@@ -1,12 +1,15 @@
-import os
-
 from motor.motor_asyncio import AsyncIOMotorClient
 
-MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
-MONGO_DB = os.getenv("MONGO_DB", "moodsync")
+from app.core.config import settings
 
-client = AsyncIOMotorClient(MONGO_URL)
+# Motor connects lazily, so building the client here opens no sockets.
+client = AsyncIOMotorClient(
+    settings.MONGO_URL,
+    maxPoolSize=settings.MONGO_MAX_POOL_SIZE,
+    minPoolSize=settings.MONGO_MIN_POOL_SIZE,
+    serverSelectionTimeoutMS=settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+)
 
 
 def get_mongo_db():
-    return client[MONGO_DB]
+    return client[settings.MONGO_DB]
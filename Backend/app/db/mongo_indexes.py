@@ -0,0 +1,83 @@
+"""
+Mongo index bootstrap.
+
+ensure_indexes creates the indexes declared on the Mongo models plus the
+compound indexes the hot queries need. It is idempotent, so it runs in the
+background at startup and from app/setupScripts/createIndexes.py.
+tests/test_query_plans.py runs every service query with the profiler on and
+fails if one is not index-backed.
+"""
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import IndexModel
+from pymongo.errors import OperationFailure
+
+from app.models.mongo_models import DailySummary, HourlyBucket, WorkSession
+
+
+def _declared(model) -> list[IndexModel]:
+    return [IndexModel(keys) for keys in model.indexes]
+
+
+INDEXES: dict[str, list[IndexModel]] = {
+    "work_sessions": _declared(WorkSession)
+    + [
+        # Deep-work slots and top task type.
+        IndexModel([("user_id", 1), ("task_type", 1), ("timestamp", -1)]),
+        # Mood x energy lookups.
+        IndexModel([("user_id", 1), ("mood", 1), ("energy", 1), ("timestamp", -1)]),
+        # History pagination by _id cursor.
+        IndexModel([("user_id", 1), ("_id", -1)]),
+    ],
+    "daily_summaries": _declared(DailySummary)
+    + [
+        # Rollups are upserted by (user_id, day); uniqueness keeps concurrent first writes from duplicating.
+        IndexModel([("user_id", 1), ("day", 1)], unique=True),
+    ],
+    "hourly_buckets": _declared(HourlyBucket)
+    + [
+        # Upsert key, ordered for the per-task window read.
+        IndexModel([("user_id", 1), ("task_type", 1), ("day", 1), ("hour", 1)], unique=True),
+    ],
+}
+
+# Indexes earlier releases created that no query uses; dropped so inserts stop maintaining them.
+OBSOLETE_INDEXES: dict[str, list[str]] = {
+    "work_sessions": ["user_id_1_local_date_1", "user_id_1_local_weekday_1_local_hour_1"],
+}
+
+# IndexOptionsConflict / IndexKeySpecsConflict: same keys, different options or name.
+INDEX_CONFLICT_CODES = {85, 86}
+
+
+async def ensure_indexes(db: AsyncIOMotorDatabase) -> dict[str, list[str]]:
+    created = {}
+    for collection_name, indexes in INDEXES.items():
+        collection = db.get_collection(collection_name)
+        names = []
+        for index in indexes:
+            # createIndexes is a no-op for indexes that already exist with the same spec,
+            # and builds on 4.2+ only hold exclusive locks at the start and end.
+            try:
+                names += await collection.create_indexes([index])
+            except OperationFailure as e:
+                if e.code not in INDEX_CONFLICT_CODES:
+                    raise
+                # An older definition with the same keys exists; replace it.
+                await _drop_same_keys(collection, index)
+                names += await collection.create_indexes([index])
+        created[collection_name] = names
+
+    for collection_name, obsolete in OBSOLETE_INDEXES.items():
+        collection = db.get_collection(collection_name)
+        existing = await collection.index_information()
+        for name in obsolete:
+            if name in existing:
+                await collection.drop_index(name)
+    return created
+
+
+async def _drop_same_keys(collection, index: IndexModel) -> None:
+    keys = list(index.document["key"].items())
+    for name, info in (await collection.index_information()).items():
+        if name != "_id_" and list(info["key"]) == keys:
+            await collection.drop_index(name)
@@ -1,27 +1,79 @@
-from fastapi import Depends, HTTPException, status
+import secrets
+
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import settings
+from app.core.principal_cache import principal_cache
 from app.core.security import decode_token
-from app.db.postgres import get_db
+from app.db.postgres import AsyncSessionLocal
 from app.repositories.users import UserRepository
+from app.schemas.auth import Principal
 
 security = HTTPBearer()
+optional_bearer = HTTPBearer(auto_error=False)
 
+LOOPBACK_HOSTS = {"127.0.0.1", "::1", "localhost"}
 
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    session: AsyncSession = Depends(get_db),
-):
-    token = credentials.credentials
+
+def _decode_access(credentials: HTTPAuthorizationCredentials) -> dict:
     try:
-        payload = decode_token(token, "access")
+        return decode_token(credentials.credentials, "access")
     except Exception:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid access token")
 
-    user_repo = UserRepository(session)
-    user = await user_repo.get_by_id(payload["sub"])
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+) -> Principal:
+    payload = _decode_access(credentials)
+
+    # Tokens issued in claims-only mode carry everything the routers need,
+    # unless the user changed since: the client then refreshes for new claims.
+    if settings.ACCESS_TOKEN_CLAIMS_ONLY and "onb" in payload and "gen" in payload:
+        if payload["gen"] < await principal_cache.min_generation(payload["sub"]):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Access token is outdated")
+        return Principal(
+            user_id=payload["sub"],
+            email=payload["email"],
+            has_onboarded=payload["onb"],
+            generation=payload["gen"],
+        )
+
+    principal = await principal_cache.get(payload["sub"])
+    if principal:
+        return principal
+
+    # Only open a Postgres session on a cache miss.
+    async with AsyncSessionLocal() as session:
+        user = await UserRepository(session).get_by_id(payload["sub"])
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
-    return user
+    principal = Principal(
+        user_id=user.user_id,
+        email=user.email,
+        has_onboarded=user.has_onboarded,
+        generation=user.generation,
+        first_name=user.first_name,
+        last_name=user.last_name,
+    )
+    await principal_cache.set(principal)
+    return principal
+
+
+
+async def require_metrics_access(
+    request: Request,
+    credentials: HTTPAuthorizationCredentials | None = Depends(optional_bearer),
+) -> None:
+    """Metrics expose pool sizes, queue depths and traffic; only operators may read them."""
+    if settings.METRICS_TOKEN:
+        if credentials is None or not secrets.compare_digest(credentials.credentials, settings.METRICS_TOKEN):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid metrics token")
+        return
+    # No token configured: a scraper on the same host only. A request relayed by
+    # a local reverse proxy also arrives from loopback, so forwarded ones are refused.
+    local = request.client is not None and request.client.host in LOOPBACK_HOSTS
+    if not local or "x-forwarded-for" in request.headers:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Metrics are only served locally")
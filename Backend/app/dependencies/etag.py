@@ -0,0 +1,55 @@
+"""
+Conditional GET for per-user read endpoints.
+
+`etag_guard(resource, period)` returns a dependency that derives a weak ETag
+from the user's data version, the resource name, the query string and the
+user's current local day or hour (results that depend on "now" change with
+it; the timezone normally comes from worker memory). A
+matching If-None-Match is answered with 304 before the handler runs: the
+guard raises an HTTPException carrying the ETag headers, and the app's
+exception handlers turn a 304 into a bodiless response that keeps them.
+Otherwise the ETag is set on the handler's response.
+"""
+import hashlib
+from datetime import datetime
+
+from fastapi import Depends, HTTPException, Request, Response, status
+
+from app.core import metrics
+from app.core.data_version import current_version
+from app.core.user_timezone import user_timezones
+from app.dependencies.auth import get_current_user
+
+PERIOD_FORMATS = {"day": "%Y-%m-%d", "hour": "%Y-%m-%dT%H"}
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison (RFC 9110 8.8.3.2): ignore the W/ prefix on both sides.
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(","))
+
+
+def etag_guard(resource: str, period: str = "day"):
+    period_format = PERIOD_FORMATS[period]
+
+    async def guard(request: Request, response: Response, user=Depends(get_current_user)) -> str:
+        version = await current_version(str(user.user_id))
+        bucket = datetime.now(tz=await user_timezones.get(str(user.user_id))).strftime(period_format)
+        digest = hashlib.sha1(
+            f"{resource}|{version}|{bucket}|{request.url.query}".encode("utf-8")
+        ).hexdigest()[:20]
+        etag = f'W/"{digest}"'
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and _matches(if_none_match, etag):
+            metrics.incr(f"etag.{resource}.not_modified")
+            raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        metrics.incr(f"etag.{resource}.modified")
+        response.headers.update(headers)
+        return etag
+
+    return guard
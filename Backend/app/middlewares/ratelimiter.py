@@ -1,33 +1,175 @@
-from fastapi import FastAPI, Request, HTTPException
-import time 
-from app.core.redis_Client import redisClient as r
-
-WINDOW_SECONDS=60
-LIMIT=100
-
-async def get_key(req: Request):
-    # use email/username from request body or fallback to IP
-    try:
-        body = await req.json()
-        return body.get("username", req.client.host)
-    except:
-        return req.client.host
-
-async def rate_limiter(request: Request, call_next):
-    key = await get_key(request)
-    current_time = int(time.time())
-
-    # Redis key for user/IP
-    redis_key = f"rate_limit:{key}"
-
-    # Increment count
-    count = r.get(redis_key)
-    if count is None:
-        r.set(redis_key, 1, ex=WINDOW_SECONDS)  # expires in 30 mins
-    elif int(count) < LIMIT:
-        r.incr(redis_key)
-    else:
-        raise HTTPException(status_code=429, detail="Rate limit exceeded")
-
-    response = await call_next(request)
-    return response
\ No newline at end of file
+"""
+Pure ASGI rate limiter.
+
+Each request is matched to a policy by path prefix and checked with a single
+GCRA Lua call against Redis, keyed by policy and client address. The request
+body is never read. A small per-worker pre-filter remembers keys that were
+recently denied, and keys that already went over the limit on this worker
+alone, and rejects them without a Redis round trip. If Redis is unavailable
+the limiter fails open.
+"""
+import json
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from redis.asyncio import Redis
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.redis_Client import redisClient
+
+# Generic cell rate algorithm: the key stores the theoretical arrival time (ms).
+# Returns {allowed, retry_after_ms, remaining}.
+GCRA_LUA = """
+local now = tonumber(ARGV[1])
+local emission = tonumber(ARGV[2])
+local tolerance = tonumber(ARGV[3])
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then
+    tat = now
+end
+local new_tat = tat + emission
+local allow_at = new_tat - tolerance
+if now < allow_at then
+    return {0, allow_at - now, 0}
+end
+redis.call('SET', KEYS[1], new_tat, 'PX', math.ceil(new_tat - now))
+return {1, 0, math.floor((tolerance - (new_tat - now)) / emission)}
+"""
+gcra_script = redisClient.register_script(GCRA_LUA)
+
+
+@dataclass(frozen=True)
+class RateLimitPolicy:
+    name: str
+    prefixes: tuple[str, ...]
+    limit: int
+    window_seconds: int
+
+    @property
+    def emission_ms(self) -> float:
+        return self.window_seconds * 1000 / self.limit
+
+
+# First matching policy wins; login routes are throttled before bcrypt runs.
+RATE_LIMIT_POLICIES = (
+    RateLimitPolicy(
+        "login",
+        ("/auth/login", "/auth/register", "/users/signin", "/users/createuser"),
+        settings.RATE_LIMIT_LOGIN_MAX_REQUESTS,
+        settings.RATE_LIMIT_LOGIN_WINDOW_SECONDS,
+    ),
+    RateLimitPolicy("auth", ("/auth/",), settings.RATE_LIMIT_MAX_REQUESTS, settings.RATE_LIMIT_WINDOW_SECONDS),
+    RateLimitPolicy("api", ("/",), settings.RATE_LIMIT_API_MAX_REQUESTS, settings.RATE_LIMIT_API_WINDOW_SECONDS),
+)
+
+
+class LocalPrefilter:
+    """Per-worker memory of blocked keys and fixed-window counts, bounded in size."""
+
+    def __init__(self, max_keys: int) -> None:
+        self.max_keys = max_keys
+        self._blocked: OrderedDict[str, float] = OrderedDict()
+        self._windows: OrderedDict[str, tuple[int, int]] = OrderedDict()
+
+    def check(self, key: str, policy: RateLimitPolicy, now: float) -> float | None:
+        """Return seconds to wait if the key can be rejected locally, otherwise None."""
+        blocked_until = self._blocked.get(key)
+        if blocked_until is not None:
+            if blocked_until > now:
+                return blocked_until - now
+            del self._blocked[key]
+
+        window = int(now // policy.window_seconds)
+        current, count = self._windows.get(key, (window, 0))
+        count = count + 1 if current == window else 1
+        self._put(self._windows, key, (window, count))
+        if count > policy.limit:
+            # This worker alone has seen more than the whole limit.
+            return (window + 1) * policy.window_seconds - now
+        return None
+
+    def block(self, key: str, until: float) -> None:
+        self._put(self._blocked, key, until)
+
+    def _put(self, store: OrderedDict, key: str, value) -> None:
+        store[key] = value
+        store.move_to_end(key)
+        while len(store) > self.max_keys:
+            store.popitem(last=False)
+
+
+class RateLimitMiddleware:
+    def __init__(
+        self,
+        app,
+        policies: tuple[RateLimitPolicy, ...] = RATE_LIMIT_POLICIES,
+        redis: Redis = redisClient,
+    ) -> None:
+        self.app = app
+        self.policies = policies
+        self.redis = redis
+        self.prefilter = LocalPrefilter(settings.RATE_LIMIT_LOCAL_MAX_KEYS)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        policy = self._match(scope["path"])
+        if policy is None:
+            await self.app(scope, receive, send)
+            return
+
+        client = scope.get("client")
+        key = f"rate_limit:{policy.name}:{client[0] if client else 'unknown'}"
+        now = time.time()
+
+        retry_after = self.prefilter.check(key, policy, now)
+        if retry_after is not None:
+            metrics.incr("ratelimit.prefiltered")
+            await self._reject(send, retry_after)
+            return
+
+        try:
+            allowed, retry_after_ms, _ = await gcra_script(
+                keys=[key],
+                args=[int(now * 1000), policy.emission_ms, policy.emission_ms * policy.limit],
+                client=self.redis,
+            )
+        except Exception:
+            metrics.incr("ratelimit.redis_errors")
+            allowed, retry_after_ms = 1, 0
+
+        if not allowed:
+            metrics.incr("ratelimit.denied")
+            retry_after = float(retry_after_ms) / 1000
+            self.prefilter.block(key, now + retry_after)
+            await self._reject(send, retry_after)
+            return
+
+        metrics.incr("ratelimit.allowed")
+        await self.app(scope, receive, send)
+
+    def _match(self, path: str) -> RateLimitPolicy | None:
+        for policy in self.policies:
+            if any(path.startswith(prefix) for prefix in policy.prefixes):
+                return policy
+        return None
+
+    async def _reject(self, send, retry_after: float) -> None:
+        body = json.dumps({"error": "Rate limit exceeded", "status_code": 429}).encode("utf-8")
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode("latin-1")),
+                    (b"retry-after", str(max(1, math.ceil(retry_after))).encode("latin-1")),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
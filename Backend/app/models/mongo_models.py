@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from datetime import datetime, date
-from typing import Any
+from typing import Any, ClassVar
 import uuid
 
 from bson import ObjectId
@@ -28,13 +28,19 @@ class WorkSession(BaseModel):
     task_type: str
     duration_minutes: int = Field(ge=1)
     timestamp: datetime = Field(default_factory=datetime.utcnow)
+    # Derived at write time in the user's timezone (see app.core.user_timezone).
+    local_date: str | None = None
+    local_hour: int | None = Field(default=None, ge=0, le=23)
+    local_weekday: int | None = Field(default=None, ge=0, le=6)
+    tz: str | None = None
 
     class Config:
         populate_by_name = True
         arbitrary_types_allowed = True
         json_encoders = {ObjectId: str, uuid.UUID: str}
 
-    indexes = [
+    # Created by app.db.mongo_indexes; ClassVar keeps pydantic from treating it as a field.
+    indexes: ClassVar[list[list[tuple[str, int]]]] = [
         [("user_id", 1), ("timestamp", -1)],
         [("task_type", 1)],
         [("energy", 1)],
@@ -43,13 +49,23 @@ class WorkSession(BaseModel):
 
 
 class DailySummary(BaseModel):
+    """Per-user, per-day rollup of work_sessions, maintained by RollupService.
+
+    Sums rather than averages are stored so that concurrent writers can use
+    $inc; averages are derived when reading. `last` holds the latest session's
+    timestamp, mood and energy and is maintained with $max.
+    """
+
     id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
     user_id: uuid.UUID
-    day: date
+    day: datetime
     total_sessions: int = Field(ge=0)
     total_focus_minutes: int = Field(ge=0)
-    average_mood: float | None = None
-    average_energy: float | None = None
+    mood_sum: int = 0
+    energy_sum: float = 0
+    energy_count: int = 0
+    task_counts: dict[str, int] = Field(default_factory=dict)
+    last: dict[str, Any] | None = None
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
     class Config:
@@ -57,7 +73,27 @@ class DailySummary(BaseModel):
         arbitrary_types_allowed = True
         json_encoders = {ObjectId: str, uuid.UUID: str}
 
-    indexes = [
-        [("user_id", 1), ("day", 1)],
+    # (user_id, day) is created as a unique index by app.db.mongo_indexes.
+    indexes: ClassVar[list[list[tuple[str, int]]]] = [
         [("day", -1)],
     ]
+
+
+class HourlyBucket(BaseModel):
+    """Per-user session counts for one (user-local day, hour, task type), maintained by RollupService."""
+
+    id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
+    user_id: uuid.UUID
+    day: datetime
+    hour: int = Field(ge=0, le=23)
+    task_type: str
+    count: int = Field(ge=0)
+    duration_sum: int = Field(ge=0)
+
+    class Config:
+        populate_by_name = True
+        arbitrary_types_allowed = True
+        json_encoders = {ObjectId: str, uuid.UUID: str}
+
+    # (user_id, task_type, day, hour) is created as a unique index by app.db.mongo_indexes.
+    indexes: ClassVar[list[list[tuple[str, int]]]] = []
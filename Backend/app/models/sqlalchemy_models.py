@@ -3,7 +3,7 @@ from __future__ import annotations
 from datetime import datetime
 import uuid
 
-from sqlalchemy import Boolean, DateTime, ForeignKey, Index, String
+from sqlalchemy import Boolean, DateTime, ForeignKey, Index, Integer, String, UniqueConstraint, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
@@ -23,6 +23,9 @@ class User(Base):
     first_name: Mapped[str | None] = mapped_column(String(100), nullable=True)
     last_name: Mapped[str | None] = mapped_column(String(100), nullable=True)
     has_onboarded: Mapped[bool] = mapped_column(Boolean, default=False, name="has_onboarded")
+    # Bumped when a change makes the claims in access tokens stale (set_onboarded);
+    # claims-only tokens from an older generation are then rejected.
+    generation: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
     createdAt: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
     updatedAt: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow
@@ -37,26 +40,41 @@ class User(Base):
 
 
 class AuthSession(Base):
+    """Refresh-token sessions, range partitioned by month on expires_at.
+
+    Partitions are created ahead of time and dropped once expired by
+    SessionRetentionService; see app/setupScripts/partitionAuthSessions.py.
+    """
+
     __tablename__ = "auth_sessions"
 
+    # The partition key has to be part of every unique constraint.
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True), ForeignKey("users.user_id", ondelete="CASCADE"), index=True
     )
-    refresh_token_hash: Mapped[str] = mapped_column(String(255), unique=True, index=True)
+    refresh_token_hash: Mapped[str] = mapped_column(String(255))
     device_name: Mapped[str | None] = mapped_column(String(120), nullable=True)
     device_id: Mapped[str | None] = mapped_column(String(120), nullable=True)
     ip_address: Mapped[str | None] = mapped_column(String(64), nullable=True)
     user_agent: Mapped[str | None] = mapped_column(String(512), nullable=True)
     is_revoked: Mapped[bool] = mapped_column(Boolean, default=False)
-    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
     createdAt: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
     revoked_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
 
     user: Mapped[User] = relationship("User", back_populates="auth_sessions")
 
     __table_args__ = (
-        Index("ix_auth_sessions_user_expires", "user_id", "expires_at"),
+        UniqueConstraint("refresh_token_hash", "expires_at", name="uq_auth_sessions_refresh_token_hash"),
+        # Only live sessions are ever looked up by user; revoked rows stay out of the index.
+        Index(
+            "ix_auth_sessions_user_active",
+            "user_id",
+            "expires_at",
+            postgresql_where=text("is_revoked = false"),
+        ),
+        {"postgresql_partition_by": "RANGE (expires_at)"},
     )
 
 
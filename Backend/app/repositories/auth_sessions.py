@@ -1,9 +1,38 @@
 from datetime import datetime
-from sqlalchemy import select
+from sqlalchemy import select, text
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.sqlalchemy_models import AuthSession
 
+# Revokes the presented session and inserts its successor in one statement. The
+# row lock taken by the UPDATE means a concurrent rotation of the same session
+# waits, re-checks is_revoked and matches nothing.
+ROTATE_SQL = text(
+    """
+    WITH revoked AS (
+        UPDATE auth_sessions
+        SET is_revoked = true, revoked_at = now()
+        WHERE id = CAST(:old_id AS uuid)
+          AND refresh_token_hash = :old_hash
+          AND is_revoked = false
+          AND expires_at > now()
+        RETURNING user_id, device_name, device_id, ip_address, user_agent
+    ), inserted AS (
+        INSERT INTO auth_sessions (
+            id, user_id, refresh_token_hash, device_name, device_id,
+            ip_address, user_agent, is_revoked, expires_at, "createdAt"
+        )
+        SELECT CAST(:new_id AS uuid), user_id, :new_hash, device_name, device_id,
+               ip_address, user_agent, false, CAST(:expires_at AS timestamptz), now()
+        FROM revoked
+        RETURNING user_id
+    )
+    SELECT u.user_id, u.email, u.has_onboarded, u.generation
+    FROM inserted
+    JOIN users u ON u.user_id = inserted.user_id
+    """
+)
+
 
 class AuthSessionRepository:
     def __init__(self, session: AsyncSession) -> None:
@@ -46,3 +75,26 @@ class AuthSessionRepository:
         auth_session.is_revoked = True
         auth_session.revoked_at = datetime.utcnow()
         await self.session.commit()
+
+    async def rotate(
+        self,
+        old_session_id: str,
+        old_refresh_token_hash: str,
+        new_session_id: str,
+        new_refresh_token_hash: str,
+        expires_at: datetime,
+    ):
+        """Revoke a session and create its successor; returns the owning user's row or None."""
+        result = await self.session.execute(
+            ROTATE_SQL,
+            {
+                "old_id": old_session_id,
+                "old_hash": old_refresh_token_hash,
+                "new_id": new_session_id,
+                "new_hash": new_refresh_token_hash,
+                "expires_at": expires_at,
+            },
+        )
+        row = result.mappings().one_or_none()
+        await self.session.commit()
+        return row
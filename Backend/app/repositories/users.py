@@ -3,7 +3,7 @@ import uuid
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models.sqlalchemy_models import User
+from app.models.sqlalchemy_models import User, UserPreferences
 
 
 class UserRepository:
@@ -31,6 +31,20 @@ class UserRepository:
         if not user:
             return None
         user.has_onboarded = True
+        user.generation = (user.generation or 0) + 1
         await self.session.commit()
         await self.session.refresh(user)
         return user
+
+    async def get_timezone(self, user_id: str) -> str | None:
+        value = uuid.UUID(user_id) if isinstance(user_id, str) else user_id
+        result = await self.session.execute(
+            select(UserPreferences.timezone).where(UserPreferences.user_id == value)
+        )
+        return result.scalar_one_or_none()
+
+    async def get_timezones(self) -> dict[str, str]:
+        result = await self.session.execute(
+            select(UserPreferences.user_id, UserPreferences.timezone).where(UserPreferences.timezone.is_not(None))
+        )
+        return {str(user_id): tz for user_id, tz in result.all()}
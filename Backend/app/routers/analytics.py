@@ -2,13 +2,14 @@ from fastapi import APIRouter, Depends
 
 from app.db.mongo import get_mongo_db
 from app.dependencies.auth import get_current_user
+from app.dependencies.etag import etag_guard
 from app.schemas.analytics import InsightsResponse
 from app.services.analytics_service import AnalyticsService
 
 router = APIRouter(prefix="/analytics", tags=["Analytics"])
 
 
-@router.get("/insights", response_model=InsightsResponse)
+@router.get("/insights", response_model=InsightsResponse, dependencies=[Depends(etag_guard("analytics.insights"))])
 async def insights(user=Depends(get_current_user)):
     service = AnalyticsService(get_mongo_db())
     return await service.build_insights(str(user.user_id))
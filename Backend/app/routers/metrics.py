@@ -0,0 +1,11 @@
+from fastapi import APIRouter, Depends
+
+from app.core import metrics
+from app.dependencies.auth import require_metrics_access
+
+router = APIRouter(prefix="/metrics", tags=["Metrics"], dependencies=[Depends(require_metrics_access)])
+
+
+@router.get("")
+async def get_metrics():
+    return metrics.snapshot()
@@ -1,6 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import settings
+from app.core.security import create_access_token
 from app.db.postgres import get_db
 from app.dependencies.auth import get_current_user
 from app.services.onboarding_service import OnboardingService
@@ -17,4 +19,11 @@ async def complete_onboarding(
     updated = await service.complete(str(user.user_id))
     if not updated:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
-    return {"success": True, "has_onboarded": True}
+
+    response = {"success": True, "has_onboarded": True}
+    if settings.ACCESS_TOKEN_CLAIMS_ONLY:
+        # The caller's token still claims the old onboarding flag; hand back a fresh one.
+        access = create_access_token(updated.user_id, updated.email, updated.has_onboarded, updated.generation)
+        response["access_token"] = access["token"]
+        response["expires_at"] = access["expires_at"]
+    return response
@@ -1,15 +1,18 @@
 from fastapi import APIRouter, Depends, Response, status
 
+from app.core.redis_Client import redisClient
 from app.db.mongo import get_mongo_db
 from app.dependencies.auth import get_current_user
+from app.dependencies.etag import etag_guard
 from app.services.recommendation_service import RecommendationService
 
 router = APIRouter(prefix="/recommendation", tags=["Recommendation"])
 
 
-@router.get("")
+# The recommendation depends on the current hour, so its ETag does too.
+@router.get("", dependencies=[Depends(etag_guard("recommendation", period="hour"))])
 async def get_recommendation(user=Depends(get_current_user)):
-    service = RecommendationService(get_mongo_db())
+    service = RecommendationService(get_mongo_db(), redisClient)
     recommendation = await service.recommend(str(user.user_id))
     if not recommendation:
         return Response(status_code=status.HTTP_204_NO_CONTENT)
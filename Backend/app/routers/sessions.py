@@ -1,10 +1,14 @@
 from fastapi import APIRouter, Depends, Query, Response
+from fastapi.responses import StreamingResponse
 from redis.asyncio import Redis
 
 from app.core.redis_Client import redisClient
 from app.db.mongo import get_mongo_db
 from app.dependencies.auth import get_current_user
+from app.dependencies.etag import etag_guard
 from app.schemas.sessions import (
+    SessionBatchRequest,
+    SessionBatchResponse,
     SessionCreate,
     SessionDetailResponse,
     SessionHistoryResponse,
@@ -26,13 +30,24 @@ async def log_session(
     return SessionResponse(id=session_id)
 
 
-@router.get("/today", response_model=TodaySummaryResponse)
+@router.post("/batch", response_model=SessionBatchResponse)
+async def log_sessions_batch(
+    payload: SessionBatchRequest,
+    user=Depends(get_current_user),
+):
+    service = SessionsService(get_mongo_db(), redisClient)
+    return await service.log_sessions_batch(str(user.user_id), payload.items)
+
+
+@router.get("/today", response_model=TodaySummaryResponse, dependencies=[Depends(etag_guard("sessions.today"))])
 async def get_today(user=Depends(get_current_user)):
     service = SessionsService(get_mongo_db(), redisClient)
     return await service.get_today_summary(str(user.user_id))
 
 
-@router.get("/history", response_model=SessionHistoryResponse)
+@router.get(
+    "/history", response_model=SessionHistoryResponse, dependencies=[Depends(etag_guard("sessions.history"))]
+)
 async def get_history(
     user=Depends(get_current_user),
     limit: int = Query(10, ge=1, le=50),
@@ -42,6 +57,25 @@ async def get_history(
     return await service.get_history(str(user.user_id), limit, cursor)
 
 
+@router.get("/export")
+async def export_sessions(
+    user=Depends(get_current_user),
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    gzip: bool = False,
+):
+    service = SessionsService(get_mongo_db(), redisClient)
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    filename = f"sessions.{format}"
+    if gzip:
+        media_type = "application/gzip"
+        filename += ".gz"
+    return StreamingResponse(
+        service.export_sessions(str(user.user_id), format, gzip),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
 @router.get("/{session_id}", response_model=SessionDetailResponse)
 async def get_session_detail(session_id: str, user=Depends(get_current_user)):
     service = SessionsService(get_mongo_db(), redisClient)
@@ -7,9 +7,7 @@ from pydantic import BaseModel, EmailStr
 import uuid
 import os
 import regex as re
-import bcrypt
-import hashlib
-from app.middlewares.ratelimiter import rate_limiter
+from app.core.hashing import hash_password_async, verify_password_async
 from app.core.redis_Client import redisClient
 import json
 
@@ -27,20 +25,6 @@ async def cache_test():
     return {"cached_value": val}
 
 
-def hash_password(password: str) -> str:
-    """Hash a password using bcrypt with SHA256 pre-hashing."""
-    prehashed = hashlib.sha256(password.encode('utf-8')).hexdigest()
-    salt = bcrypt.gensalt(rounds=12)
-    hashed = bcrypt.hashpw(prehashed.encode('utf-8'), salt)
-    return hashed.decode('utf-8')
-
-
-def verify_password(password: str, hashed_password: str) -> bool:
-    """Verify a password against a bcrypt hash."""
-    prehashed = hashlib.sha256(password.encode('utf-8')).hexdigest()
-    return bcrypt.checkpw(prehashed.encode('utf-8'), hashed_password.encode('utf-8'))
-
-
 class userCreate(BaseModel):
     firstname: str
     lastname: str
@@ -75,7 +59,7 @@ async def CreateUser(user: userCreate, db: AsyncSession = Depends(get_db)):
             )
         
         # Hash the password
-        hashed_password = hash_password(user.password)
+        hashed_password = await hash_password_async(user.password)
 
         # SQLAlchemy: Create new user
         new_user = User(
@@ -108,7 +92,7 @@ async def CreateUser(user: userCreate, db: AsyncSession = Depends(get_db)):
         )
 
 
-@router.post("/signin", dependencies=[Depends(rate_limiter)])
+@router.post("/signin")
 async def userSignIn(
     request: LoginRequest, 
     response: Response, 
@@ -135,7 +119,7 @@ async def userSignIn(
             )
 
         # Verify password
-        if not verify_password(request.password, existing_user.password_hash):
+        if not await verify_password_async(request.password, existing_user.password_hash):
             raise HTTPException(status_code=401, detail="Invalid email or password")
 
         # Create session
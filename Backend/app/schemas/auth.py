@@ -1,3 +1,4 @@
+import uuid
 from datetime import datetime
 from pydantic import BaseModel, EmailStr, Field
 
@@ -36,3 +37,12 @@ class AuthResponse(BaseModel):
     refresh_token: str
     expires_at: datetime
     has_onboarded: bool
+
+
+class Principal(BaseModel):
+    user_id: uuid.UUID
+    email: str
+    has_onboarded: bool = False
+    generation: int = 0
+    first_name: str | None = None
+    last_name: str | None = None
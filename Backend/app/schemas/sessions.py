@@ -1,4 +1,6 @@
 from datetime import datetime
+from typing import Any
+
 from pydantic import BaseModel, Field
 
 
@@ -18,6 +20,23 @@ class SessionResponse(BaseModel):
     id: str
 
 
+class SessionBatchRequest(BaseModel):
+    # Items are validated one by one so a bad item is reported, not fatal.
+    items: list[dict[str, Any]] = Field(min_length=1, max_length=1000)
+
+
+class SessionBatchItemResult(BaseModel):
+    index: int
+    id: str | None = None
+    error: str | None = None
+
+
+class SessionBatchResponse(BaseModel):
+    inserted: int
+    failed: int
+    results: list[SessionBatchItemResult]
+
+
 class TodaySummaryResponse(BaseModel):
     current_mood: int | None
     current_energy: str | None
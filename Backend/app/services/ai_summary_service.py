@@ -0,0 +1,380 @@
+"""
+Weekly AI summary: cache lookup, generation and coalescing.
+
+A summary is cached per user and week as a hash under
+`ai:summary:{user}:{week}` holding the text, its source (gemini or fallback),
+when it was generated and until when it is fresh. Gemini summaries stay fresh
+for AI_SUMMARY_FRESH_SECONDS, fallbacks only for
+AI_SUMMARY_FALLBACK_FRESH_SECONDS. A stale entry is still served immediately
+while a background-priority job on the LLM queue tries to replace it; a
+refresh that only gets a fallback keeps an older Gemini summary and just
+retries later.
+
+On a miss only one generation per key runs at a time: concurrent callers in
+the same worker share it through SingleFlight, and callers in other workers
+see the Redis lock and wait for its result in the cache, or get a
+placeholder if it does not arrive within their deadline. The cache write is
+fenced, so a generation that outlived its lock cannot overwrite a newer one.
+When this worker's LLM slots are all busy or the queue is deep, a miss is
+queued as an interactive job instead and the caller gets its status to poll.
+
+`stream_summary` is the server-sent-events variant used by
+GET /ai/summary/stream: on a miss it relays Gemini's text as it is generated
+and caches the assembled summary at the end.
+"""
+import asyncio
+import json
+import time
+from contextlib import aclosing
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from redis.asyncio import Redis
+from redis.exceptions import ResponseError
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.llm_queue import BACKGROUND, INTERACTIVE, job_status, llm_jobs, slots_exhausted
+from app.core.redis_Client import redisClient
+from app.core.redis_cache import client_cache
+from app.core.singleflight import RedisLock, SingleFlight
+from app.services.analytics_service import AnalyticsService
+from app.services.gemini_service import GeminiError, GeminiService
+
+PENDING_SUMMARY = "Your weekly summary is being prepared. Check back in a moment."
+
+summary_flights = SingleFlight("ai_summary")
+metrics.register_provider("ai_summary", lambda: {"in_flight": summary_flights.in_flight()})
+
+
+class AISummaryService:
+    def __init__(
+        self,
+        mongo: AsyncIOMotorDatabase,
+        redis: Redis = redisClient,
+        gemini: GeminiService | None = None,
+    ) -> None:
+        self.mongo = mongo
+        self.redis = redis
+        self.gemini = gemini or GeminiService()
+        self.analytics = AnalyticsService(mongo)
+
+    async def get_summary(self, user_id: str, deadline: float) -> dict[str, Any]:
+        key = summary_key(user_id)
+        entry = await self.read_entry(key, cached=True)
+        if entry:
+            fresh = is_fresh(entry)
+            metrics.incr("ai_summary.hit_fresh" if fresh else "ai_summary.hit_stale")
+            if not fresh:
+                await self._refresh_in_background(user_id, key)
+            return summary_response(entry, cached=True)
+        if slots_exhausted() or await llm_jobs.depth() >= settings.LLM_QUEUE_DEFER_DEPTH:
+            # Running it inline would only queue behind other LLM calls; let a queue consumer do it.
+            metrics.incr("ai_summary.deferred")
+            job_id = await llm_jobs.enqueue(key, INTERACTIVE, user_id=user_id)
+            return job_status(job_id, await llm_jobs.get(job_id))
+        return await summary_flights.do(key, lambda: self._generate_once(user_id, key, deadline))
+
+    async def get_job(self, user_id: str, job_id: str) -> dict[str, Any] | None:
+        """The result of a queued summary job, or its status while pending; None if not the user's."""
+        job = await llm_jobs.get(job_id)
+        if not job or job.get("user_id") != user_id:
+            return None
+        if job["status"] == "done":
+            return json.loads(job["result"])
+        return job_status(job_id, job)
+
+    async def stream_summary(self, user_id: str) -> AsyncIterator[str]:
+        """SSE events for the weekly summary.
+
+        `chunk` events ({"text": ...}) carry text as Gemini generates it; one
+        `summary` event (the get_summary response) ends the stream. A cache hit
+        is just the `summary` event. If Gemini or anything after the first
+        event fails, the `summary` event carries the fallback and replaces the
+        chunks already sent. When the summary was queued instead, a `pending`
+        event carries the job status, and the stream then waits for the job
+        until the deadline: it ends with the `summary` event, an `error` event
+        if the job failed, or nothing more if it is still queued, in which
+        case the client polls /ai/summary/jobs/{job_id}.
+        """
+        key = summary_key(user_id)
+        deadline = time.monotonic() + settings.AI_SUMMARY_DEADLINE_SECONDS
+        entry = await self.read_entry(key, cached=True)
+        if entry:
+            if not is_fresh(entry):
+                await self._refresh_in_background(user_id, key)
+            yield sse_event("summary", summary_response(entry, cached=True))
+            return
+
+        lock = RedisLock(key, settings.AI_SUMMARY_LOCK_TTL_SECONDS, self.redis)
+        if not self.gemini.is_configured() or not await lock.acquire():
+            # Nothing to stream from, or another caller is generating it: wait like GET /ai/summary.
+            try:
+                result = await self.get_summary(user_id, deadline)
+                if "job_id" in result:
+                    yield sse_event("pending", result)
+                    job = await self._wait_for_job(user_id, result["job_id"], deadline)
+                    if job is None:
+                        return
+                    if job.get("status") == "failed":
+                        yield sse_event("error", {"detail": "Summary generation failed"})
+                        return
+                    result = job
+            except Exception as e:
+                result = self._stream_failed(user_id, e, fallback_summary({}), "fallback")
+            yield sse_event("summary", result)
+            return
+
+        data: dict[str, Any] = {}
+        summary = source = None
+        try:
+            current = await self.read_entry(key)
+            if current:
+                yield sse_event("summary", summary_response(current, cached=True))
+                return
+
+            data = await self.weekly_data(user_id)
+            metrics.incr("ai_summary.streamed")
+            chunks: list[str] = []
+            try:
+                # aclosing closes the upstream request as soon as we stop, including on disconnect.
+                async with aclosing(self.gemini.stream_weekly_summary(data, deadline)) as stream:
+                    async for text in stream:
+                        chunks.append(text)
+                        yield sse_event("chunk", {"text": text})
+                summary, source = "".join(chunks).strip(), "gemini"
+                if not summary:
+                    raise GeminiError("Gemini returned empty content")
+            except Exception:
+                summary, source = fallback_summary(data), "fallback"
+            entry, stored = await self.store(lock, key, summary, source)
+            yield sse_event("summary", summary_response(entry, cached=not stored))
+        except (asyncio.CancelledError, GeneratorExit):
+            # The client went away; the partial text is not cached.
+            metrics.incr("ai_summary.stream_cancelled")
+            raise
+        except Exception as e:
+            # Keep a Gemini summary that only failed to be cached.
+            yield sse_event("summary", self._stream_failed(user_id, e, summary or fallback_summary(data), source))
+        finally:
+            await asyncio.shield(lock.release())
+
+    async def read_entry(self, key: str, cached: bool = False) -> dict[str, str] | None:
+        """The cache entry under `key`, or None; `cached` allows the worker-local copy."""
+        try:
+            entry = await (client_cache.hgetall(key) if cached else self.redis.hgetall(key))
+        except ResponseError:
+            # A plain-string entry written before summaries carried metadata.
+            return None
+        return entry if entry and "summary" in entry else None
+
+    async def weekly_data(self, user_id: str) -> dict[str, Any]:
+        weekly_data, insights = await asyncio.gather(
+            self.analytics.weekly_summary_data(user_id),
+            self.analytics.build_insights(user_id),
+        )
+        weekly_data["mood_energy_insight"] = insights.moodEnergyInsight
+        weekly_data["best_windows"] = format_best_windows(insights.bestDeepWorkSlots)
+        return weekly_data
+
+    async def generate(self, data: dict[str, Any], deadline: float) -> tuple[str, str]:
+        """Summary text and its source, "gemini" or "fallback"."""
+        if self.gemini.is_configured():
+            try:
+                return await self.gemini.generate_weekly_summary(data, deadline=deadline), "gemini"
+            except Exception:
+                pass
+        return fallback_summary(data), "fallback"
+
+    async def store(
+        self,
+        lock: RedisLock,
+        key: str,
+        summary: str,
+        source: str,
+        generated_at: float | None = None,
+        fresh_seconds: int | None = None,
+    ) -> tuple[dict[str, str], bool]:
+        """Cache a summary under `key`, fenced by the caller's lock.
+
+        Returns the cached entry and whether it is the one just written. A
+        caller whose lock expired mid-generation loses to the newer holder's
+        write, and gets that holder's entry back instead.
+        """
+        now = time.time()
+        if fresh_seconds is None:
+            fresh_seconds = (
+                settings.AI_SUMMARY_FRESH_SECONDS if source == "gemini" else settings.AI_SUMMARY_FALLBACK_FRESH_SECONDS
+            )
+        entry = {
+            "summary": summary,
+            "source": source,
+            "generated_at": str(generated_at or now),
+            "fresh_until": str(now + fresh_seconds),
+        }
+        if await lock.fenced_hset(key, entry, cache_ttl_seconds()):
+            return entry, True
+        metrics.incr("ai_summary.store_superseded")
+        return (await self.read_entry(key)) or entry, False
+
+    async def _generate_once(self, user_id: str, key: str, deadline: float) -> dict[str, Any]:
+        lock = RedisLock(key, settings.AI_SUMMARY_LOCK_TTL_SECONDS, self.redis)
+        if not await lock.acquire():
+            metrics.incr("ai_summary.coalesced_remote")
+            return await self._wait_for(user_id, key, lock, deadline)
+
+        try:
+            # Another worker may have finished between our read and the lock.
+            current = await self.read_entry(key)
+            if current and is_fresh(current):
+                return summary_response(current, cached=True)
+
+            metrics.incr("ai_summary.generated")
+            summary, source = await self.generate(await self.weekly_data(user_id), deadline)
+            if source == "fallback" and current and current["source"] == "gemini":
+                # Keep the older Gemini summary and try again after the fallback TTL.
+                entry, _ = await self.store(
+                    lock,
+                    key,
+                    current["summary"],
+                    "gemini",
+                    generated_at=float(current["generated_at"]),
+                    fresh_seconds=settings.AI_SUMMARY_FALLBACK_FRESH_SECONDS,
+                )
+                return summary_response(entry, cached=True)
+            entry, stored = await self.store(lock, key, summary, source)
+            return summary_response(entry, cached=not stored)
+        finally:
+            await lock.release()
+
+    async def _refresh_in_background(self, user_id: str, key: str) -> None:
+        # The job id is derived from the key, so repeated stale reads queue one refresh.
+        try:
+            await llm_jobs.enqueue(key, BACKGROUND, user_id=user_id)
+        except Exception as e:
+            print(f"❌ AI summary refresh could not be queued: {e}")
+
+    def _stream_failed(self, user_id: str, error: Exception, summary: str, source: str | None) -> dict[str, Any]:
+        """An uncached summary response for a stream that failed after the response started."""
+        metrics.incr("ai_summary.stream_errors")
+        print(f"❌ AI summary stream failed for {user_id}: {error}")
+        now = time.time()
+        entry = {
+            "summary": summary,
+            "source": source or "fallback",
+            "generated_at": str(now),
+            "fresh_until": str(now + settings.AI_SUMMARY_FALLBACK_FRESH_SECONDS),
+        }
+        return summary_response(entry, cached=False)
+
+    async def _wait_for_job(self, user_id: str, job_id: str, deadline: float) -> dict[str, Any] | None:
+        """The finished job's summary, or its status if it failed; None if still pending at the deadline."""
+        while time.monotonic() + settings.LLM_QUEUE_POLL_SECONDS < deadline:
+            await asyncio.sleep(settings.LLM_QUEUE_POLL_SECONDS)
+            result = await self.get_job(user_id, job_id)
+            if result is None:
+                # Expired from Redis; the client's own poll will report it.
+                return None
+            if "job_id" not in result or result["status"] == "failed":
+                return result
+        return None
+
+    async def _wait_for(self, user_id: str, key: str, lock: RedisLock, deadline: float) -> dict[str, Any]:
+        while time.monotonic() + settings.AI_SUMMARY_LOCK_POLL_SECONDS < deadline:
+            await asyncio.sleep(settings.AI_SUMMARY_LOCK_POLL_SECONDS)
+            entry = await self.read_entry(key)
+            if entry:
+                return summary_response(entry, cached=True)
+            if not await self.redis.exists(lock.key):
+                # The holder gave up without a result; take over.
+                return await self._generate_once(user_id, key, deadline)
+
+        metrics.incr("ai_summary.placeholder")
+        return {"summary": PENDING_SUMMARY, "source": "pending", "cached": False, "stale": False, "age_seconds": 0}
+
+
+async def run_summary_jobs(mongo: AsyncIOMotorDatabase) -> None:
+    """One LLM queue consumer, started LLM_QUEUE_WORKERS times from the app lifespan."""
+    service = AISummaryService(mongo)
+    while True:
+        try:
+            popped = await llm_jobs.pop()
+            if popped is None:
+                continue
+            job_id, job = popped
+            deadline = time.monotonic() + settings.AI_SUMMARY_DEADLINE_SECONDS
+            try:
+                result = await summary_flights.do(
+                    job["key"], lambda: service._generate_once(job["user_id"], job["key"], deadline)
+                )
+                await llm_jobs.finish(job_id, "done", result=json.dumps(result))
+            except Exception as e:
+                await llm_jobs.finish(job_id, "failed", error=str(e))
+                print(f"❌ AI summary job {job_id} failed: {e}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"❌ LLM queue consumer error: {e}")
+            await asyncio.sleep(settings.LLM_QUEUE_POLL_SECONDS)
+
+
+def sse_event(event: str, payload: dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+def is_fresh(entry: dict[str, str]) -> bool:
+    return float(entry.get("fresh_until", 0)) > time.time()
+
+
+def summary_response(entry: dict[str, str], cached: bool) -> dict[str, Any]:
+    generated_at = float(entry["generated_at"])
+    return {
+        "summary": entry["summary"],
+        "source": entry["source"],
+        "cached": cached,
+        "stale": not is_fresh(entry),
+        "age_seconds": max(0, int(time.time() - generated_at)),
+        "generated_at": datetime.fromtimestamp(generated_at, tz=timezone.utc).isoformat(),
+    }
+
+
+def summary_key(user_id: str, week_start: str | None = None) -> str:
+    return f"ai:summary:{user_id}:{week_start or week_start_key()}"
+
+
+def week_start_key() -> str:
+    now = datetime.now(tz=timezone.utc)
+    start = now - timedelta(days=now.weekday())
+    return start.date().isoformat()
+
+
+def cache_ttl_seconds() -> int:
+    now = datetime.now(tz=timezone.utc)
+    end = now + timedelta(days=7 - now.weekday())
+    return int((end - now).total_seconds())
+
+
+def format_best_windows(slots) -> str:
+    top = sorted(slots, key=lambda s: s.score, reverse=True)[:3]
+    if not top:
+        return "n/a"
+    return ", ".join([f"{_day_label(s.dayOfWeek)} {s.hour}:00" for s in top])
+
+
+def _day_label(day_index: int) -> str:
+    labels = ["Sun", "Mon", "Tue", "Wed", "Thu", "Fri", "Sat"]
+    if 0 <= day_index < len(labels):
+        return labels[day_index]
+    return "Day"
+
+
+def fallback_summary(data: dict) -> str:
+    return (
+        f"You logged {data.get('total_sessions', 0)} sessions for "
+        f"{data.get('total_focus_minutes', 0)} minutes this week. "
+        f"Your top task was {data.get('top_task_type', 'n/a')}. "
+        f"Average mood was {data.get('average_mood', 'n/a')} and energy {data.get('average_energy', 'n/a')}. "
+        f"Best deep work windows: {data.get('best_windows', 'n/a')}. "
+        "Pick one window next week and protect it for focused work."
+    )
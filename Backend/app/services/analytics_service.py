@@ -1,41 +1,28 @@
+import asyncio
 from datetime import datetime, timedelta, timezone
 
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
+from app.core.user_timezone import local_today, user_timezones
 from app.schemas.analytics import DeepWorkSlot, InsightsResponse, WarningCard
+from app.services.rollup_service import RollupService, day_key, summarize_days
 
 
 class AnalyticsService:
     def __init__(self, mongo: AsyncIOMotorDatabase) -> None:
         self.mongo = mongo
         self.collection = mongo.get_collection("work_sessions")
+        self.rollups = RollupService(mongo)
 
     async def weekly_summary_data(self, user_id: str) -> dict:
-        start = datetime.now(tz=timezone.utc) - timedelta(days=7)
-        pipeline = [
-            {"$match": {"user_id": user_id, "timestamp": {"$gte": start}}},
-            {
-                "$group": {
-                    "_id": None,
-                    "total_sessions": {"$sum": 1},
-                    "total_focus_minutes": {"$sum": "$duration_minutes"},
-                    "average_mood": {"$avg": "$mood"},
-                    "average_energy": {"$avg": "$energy"},
-                }
-            },
-        ]
+        return await self.period_summary_data(user_id, days=7)
 
-        summary = await self.collection.aggregate(pipeline).to_list(length=1)
-        top_task = await self.collection.aggregate(
-            [
-                {"$match": {"user_id": user_id, "timestamp": {"$gte": start}}},
-                {"$group": {"_id": "$task_type", "count": {"$sum": 1}}},
-                {"$sort": {"count": -1}},
-                {"$limit": 1},
-            ]
-        ).to_list(length=1)
+    async def period_summary_data(self, user_id: str, days: int) -> dict:
+        """Totals over the user's last `days` local calendar days, today included, read from daily rollups."""
+        end = day_key(local_today(await user_timezones.get(user_id))) + timedelta(days=1)
+        summary = summarize_days(await self.rollups.read_days(user_id, end - timedelta(days=days), end))
 
-        if not summary:
+        if not summary["total_sessions"]:
             return {
                 "total_sessions": 0,
                 "total_focus_minutes": 0,
@@ -44,20 +31,23 @@ class AnalyticsService:
                 "top_task_type": "n/a",
             }
 
-        average_mood = summary[0].get("average_mood")
-        average_energy = summary[0].get("average_energy")
+        average_mood = summary["average_mood"]
+        average_energy = summary["average_energy"]
 
         return {
-            "total_sessions": summary[0].get("total_sessions", 0),
-            "total_focus_minutes": summary[0].get("total_focus_minutes", 0),
+            "total_sessions": summary["total_sessions"],
+            "total_focus_minutes": summary["total_focus_minutes"],
             "average_mood": round(average_mood, 1) if average_mood is not None else "n/a",
             "average_energy": round(average_energy, 1) if average_energy is not None else "n/a",
-            "top_task_type": top_task[0]["_id"] if top_task else "n/a",
+            "top_task_type": summary["top_task_type"] or "n/a",
         }
 
     async def build_insights(self, user_id: str) -> InsightsResponse:
-        slots = await self._deep_work_slots(user_id)
-        mood_insight = await self._mood_energy_insight(user_id)
+        # Independent reads: latency is the slower of the two, not their sum.
+        slots, mood_insight = await asyncio.gather(
+            self._deep_work_slots(user_id),
+            self._mood_energy_insight(user_id),
+        )
 
         warning_card = None
         if not slots:
@@ -74,38 +64,20 @@ class AnalyticsService:
         )
 
     async def _deep_work_slots(self, user_id: str) -> list[DeepWorkSlot]:
-        start = datetime.now(tz=timezone.utc) - timedelta(days=30)
-        pipeline = [
-            {
-                "$match": {
-                    "user_id": user_id,
-                    "task_type": "Deep work",
-                    "timestamp": {"$gte": start},
-                }
-            },
-            {
-                "$group": {
-                    "_id": {
-                        "dayOfWeek": {"$dayOfWeek": "$timestamp"},
-                        "hour": {"$hour": "$timestamp"},
-                    },
-                    "avg_duration": {"$avg": "$duration_minutes"},
-                    "count": {"$sum": 1},
-                }
-            },
-            {
-                "$project": {
-                    "_id": 0,
-                    "dayOfWeek": {"$subtract": ["$_id.dayOfWeek", 1]},
-                    "hour": "$_id.hour",
-                    "score": {"$add": ["$avg_duration", "$count"]},
-                }
-            },
-            {"$sort": {"score": -1}},
+        # Whole local days: the hourly buckets are day-granular.
+        start = day_key(local_today(await user_timezones.get(user_id))) - timedelta(days=30)
+        buckets = await self.rollups.read_slots(user_id, "Deep work", start)
+        slots = [
+            DeepWorkSlot(
+                dayOfWeek=bucket["dayOfWeek"],
+                hour=bucket["hour"],
+                score=bucket["duration_sum"] / bucket["count"] + bucket["count"],
+            )
+            for bucket in buckets
+            if bucket["count"] > 0
         ]
-
-        results = await self.collection.aggregate(pipeline).to_list(length=84)
-        return [DeepWorkSlot(**item) for item in results]
+        slots.sort(key=lambda slot: slot.score, reverse=True)
+        return slots[:84]
 
     async def _mood_energy_insight(self, user_id: str) -> str:
         start = datetime.now(tz=timezone.utc) - timedelta(days=30)
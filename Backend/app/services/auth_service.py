@@ -4,18 +4,30 @@ import uuid
 from fastapi import HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.hashing import hash_password_async, verify_password_async
 from app.core.redis_Client import redisClient
 from app.core.security import (
     create_access_token,
     create_refresh_token,
     decode_token,
-    hash_password,
     hash_token,
-    verify_password,
 )
 from app.repositories.auth_sessions import AuthSessionRepository
 from app.repositories.users import UserRepository
 
+# Compare-and-swap of the refresh key: only the caller that still sees the old
+# jti mapped to its session gets to move it to the new jti. Concurrent refreshes
+# of the same token are serialized by Redis, so exactly one of them wins.
+ROTATE_REFRESH_LUA = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+redis.call('SET', KEYS[2], ARGV[2], 'EX', ARGV[3])
+return 1
+"""
+rotate_refresh_script = redisClient.register_script(ROTATE_REFRESH_LUA)
+
 
 class AuthService:
     def __init__(self, session: AsyncSession) -> None:
@@ -28,10 +40,10 @@ class AuthService:
         if existing:
             raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Email already registered")
 
-        hashed = hash_password(password)
+        hashed = await hash_password_async(password)
         user = await self.user_repo.create(email=email, hashed_password=hashed, first_name=first_name, last_name=last_name)
         return await self._issue_tokens(
-            user.user_id, user.email, user.has_onboarded, None, None, None, None
+            user.user_id, user.email, user.has_onboarded, user.generation, None, None, None, None
         )
 
     async def login(
@@ -44,13 +56,14 @@ class AuthService:
         user_agent: str | None,
     ):
         user = await self.user_repo.get_by_email(email)
-        if not user or not verify_password(password, user.hashed_password):
+        if not user or not await verify_password_async(password, user.hashed_password):
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
 
         return await self._issue_tokens(
             user.user_id,
             user.email,
             user.has_onboarded,
+            user.generation,
             device_name,
             device_id,
             ip_address,
@@ -63,27 +76,43 @@ class AuthService:
         session_id = payload["sid"]
         user_id = payload["sub"]
 
-        stored = await redisClient.get(self._refresh_key(jti))
-        if not stored or stored != session_id:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token expired")
-
-        auth_session = await self.auth_repo.get_by_id(session_id)
-        if not auth_session or auth_session.is_revoked:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token revoked")
+        new_session_id = uuid.uuid4()
+        refresh = create_refresh_token(uuid.UUID(user_id), new_session_id)
+        ttl = int((refresh["expires_at"] - datetime.now(tz=timezone.utc)).total_seconds())
 
-        if auth_session.refresh_token_hash != hash_token(refresh_token):
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token mismatch")
+        # One Redis round trip decides which concurrent refresh wins.
+        swapped = await rotate_refresh_script(
+            keys=[self._refresh_key(jti), self._refresh_key(refresh["jti"])],
+            args=[session_id, str(new_session_id), ttl],
+        )
+        if not swapped:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token expired")
 
-        user = await self.user_repo.get_by_id(user_id)
+        # One Postgres statement revokes the old session and inserts the new one.
+        try:
+            user = await self.auth_repo.rotate(
+                old_session_id=session_id,
+                old_refresh_token_hash=hash_token(refresh_token),
+                new_session_id=str(new_session_id),
+                new_refresh_token_hash=hash_token(refresh["token"]),
+                expires_at=refresh["expires_at"],
+            )
+        except Exception:
+            await redisClient.delete(self._refresh_key(refresh["jti"]))
+            raise
         if not user:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
-
-        await redisClient.delete(self._refresh_key(jti))
-        await self.auth_repo.revoke(session_id)
+            # The old key is already consumed, so a rejected rotation means logging in again.
+            await redisClient.delete(self._refresh_key(refresh["jti"]))
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token revoked")
 
-        return await self._issue_tokens(
-            user.user_id, user.email, user.has_onboarded, None, None, None, None
-        )
+        access = create_access_token(user["user_id"], user["email"], user["has_onboarded"], user["generation"])
+        return {
+            "user_id": str(user["user_id"]),
+            "access_token": access["token"],
+            "refresh_token": refresh["token"],
+            "expires_at": access["expires_at"],
+            "has_onboarded": user["has_onboarded"],
+        }
 
     async def logout(self, refresh_token: str):
         payload = decode_token(refresh_token, "refresh")
@@ -98,12 +127,13 @@ class AuthService:
         user_id: uuid.UUID,
         email: str,
         has_onboarded: bool,
+        generation: int,
         device_name: str | None,
         device_id: str | None,
         ip_address: str | None,
         user_agent: str | None,
     ):
-        access = create_access_token(user_id, email)
+        access = create_access_token(user_id, email, has_onboarded, generation)
         session_id = uuid.uuid4()
         refresh = create_refresh_token(user_id, session_id)
         refresh_hash = hash_token(refresh["token"])
@@ -1,63 +1,231 @@
 from __future__ import annotations
 
+import asyncio
+import json
 import os
-from typing import Any
+import random
+import time
+from typing import Any, AsyncIterator
 
 import httpx
 
+from app.core import metrics
+from app.core.config import settings
+from app.core.http_clients import gemini_http
+from app.core.llm_queue import llm_slot
+from app.core.prompt_cache import prompt_cache
 from app.services.gemini_prompts import WEEKLY_SUMMARY_SYSTEM, WEEKLY_SUMMARY_USER
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
 GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
-GEMINI_URL = "https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent"
+GEMINI_PATH = "/v1beta/models/{model}:generateContent"
+GEMINI_STREAM_PATH = "/v1beta/models/{model}:streamGenerateContent"
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# An attempt with less time than this left is not worth starting.
+MIN_ATTEMPT_SECONDS = 0.25
+
+
+class GeminiError(RuntimeError):
+    pass
+
+
+class GeminiDeadlineExceeded(GeminiError):
+    pass
 
 
 class GeminiService:
-    def __init__(self, api_key: str | None = None, model: str | None = None) -> None:
+    def __init__(
+        self,
+        api_key: str | None = None,
+        model: str | None = None,
+        client: httpx.AsyncClient | None = None,
+    ) -> None:
         self.api_key = api_key or GEMINI_API_KEY
         self.model = model or GEMINI_MODEL
+        self.client = client or gemini_http.client
 
     def is_configured(self) -> bool:
         return bool(self.api_key)
 
-    async def generate_weekly_summary(self, data: dict[str, Any]) -> str:
+    async def generate_weekly_summary(self, data: dict[str, Any], deadline: float | None = None) -> str:
+        """Generate the summary text; `deadline` is a time.monotonic() instant covering all retries."""
         if not self.api_key:
             raise RuntimeError("Gemini API key not configured")
 
-        user_prompt = WEEKLY_SUMMARY_USER.format(
-            total_sessions=data.get("total_sessions", 0),
-            total_focus_minutes=data.get("total_focus_minutes", 0),
-            average_mood=data.get("average_mood", "n/a"),
-            average_energy=data.get("average_energy", "n/a"),
-            top_task_type=data.get("top_task_type", "n/a"),
-            best_windows=data.get("best_windows", "n/a"),
-            mood_energy_insight=data.get("mood_energy_insight", "n/a"),
-        )
-
-        payload = {
-            "contents": [
-                {
-                    "role": "user",
-                    "parts": [
-                        {"text": WEEKLY_SUMMARY_SYSTEM},
-                        {"text": user_prompt},
-                    ],
-                }
-            ]
-        }
-
-        url = GEMINI_URL.format(model=self.model)
-        async with httpx.AsyncClient(timeout=20.0) as client:
-            response = await client.post(url, params={"key": self.api_key}, json=payload)
-            response.raise_for_status()
-            data = response.json()
+        payload = weekly_summary_payload(data)
+        cache_key = prompt_cache.key(self.model, payload)
+        cached = await prompt_cache.get(cache_key)
+        if cached:
+            return cached
+
+        data = await self._post(GEMINI_PATH.format(model=self.model), payload, deadline)
 
         candidates = data.get("candidates", [])
         if not candidates:
-            raise RuntimeError("Gemini returned no candidates")
+            raise GeminiError("Gemini returned no candidates")
 
         parts = candidates[0].get("content", {}).get("parts", [])
         if not parts:
-            raise RuntimeError("Gemini returned empty content")
+            raise GeminiError("Gemini returned empty content")
+
+        text = parts[0].get("text", "").strip()
+        await prompt_cache.set(cache_key, text)
+        return text
+
+    async def stream_weekly_summary(
+        self, data: dict[str, Any], deadline: float | None = None
+    ) -> AsyncIterator[str]:
+        """Yield the summary text as Gemini generates it.
+
+        Not retried: a failure after the first chunk cannot be replayed
+        transparently, so callers fall back instead. Closing the iterator
+        closes the upstream connection, which stops the generation.
+        """
+        if not self.api_key:
+            raise RuntimeError("Gemini API key not configured")
+        if deadline is None:
+            deadline = time.monotonic() + settings.AI_SUMMARY_DEADLINE_SECONDS
+
+        remaining = deadline - time.monotonic()
+        if remaining < MIN_ATTEMPT_SECONDS:
+            metrics.incr("gemini.deadline_exceeded")
+            raise GeminiDeadlineExceeded("Gemini deadline exceeded")
+
+        payload = weekly_summary_payload(data)
+        cache_key = prompt_cache.key(self.model, payload)
+        cached = await prompt_cache.get(cache_key)
+        if cached:
+            yield cached
+            return
+
+        metrics.incr("gemini.streams")
+        chunks: list[str] = []
+        async with llm_slot(remaining), self.client.stream(
+            "POST",
+            GEMINI_STREAM_PATH.format(model=self.model),
+            params={"key": self.api_key, "alt": "sse"},
+            json=payload,
+            timeout=httpx.Timeout(remaining, connect=min(remaining, settings.GEMINI_CONNECT_TIMEOUT_SECONDS)),
+        ) as response:
+            if response.status_code != 200:
+                await response.aread()
+                metrics.incr("gemini.failures")
+                response.raise_for_status()
+            async for line in response.aiter_lines():
+                if time.monotonic() > deadline:
+                    metrics.incr("gemini.deadline_exceeded")
+                    raise GeminiDeadlineExceeded("Gemini deadline exceeded")
+                if not line.startswith("data:"):
+                    continue
+                for candidate in json.loads(line[5:]).get("candidates", [])[:1]:
+                    for part in candidate.get("content", {}).get("parts", []):
+                        if part.get("text"):
+                            chunks.append(part["text"])
+                            yield part["text"]
+        # Only reached when the stream completed.
+        await prompt_cache.set(cache_key, "".join(chunks).strip())
+
+    async def _post(self, path: str, payload: dict[str, Any], deadline: float | None) -> dict[str, Any]:
+        if deadline is None:
+            deadline = time.monotonic() + settings.AI_SUMMARY_DEADLINE_SECONDS
+
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining < MIN_ATTEMPT_SECONDS:
+                metrics.incr("gemini.deadline_exceeded")
+                raise GeminiDeadlineExceeded("Gemini deadline exceeded")
+
+            metrics.incr("gemini.requests")
+            retry_after = None
+            try:
+                async with llm_slot(remaining):
+                    remaining = deadline - time.monotonic()
+                    # httpx timeouts apply per phase; wait_for bounds the whole attempt.
+                    response = await asyncio.wait_for(
+                        self.client.post(
+                            path,
+                            params={"key": self.api_key},
+                            json=payload,
+                            timeout=httpx.Timeout(
+                                remaining, connect=min(remaining, settings.GEMINI_CONNECT_TIMEOUT_SECONDS)
+                            ),
+                        ),
+                        timeout=remaining,
+                    )
+                if response.status_code not in RETRY_STATUSES:
+                    response.raise_for_status()
+                    return response.json()
+                error: Exception = httpx.HTTPStatusError(
+                    f"Gemini returned {response.status_code}", request=response.request, response=response
+                )
+                retry_after = _retry_after_seconds(response)
+            except (httpx.TransportError, asyncio.TimeoutError) as e:
+                # Timeouts, connection resets and refused connections.
+                error = e
+
+            if attempt >= settings.GEMINI_MAX_RETRIES:
+                metrics.incr("gemini.failures")
+                raise error
+
+            # Full jitter keeps workers that failed together from retrying together.
+            backoff = min(settings.GEMINI_BACKOFF_MAX_SECONDS, settings.GEMINI_BACKOFF_BASE_SECONDS * 2**attempt)
+            delay = random.uniform(0, backoff)
+            if retry_after is not None:
+                delay = max(delay, retry_after)
+            if time.monotonic() + delay + MIN_ATTEMPT_SECONDS > deadline:
+                metrics.incr("gemini.failures")
+                raise error
+
+            attempt += 1
+            metrics.incr("gemini.retries")
+            await asyncio.sleep(delay)
+
+
+def weekly_summary_payload(data: dict[str, Any]) -> dict[str, Any]:
+    if settings.AI_PROMPT_QUANTIZE:
+        data = _quantized(data)
+    user_prompt = WEEKLY_SUMMARY_USER.format(
+        total_sessions=data.get("total_sessions", 0),
+        total_focus_minutes=data.get("total_focus_minutes", 0),
+        average_mood=data.get("average_mood", "n/a"),
+        average_energy=data.get("average_energy", "n/a"),
+        top_task_type=data.get("top_task_type", "n/a"),
+        best_windows=data.get("best_windows", "n/a"),
+        mood_energy_insight=data.get("mood_energy_insight", "n/a"),
+    )
+    return {
+        "contents": [
+            {
+                "role": "user",
+                "parts": [
+                    {"text": WEEKLY_SUMMARY_SYSTEM},
+                    {"text": user_prompt},
+                ],
+            }
+        ]
+    }
+
+
+def _quantized(data: dict[str, Any]) -> dict[str, Any]:
+    """Round the numeric stats so near-identical weeks render the same prompt."""
+    step = settings.AI_PROMPT_QUANTIZE_MINUTES
+    data = dict(data)
+    if isinstance(data.get("total_focus_minutes"), (int, float)):
+        data["total_focus_minutes"] = int(round(data["total_focus_minutes"] / step) * step)
+    for field in ("average_mood", "average_energy"):
+        if isinstance(data.get(field), (int, float)):
+            data[field] = round(data[field] * 2) / 2
+    return data
+
 
-        return parts[0].get("text", "").strip()
+def _retry_after_seconds(response: httpx.Response) -> float | None:
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        # HTTP-date form; not worth parsing, fall back to backoff.
+        return None
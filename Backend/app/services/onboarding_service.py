@@ -1,5 +1,6 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.principal_cache import principal_cache
 from app.repositories.users import UserRepository
 
 
@@ -10,4 +11,8 @@ class OnboardingService:
 
     async def complete(self, user_id: str):
         user = await self.user_repo.set_onboarded(user_id)
+        if user:
+            await principal_cache.invalidate(user_id)
+            # Claims-only tokens issued before this still say has_onboarded=False.
+            await principal_cache.record_generation(user_id, user.generation)
         return user
@@ -1,73 +1,266 @@
 from __future__ import annotations
 
+from collections import defaultdict
 from datetime import datetime, timedelta, timezone
+from typing import Any
 
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from redis.asyncio import Redis
+from redis.exceptions import WatchError
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.redis_Client import redisClient
+from app.core.user_timezone import user_timezones
+from app.services.rollup_service import SESSION_HOUR_EXPR, session_hour
+
+WINDOW_DAYS = 30
+# Rebuilds that lost to a concurrent update before leaving the table to the next read.
+REBUILD_ATTEMPTS = 3
+# Sessions within this many hours of the current hour count, wrapping at midnight.
+HOUR_SPREAD = 2
+
+# Per-user recommendation table, one Redis hash `rec:{user_id}`:
+# Hours are the user-local local_hour of each session (UTC for older sessions).
+#   c|{mood}|{energy}|{hour}|{task}  session count
+#   d|{mood}|{energy}|{hour}|{task}  duration sum
+#   b|{mood}|{energy}|{hour}         best task for that hour +- HOUR_SPREAD
+#   tasks                            task types seen, newline separated
+#   last, last_ts                    "{mood}|{energy}" of the latest session
+#   built                            rebuild time; present even for an empty table
+#
+# Logging a session updates its counts and re-ranks the five hour buckets it
+# falls into. Like today's summary, the table is only updated if it exists;
+# a missing table is rebuilt from Mongo on the next read.
+#
+# Every update, applied or not, also bumps `rec:{user_id}:v`. A rebuild reads
+# it before reading Mongo and only writes its table if it is unchanged, so a
+# table built without a session logged meanwhile never replaces one that has
+# it (or takes the place of a missing one the session could not be applied to).
+UPDATE_RECOMMENDATION_LUA = """
+redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[8])
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+local prefix = ARGV[1] .. '|' .. ARGV[2] .. '|'
+local hour = tonumber(ARGV[3])
+local task = ARGV[4]
+local spread = tonumber(ARGV[7])
+redis.call('HINCRBY', KEYS[1], 'c|' .. prefix .. hour .. '|' .. task, 1)
+redis.call('HINCRBY', KEYS[1], 'd|' .. prefix .. hour .. '|' .. task, ARGV[5])
+
+local tasks = {}
+local known = redis.call('HGET', KEYS[1], 'tasks') or ''
+local seen = false
+for t in string.gmatch(known, '[^\\n]+') do
+    table.insert(tasks, t)
+    if t == task then seen = true end
+end
+if not seen then
+    table.insert(tasks, task)
+    redis.call('HSET', KEYS[1], 'tasks', known == '' and task or known .. '\\n' .. task)
+end
+
+for offset = -spread, spread do
+    local bucket = (hour + offset) % 24
+    local best, best_score = nil, nil
+    for _, t in ipairs(tasks) do
+        local count, duration = 0, 0
+        for near = -spread, spread do
+            local h = (bucket + near) % 24
+            local values = redis.call('HMGET', KEYS[1], 'c|' .. prefix .. h .. '|' .. t, 'd|' .. prefix .. h .. '|' .. t)
+            count = count + (tonumber(values[1]) or 0)
+            duration = duration + (tonumber(values[2]) or 0)
+        end
+        if count > 0 then
+            local score = duration / count + count
+            if best_score == nil or score > best_score then
+                best, best_score = t, score
+            end
+        end
+    end
+    if best then
+        redis.call('HSET', KEYS[1], 'b|' .. prefix .. bucket, best)
+    end
+end
+
+if tonumber(ARGV[6]) >= tonumber(redis.call('HGET', KEYS[1], 'last_ts') or '0') then
+    redis.call('HSET', KEYS[1], 'last', ARGV[1] .. '|' .. ARGV[2], 'last_ts', ARGV[6])
+end
+return 1
+"""
+update_recommendation_script = redisClient.register_script(UPDATE_RECOMMENDATION_LUA)
+
+# One round trip: the latest mood and energy select the bucket to read.
+READ_RECOMMENDATION_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return nil
+end
+local last = redis.call('HGET', KEYS[1], 'last')
+if not last then
+    return {'', ''}
+end
+return {last, redis.call('HGET', KEYS[1], 'b|' .. last .. '|' .. ARGV[1]) or ''}
+"""
+read_recommendation_script = redisClient.register_script(READ_RECOMMENDATION_LUA)
 
 
 class RecommendationService:
-    def __init__(self, mongo: AsyncIOMotorDatabase) -> None:
+    """Recommends the task type that lasted longest for the latest mood and energy around this hour.
+
+    Reads are a single Redis call against the precomputed table. Sessions logged
+    after the table was built are applied to it immediately; the 30-day window
+    is re-anchored when the table expires, so sessions that left the window
+    keep counting for at most RECOMMENDATION_TABLE_TTL_SECONDS.
+    """
+
+    def __init__(self, mongo: AsyncIOMotorDatabase, redis: Redis = redisClient) -> None:
         self.mongo = mongo
+        self.redis = redis
         self.collection = mongo.get_collection("work_sessions")
 
     async def recommend(self, user_id: str) -> dict[str, str] | None:
-        now = datetime.now(tz=timezone.utc)
-        start = now - timedelta(days=30)
-        hour = now.hour
+        hour = datetime.now(tz=await user_timezones.get(user_id)).hour
+        result = await read_recommendation_script(keys=[self._key(user_id)], args=[hour], client=self.redis)
+        if result is None:
+            await self.rebuild(user_id)
+            result = await read_recommendation_script(keys=[self._key(user_id)], args=[hour], client=self.redis)
+        if not result or not result[0]:
+            return None
 
-        recent = (
-            await self.collection.find({"user_id": user_id})
-            .sort("timestamp", -1)
-            .limit(1)
-            .to_list(length=1)
-        )
-        if not recent:
+        last, best = result
+        if not best:
             return None
+        mood, energy = last.split("|", 1)
+        explanation = (
+            f"Based on your recent sessions with mood {mood} and energy {energy}, "
+            f"{best} tends to last longer around this time of day."
+        )
+
+        return {"taskType": best, "reason": explanation}
 
-        recent_session = recent[0]
-        mood = recent_session.get("mood")
-        energy = recent_session.get("energy")
+    async def apply_sessions(self, user_id: str, docs: list[dict[str, Any]]) -> None:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for doc in docs:
+                if doc.get("task_type") is None:
+                    continue
+                await update_recommendation_script(
+                    keys=[self._key(user_id), self._version_key(user_id)],
+                    args=[
+                        doc["mood"],
+                        doc["energy"],
+                        session_hour(doc),
+                        doc["task_type"],
+                        doc.get("duration_minutes") or 0,
+                        int(doc["timestamp"].timestamp() * 1000),
+                        HOUR_SPREAD,
+                        settings.RECOMMENDATION_TABLE_TTL_SECONDS,
+                    ],
+                    client=pipe,
+                )
+            await pipe.execute()
 
+    async def rebuild(self, user_id: str) -> None:
+        for _ in range(REBUILD_ATTEMPTS):
+            # Read before Mongo: an update after this point may be missing from the table.
+            version = await self.redis.get(self._version_key(user_id))
+            table = await self._build_table(user_id)
+            if await self._write_table(user_id, table, version):
+                return
+            metrics.incr("recommendation.rebuild_conflicts")
+
+    async def _build_table(self, user_id: str) -> dict[str, Any]:
+        now = datetime.now(tz=timezone.utc)
         pipeline = [
-            {
-                "$match": {
-                    "user_id": user_id,
-                    "timestamp": {"$gte": start},
-                    "mood": mood,
-                    "energy": energy,
-                }
-            },
-            {
-                "$addFields": {
-                    "hour": {"$hour": "$timestamp"},
-                }
-            },
-            {"$match": {"hour": {"$gte": hour - 2, "$lte": hour + 2}}},
+            {"$match": {"user_id": user_id, "timestamp": {"$gte": now - timedelta(days=WINDOW_DAYS)}}},
             {
                 "$group": {
-                    "_id": "$task_type",
-                    "avg_duration": {"$avg": "$duration_minutes"},
+                    "_id": {
+                        "mood": "$mood",
+                        "energy": "$energy",
+                        "hour": SESSION_HOUR_EXPR,
+                        "task_type": "$task_type",
+                    },
                     "count": {"$sum": 1},
+                    "duration": {"$sum": {"$ifNull": ["$duration_minutes", 0]}},
                 }
             },
-            {
-                "$project": {
-                    "task_type": "$_id",
-                    "score": {"$add": ["$avg_duration", "$count"]},
-                }
-            },
-            {"$sort": {"score": -1}},
-            {"$limit": 1},
         ]
+        groups = await self.collection.aggregate(pipeline).to_list(length=None)
+        latest = (
+            await self.collection.find({"user_id": user_id}, {"mood": 1, "energy": 1, "timestamp": 1})
+            .sort("timestamp", -1)
+            .limit(1)
+            .to_list(length=1)
+        )
 
-        results = await self.collection.aggregate(pipeline).to_list(length=1)
-        if not results:
-            return None
-
-        best = results[0]["task_type"]
-        explanation = (
-            f"Based on your recent sessions with mood {mood} and energy {energy}, "
-            f"{best} tends to last longer around this time of day."
+        table: dict[str, Any] = {"built": int(now.timestamp())}
+        totals: dict[tuple[str, str], dict[str, list[list[int]]]] = defaultdict(
+            lambda: defaultdict(lambda: [[0, 0] for _ in range(24)])
         )
+        tasks: list[str] = []
+        for group in groups:
+            key = group["_id"]
+            if key.get("task_type") is None:
+                continue
+            prefix = f"{key['mood']}|{key['energy']}|{key['hour']}|{key['task_type']}"
+            table[f"c|{prefix}"] = group["count"]
+            table[f"d|{prefix}"] = group["duration"]
+            hours = totals[(str(key["mood"]), str(key["energy"]))][key["task_type"]]
+            hours[key["hour"]][0] += group["count"]
+            hours[key["hour"]][1] += group["duration"]
+            if key["task_type"] not in tasks:
+                tasks.append(key["task_type"])
 
-        return {"taskType": best, "reason": explanation}
+        for (mood, energy), by_task in totals.items():
+            for bucket in range(24):
+                best, best_score = None, None
+                for task, hours in by_task.items():
+                    near = [hours[(bucket + offset) % 24] for offset in range(-HOUR_SPREAD, HOUR_SPREAD + 1)]
+                    count = sum(item[0] for item in near)
+                    if count:
+                        score = sum(item[1] for item in near) / count + count
+                        if best_score is None or score > best_score:
+                            best, best_score = task, score
+                if best:
+                    table[f"b|{mood}|{energy}|{bucket}"] = best
+
+        if tasks:
+            table["tasks"] = "\n".join(tasks)
+        if latest:
+            table["last"] = f"{latest[0]['mood']}|{latest[0]['energy']}"
+            # Mongo returns naive UTC datetimes.
+            table["last_ts"] = int(latest[0]["timestamp"].replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+        return table
+
+    async def _write_table(self, user_id: str, table: dict[str, Any], version: str | None) -> bool:
+        """Replace the table unless an update bumped the version since `version` was read."""
+        async with self.redis.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(self._version_key(user_id))
+                if await pipe.get(self._version_key(user_id)) != version:
+                    return False
+                pipe.multi()
+                pipe.delete(self._key(user_id))
+                pipe.hset(self._key(user_id), mapping=table)
+                pipe.expire(self._key(user_id), settings.RECOMMENDATION_TABLE_TTL_SECONDS)
+                await pipe.execute()
+            except WatchError:
+                return False
+        return True
+
+    async def invalidate(self, user_id: str) -> None:
+        # Bumping the version also stops a rebuild in flight from writing its table.
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(self._key(user_id))
+            pipe.incr(self._version_key(user_id))
+            pipe.expire(self._version_key(user_id), settings.RECOMMENDATION_TABLE_TTL_SECONDS)
+            await pipe.execute()
+
+    def _key(self, user_id: str) -> str:
+        return f"rec:{user_id}"
+
+    def _version_key(self, user_id: str) -> str:
+        return f"rec:{user_id}:v"
@@ -0,0 +1,363 @@
+"""
+Rollups of work_sessions maintained on write.
+
+daily_summaries holds one document per (user, day) and hourly_buckets one per
+(user, day, hour, task type). Days and hours are the user-local local_date and
+local_hour stored on each session, falling back to UTC for sessions written
+before those fields existed; a day is keyed by its date at UTC midnight.
+Writers upsert them with $inc so concurrent sessions never need a
+read-modify-write, and a day's `last` is kept with $max on an embedded
+document whose first field is the timestamp, so the newest session wins
+regardless of arrival order. Readers fetch at most one
+small document per day, or per hour and task type, instead of scanning raw
+sessions.
+
+A rollup write that fails after its session was stored leaves the rollups out
+of step with work_sessions. The writer then adds the user to the `rollups:dirty`
+set and run_rollup_repairer rebuilds them from work_sessions on its next pass.
+"""
+import asyncio
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from typing import Any
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import DeleteMany, ReplaceOne, UpdateOne
+from redis.asyncio import Redis
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.data_version import bump_version
+from app.core.redis_Client import redisClient
+
+DIRTY_KEY = "rollups:dirty"
+
+
+def day_start(timestamp: datetime) -> datetime:
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    timestamp = timestamp.astimezone(timezone.utc)
+    return datetime(timestamp.year, timestamp.month, timestamp.day, tzinfo=timezone.utc)
+
+
+def day_key(day: date) -> datetime:
+    return datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+
+
+def session_day(doc: dict[str, Any]) -> datetime:
+    if doc.get("local_date"):
+        return day_key(date.fromisoformat(doc["local_date"]))
+    return day_start(doc["timestamp"])
+
+
+def session_hour(doc: dict[str, Any]) -> int:
+    if doc.get("local_hour") is not None:
+        return doc["local_hour"]
+    timestamp = doc["timestamp"]
+    return (timestamp.astimezone(timezone.utc) if timestamp.tzinfo else timestamp).hour
+
+
+# Aggregation counterparts of session_day and session_hour.
+SESSION_DAY_EXPR = {
+    "$ifNull": [
+        {"$dateFromString": {"dateString": "$local_date", "format": "%Y-%m-%d", "timezone": "UTC"}},
+        {"$dateTrunc": {"date": "$timestamp", "unit": "day", "timezone": "UTC"}},
+    ]
+}
+SESSION_HOUR_EXPR = {"$ifNull": ["$local_hour", {"$hour": "$timestamp"}]}
+
+
+def encode_task(task_type: str) -> str:
+    # Field names may not contain "." or start with "$".
+    return task_type.replace("%", "%25").replace(".", "%2E").replace("$", "%24")
+
+
+def decode_task(key: str) -> str:
+    return key.replace("%24", "$").replace("%2E", ".").replace("%25", "%")
+
+
+def _numeric(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class RollupService:
+    def __init__(self, mongo: AsyncIOMotorDatabase) -> None:
+        self.mongo = mongo
+        self.collection = mongo.get_collection("daily_summaries")
+        self.buckets = mongo.get_collection("hourly_buckets")
+        self.sessions = mongo.get_collection("work_sessions")
+
+    async def apply_sessions(self, user_id: str, docs: list[dict[str, Any]], sign: int = 1) -> None:
+        """Add (sign=1) or remove (sign=-1) sessions, one upsert per affected day and hourly bucket.
+
+        Removal cannot roll `last` back; it only compensates counts for an insert that failed.
+        """
+        by_day: dict[datetime, list[dict[str, Any]]] = defaultdict(list)
+        for doc in docs:
+            by_day[session_day(doc)].append(doc)
+        if not by_day:
+            return
+
+        writes = [
+            self.collection.bulk_write(
+                [self._day_update(user_id, day, day_docs, sign) for day, day_docs in by_day.items()],
+                ordered=False,
+            )
+        ]
+        bucket_updates = self._bucket_updates(user_id, docs, sign)
+        if bucket_updates:
+            writes.append(self.buckets.bulk_write(bucket_updates, ordered=False))
+        await asyncio.gather(*writes)
+
+    async def read_days(self, user_id: str, start: datetime, end: datetime) -> list[dict[str, Any]]:
+        """Rollup documents for days in [start, end), oldest first."""
+        return (
+            await self.collection.find({"user_id": user_id, "day": {"$gte": day_start(start), "$lt": day_start(end)}})
+            .sort("day", 1)
+            .to_list(length=None)
+        )
+
+    async def read_day(self, user_id: str, day: datetime) -> dict[str, Any] | None:
+        return await self.collection.find_one({"user_id": user_id, "day": day_start(day)})
+
+    async def read_slots(self, user_id: str, task_type: str, start: datetime) -> list[dict[str, Any]]:
+        """Count and duration sum of a task type per (day of week, hour) since `start`; at most 7x24 rows.
+
+        dayOfWeek is 0 for Sunday, like $dayOfWeek - 1.
+        """
+        pipeline = [
+            {"$match": {"user_id": user_id, "task_type": task_type, "day": {"$gte": day_start(start)}}},
+            {
+                "$group": {
+                    "_id": {"dayOfWeek": {"$dayOfWeek": "$day"}, "hour": "$hour"},
+                    "count": {"$sum": "$count"},
+                    "duration_sum": {"$sum": "$duration_sum"},
+                }
+            },
+            {
+                "$project": {
+                    "_id": 0,
+                    "dayOfWeek": {"$subtract": ["$_id.dayOfWeek", 1]},
+                    "hour": "$_id.hour",
+                    "count": 1,
+                    "duration_sum": 1,
+                }
+            },
+        ]
+        return await self.buckets.aggregate(pipeline).to_list(length=7 * 24)
+
+    async def rebuild_user(self, user_id: str) -> int:
+        """Recompute every rollup of a user from work_sessions; returns the number of days written.
+
+        Each recomputed document replaces its counterpart in place and only
+        days or buckets that no longer have sessions are deleted, so readers
+        never see the user's rollups missing and a concurrent upsert cannot
+        collide with the rebuild. A session logged between the aggregation and
+        the replace can still be dropped from its day; mark the user dirty
+        again if that matters.
+        """
+        pipeline = [
+            {"$match": {"user_id": user_id}},
+            {
+                "$group": {
+                    "_id": {
+                        "day": SESSION_DAY_EXPR,
+                        "task_type": "$task_type",
+                    },
+                    "count": {"$sum": 1},
+                    "focus_minutes": {"$sum": {"$ifNull": ["$duration_minutes", 0]}},
+                    "mood_sum": {"$sum": "$mood"},
+                    "energy_sum": {"$sum": {"$cond": [{"$isNumber": "$energy"}, "$energy", 0]}},
+                    "energy_count": {"$sum": {"$cond": [{"$isNumber": "$energy"}, 1, 0]}},
+                    "last": {"$max": {"at": "$timestamp", "mood": "$mood", "energy": "$energy"}},
+                }
+            },
+        ]
+
+        days: dict[datetime, dict[str, Any]] = {}
+        now = datetime.now(tz=timezone.utc)
+        async for group in self.sessions.aggregate(pipeline):
+            day = day_start(group["_id"]["day"])
+            summary = days.setdefault(
+                day,
+                {
+                    "user_id": user_id,
+                    "day": day,
+                    "total_sessions": 0,
+                    "total_focus_minutes": 0,
+                    "mood_sum": 0,
+                    "energy_sum": 0,
+                    "energy_count": 0,
+                    "task_counts": {},
+                    "last": None,
+                    "updated_at": now,
+                },
+            )
+            summary["total_sessions"] += group["count"]
+            summary["total_focus_minutes"] += group["focus_minutes"]
+            summary["mood_sum"] += group["mood_sum"]
+            summary["energy_sum"] += group["energy_sum"]
+            summary["energy_count"] += group["energy_count"]
+            task_type = group["_id"]["task_type"]
+            if task_type is not None:
+                summary["task_counts"][encode_task(task_type)] = group["count"]
+            if summary["last"] is None or group["last"]["at"] > summary["last"]["at"]:
+                summary["last"] = group["last"]
+
+        requests: list[Any] = [
+            ReplaceOne({"user_id": user_id, "day": day}, summary, upsert=True) for day, summary in days.items()
+        ]
+        requests.append(DeleteMany({"user_id": user_id, "day": {"$nin": list(days)}}))
+        await self.collection.bulk_write(requests, ordered=True)
+        await self._rebuild_buckets(user_id)
+        return len(days)
+
+    async def _rebuild_buckets(self, user_id: str) -> None:
+        pipeline = [
+            {"$match": {"user_id": user_id, "task_type": {"$ne": None}}},
+            {
+                "$group": {
+                    "_id": {
+                        "day": SESSION_DAY_EXPR,
+                        "hour": SESSION_HOUR_EXPR,
+                        "task_type": "$task_type",
+                    },
+                    "count": {"$sum": 1},
+                    "duration_sum": {"$sum": {"$ifNull": ["$duration_minutes", 0]}},
+                }
+            },
+            {
+                "$project": {
+                    "_id": 0,
+                    "user_id": user_id,
+                    "day": "$_id.day",
+                    "hour": "$_id.hour",
+                    "task_type": "$_id.task_type",
+                    "count": 1,
+                    "duration_sum": 1,
+                }
+            },
+        ]
+        requests: list[Any] = []
+        produced: set[tuple[str, datetime, int]] = set()
+        async for bucket in self.sessions.aggregate(pipeline):
+            key = {field: bucket[field] for field in ("user_id", "task_type", "day", "hour")}
+            requests.append(ReplaceOne(key, bucket, upsert=True))
+            produced.add((bucket["task_type"], day_start(bucket["day"]), bucket["hour"]))
+        if requests:
+            await self.buckets.bulk_write(requests, ordered=False)
+
+        gone = [
+            existing["_id"]
+            async for existing in self.buckets.find({"user_id": user_id}, {"task_type": 1, "day": 1, "hour": 1})
+            if (existing["task_type"], day_start(existing["day"]), existing["hour"]) not in produced
+        ]
+        if gone:
+            await self.buckets.delete_many({"_id": {"$in": gone}})
+
+    def _day_update(self, user_id: str, day: datetime, docs: list[dict[str, Any]], sign: int) -> UpdateOne:
+        inc: dict[str, Any] = defaultdict(int)
+        for doc in docs:
+            inc["total_sessions"] += sign
+            inc["total_focus_minutes"] += sign * (doc.get("duration_minutes") or 0)
+            inc["mood_sum"] += sign * doc["mood"]
+            if _numeric(doc.get("energy")):
+                inc["energy_sum"] += sign * doc["energy"]
+                inc["energy_count"] += sign
+            if doc.get("task_type") is not None:
+                inc[f"task_counts.{encode_task(doc['task_type'])}"] += sign
+
+        update: dict[str, Any] = {
+            "$inc": dict(inc),
+            "$set": {"updated_at": datetime.now(tz=timezone.utc)},
+        }
+        if sign > 0:
+            latest = max(docs, key=lambda doc: doc["timestamp"])
+            # Field order matters: BSON compares embedded documents field by field.
+            update["$max"] = {"last": {"at": latest["timestamp"], "mood": latest["mood"], "energy": latest["energy"]}}
+        return UpdateOne({"user_id": user_id, "day": day}, update, upsert=True)
+
+    def _bucket_updates(self, user_id: str, docs: list[dict[str, Any]], sign: int) -> list[UpdateOne]:
+        buckets: dict[tuple[datetime, int, str], list[int]] = defaultdict(lambda: [0, 0])
+        for doc in docs:
+            if doc.get("task_type") is None:
+                continue
+            totals = buckets[(session_day(doc), session_hour(doc), doc["task_type"])]
+            totals[0] += sign
+            totals[1] += sign * (doc.get("duration_minutes") or 0)
+        return [
+            UpdateOne(
+                {"user_id": user_id, "task_type": task_type, "day": day, "hour": hour},
+                {"$inc": {"count": count, "duration_sum": duration_sum}},
+                upsert=True,
+            )
+            for (day, hour, task_type), (count, duration_sum) in buckets.items()
+        ]
+
+
+async def mark_dirty(user_id: str, redis: Redis = redisClient) -> None:
+    """Queue a rebuild of the user's rollups; never raises, the session write already happened."""
+    metrics.incr("rollups.marked_dirty")
+    try:
+        await redis.sadd(DIRTY_KEY, user_id)
+    except Exception as e:
+        metrics.incr("rollups.mark_dirty_errors")
+        print(f"❌ Could not queue a rollup rebuild for user {user_id}: {e}")
+
+
+async def repair_dirty(rollups: RollupService, redis: Redis = redisClient) -> int:
+    """Rebuild the rollups of every user marked dirty; returns the number of users rebuilt."""
+    repaired = 0
+    # SPOP hands each user to one worker; a failed rebuild puts the user back.
+    while user_id := await redis.spop(DIRTY_KEY):
+        try:
+            await rollups.rebuild_user(user_id)
+        except Exception:
+            await redis.sadd(DIRTY_KEY, user_id)
+            raise
+        # Cached responses and ETags were derived from the broken rollups.
+        await bump_version(user_id, redis)
+        repaired += 1
+        metrics.incr("rollups.repaired")
+    return repaired
+
+
+async def run_rollup_repairer(mongo: AsyncIOMotorDatabase) -> None:
+    """Background loop started from the app lifespan.
+
+    Waiting an interval before rebuilding lets the writes that raced the failed
+    one land first, since rebuild_user can miss sessions logged while it runs.
+    """
+    rollups = RollupService(mongo)
+    while True:
+        await asyncio.sleep(settings.ROLLUP_REPAIR_INTERVAL_SECONDS)
+        try:
+            repaired = await repair_dirty(rollups)
+            if repaired:
+                print(f"🔧 Rebuilt rollups for {repaired} users")
+        except Exception as e:
+            print(f"❌ Rollup repair failed: {e}")
+
+
+def summarize_days(days: list[dict[str, Any]]) -> dict[str, Any]:
+    """Fold rollup documents into totals, averages and the most frequent task type."""
+    total_sessions = sum(day.get("total_sessions", 0) for day in days)
+    mood_sum = sum(day.get("mood_sum", 0) for day in days)
+    energy_sum = sum(day.get("energy_sum", 0) for day in days)
+    energy_count = sum(day.get("energy_count", 0) for day in days)
+
+    task_counts: dict[str, int] = defaultdict(int)
+    for day in days:
+        for key, count in (day.get("task_counts") or {}).items():
+            task_counts[key] += count
+    task_counts = {key: count for key, count in task_counts.items() if count > 0}
+    top_task = max(task_counts, key=task_counts.get) if task_counts else None
+
+    return {
+        "total_sessions": total_sessions,
+        "total_focus_minutes": sum(day.get("total_focus_minutes", 0) for day in days),
+        "average_mood": mood_sum / total_sessions if total_sessions else None,
+        "average_energy": energy_sum / energy_count if energy_count else None,
+        "top_task_type": decode_task(top_task) if top_task else None,
+    }
+
@@ -0,0 +1,168 @@
+"""
+Retention for the auth_sessions table.
+
+auth_sessions is range partitioned by month on expires_at. The sweeper keeps
+partitions created ahead of time, detaches and drops partitions whose sessions
+have all expired, and purges revoked rows from live partitions in small
+batches so no statement holds locks for long. Each step runs on its own, so a
+partition that cannot be detached this time does not stop the purge.
+"""
+from __future__ import annotations
+
+import asyncio
+import re
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.redis_Client import redisClient
+
+PARTITION_PATTERN = re.compile(r"^auth_sessions_p(\d{4})_(\d{2})$")
+
+PURGE_SQL = text(
+    """
+    DELETE FROM auth_sessions a
+    USING (
+        SELECT id, expires_at FROM auth_sessions
+        WHERE (is_revoked = true AND revoked_at < :cutoff) OR expires_at < :cutoff
+        LIMIT :batch_size
+    ) doomed
+    WHERE a.id = doomed.id AND a.expires_at = doomed.expires_at
+    """
+)
+
+
+def _month_start(day: date) -> date:
+    return date(day.year, day.month, 1)
+
+
+def _next_month(day: date) -> date:
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"auth_sessions_p{month.year:04d}_{month.month:02d}"
+
+
+class SessionRetentionService:
+    def __init__(self, engine: AsyncEngine) -> None:
+        self.engine = engine
+
+    async def ensure_partitions(self, months_ahead: int | None = None, months_back: int = 0) -> list[str]:
+        """Create the default partition and monthly partitions from months_back to months_ahead."""
+        months_ahead = settings.AUTH_SESSION_PARTITIONS_AHEAD if months_ahead is None else months_ahead
+        created = []
+        async with self.engine.begin() as conn:
+            await conn.execute(text("SET LOCAL lock_timeout = '2s'"))
+            await conn.execute(
+                text("CREATE TABLE IF NOT EXISTS auth_sessions_default PARTITION OF auth_sessions DEFAULT")
+            )
+            month = _month_start(datetime.now(tz=timezone.utc).date())
+            for _ in range(months_back):
+                month = _month_start(month - timedelta(days=1))
+            for _ in range(months_back + months_ahead + 1):
+                upper = _next_month(month)
+                name = partition_name(month)
+                await conn.execute(
+                    text(
+                        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF auth_sessions "
+                        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{upper.isoformat()}')"
+                    )
+                )
+                created.append(name)
+                month = upper
+        return created
+
+    async def drop_expired_partitions(self) -> list[str]:
+        """Detach and drop partitions whose whole range expired before the retention cutoff."""
+        cutoff = datetime.now(tz=timezone.utc).date() - timedelta(days=settings.AUTH_SESSION_RETENTION_DAYS)
+        async with self.engine.connect() as conn:
+            result = await conn.execute(
+                text(
+                    """
+                    SELECT c.relname FROM pg_inherits i
+                    JOIN pg_class c ON c.oid = i.inhrelid
+                    JOIN pg_class p ON p.oid = i.inhparent
+                    WHERE p.relname = 'auth_sessions'
+                    """
+                )
+            )
+            names = [row[0] for row in result]
+
+        dropped = []
+        for name in sorted(names):
+            match = PARTITION_PATTERN.match(name)
+            if not match:
+                continue
+            upper = _next_month(date(int(match.group(1)), int(match.group(2)), 1))
+            if upper > cutoff:
+                continue
+            # DETACH ... CONCURRENTLY is refused while auth_sessions has a default
+            # partition, so use a plain DETACH that gives up after a short lock wait.
+            try:
+                async with self.engine.begin() as conn:
+                    await conn.execute(
+                        text(f"SET LOCAL lock_timeout = '{settings.AUTH_SESSION_DETACH_LOCK_TIMEOUT_MS}ms'")
+                    )
+                    await conn.execute(text(f"ALTER TABLE auth_sessions DETACH PARTITION {name}"))
+                    await conn.execute(text(f"DROP TABLE IF EXISTS {name}"))
+            except Exception as e:
+                metrics.incr("auth_sessions.partition_drop_failures")
+                print(f"❌ Could not drop {name}, retrying next sweep: {e}")
+                continue
+            dropped.append(name)
+        metrics.incr("auth_sessions.partitions_dropped", len(dropped))
+        return dropped
+
+    async def purge_revoked(self, batch_size: int | None = None, max_batches: int = 1000) -> int:
+        """Delete revoked and expired rows from live partitions, one short transaction per batch."""
+        batch_size = batch_size or settings.AUTH_SESSION_PURGE_BATCH_SIZE
+        cutoff = datetime.now(tz=timezone.utc) - timedelta(days=settings.AUTH_SESSION_RETENTION_DAYS)
+        total = 0
+        for _ in range(max_batches):
+            async with self.engine.begin() as conn:
+                result = await conn.execute(PURGE_SQL, {"cutoff": cutoff, "batch_size": batch_size})
+            total += result.rowcount
+            if result.rowcount < batch_size:
+                break
+            # Give other writers a chance between batches.
+            await asyncio.sleep(0.05)
+        metrics.incr("auth_sessions.rows_purged", total)
+        return total
+
+    async def sweep(self) -> dict:
+        result: dict = {"partitions": [], "dropped": [], "purged": 0, "errors": {}}
+        steps = (
+            ("partitions", self.ensure_partitions),
+            ("dropped", self.drop_expired_partitions),
+            ("purged", self.purge_revoked),
+        )
+        for name, step in steps:
+            try:
+                result[name] = await step()
+            except Exception as e:
+                metrics.incr(f"auth_sessions.sweep_errors.{name}")
+                result["errors"][name] = str(e)
+        return result
+
+
+async def run_sweeper(engine: AsyncEngine) -> None:
+    """Background loop started from the app lifespan; one worker sweeps per interval."""
+    service = SessionRetentionService(engine)
+    interval = settings.AUTH_SESSION_SWEEP_INTERVAL_SECONDS
+    while True:
+        try:
+            if await redisClient.set("lock:auth_sessions:sweep", "1", nx=True, ex=interval):
+                result = await service.sweep()
+                print(
+                    f"🧹 auth_sessions sweep: dropped {len(result['dropped'])} partitions, "
+                    f"purged {result['purged']} rows"
+                )
+                for step, error in result["errors"].items():
+                    print(f"❌ auth_sessions sweep step {step} failed: {error}")
+        except Exception as e:
+            print(f"❌ auth_sessions sweep failed: {e}")
+        await asyncio.sleep(interval)
@@ -1,17 +1,53 @@
-from datetime import datetime, timedelta, timezone
-from typing import Any
+import asyncio
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime, timezone, tzinfo
+from typing import Any, AsyncIterator
 
 from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
 from redis.asyncio import Redis
 
+from app.core.config import settings
+from app.core.data_version import bump_version
+from app.core.redis_Client import redisClient
+from app.core.redis_cache import client_cache
+from app.core.user_timezone import end_of_local_day, local_fields, local_today, user_timezones
 from app.schemas.sessions import (
+    SessionBatchItemResult,
+    SessionBatchResponse,
     SessionCreate,
     SessionDetailResponse,
     SessionHistoryItem,
     SessionHistoryResponse,
     TodaySummaryResponse,
 )
+from app.services.recommendation_service import RecommendationService
+from app.services.rollup_service import RollupService, day_key, mark_dirty
+
+# Applies logged sessions to today's cached summary in a single round trip.
+# The hash is only updated if it already exists: a missing key means the
+# summary has not been built yet and the next read rebuilds it from Mongo,
+# which already includes these sessions.
+UPDATE_TODAY_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('HINCRBY', KEYS[1], 'sessions_today', ARGV[1])
+redis.call('HINCRBY', KEYS[1], 'total_focus_minutes', ARGV[2])
+redis.call('HSET', KEYS[1], 'current_mood', ARGV[3], 'current_energy', ARGV[4])
+redis.call('EXPIREAT', KEYS[1], ARGV[5])
+return 1
+"""
+update_today_script = redisClient.register_script(UPDATE_TODAY_LUA)
+
+EXPORT_FIELDS = ("id", "timestamp", "task_type", "mood", "energy", "duration_minutes", "good_session")
+EXPORT_PROJECTION = {field: 1 for field in EXPORT_FIELDS if field != "id"}
+EXPORT_CHUNK_BYTES = 64 * 1024
 
 
 class SessionsService:
@@ -19,26 +55,114 @@ class SessionsService:
         self.mongo = mongo
         self.redis = redis
         self.collection = mongo.get_collection("work_sessions")
+        self.rollups = RollupService(mongo)
+        self.recommendations = RecommendationService(mongo, redis)
 
     async def log_session(self, user_id: str, payload: SessionCreate) -> str:
-        timestamp = payload.timestamp or datetime.now(tz=timezone.utc)
-        duration_minutes = payload.duration_minutes or 0
-        doc = {
-            "user_id": user_id,
-            "mood": payload.mood,
-            "energy": payload.energy,
-            "task_type": payload.task_type,
-            "duration_minutes": duration_minutes,
-            "good_session": payload.good_session,
-            "timestamp": timestamp,
-        }
-        result = await self.collection.insert_one(doc)
-        await self._update_today_cache(user_id, payload, timestamp)
-        return str(result.inserted_id)
+        tz = await user_timezones.get(user_id)
+        doc = self._build_doc(user_id, payload, tz)
+        # Mongo is the source of truth and the cached summary and daily rollup
+        # are derived from it, so those writes run concurrently. The
+        # recommendation table is updated once the insert is done: a rebuild
+        # that read Mongo before it then sees the update and retries (see
+        # RecommendationService.rebuild). If any write fails, the cached
+        # summary and table are dropped and the next read rebuilds them; a
+        # rollup applied for a session that was not stored is reverted, and a
+        # rollup write that failed or could not be reverted queues a rebuild
+        # of the user's rollups.
+        insert_result, cache_result, rollup_result = await asyncio.gather(
+            self.collection.insert_one(doc),
+            self._update_today_cache(user_id, [doc], tz),
+            self.rollups.apply_sessions(user_id, [doc]),
+            return_exceptions=True,
+        )
+        recommendation_result = None
+        if not isinstance(insert_result, BaseException):
+            try:
+                await self.recommendations.apply_sessions(user_id, [doc])
+            except Exception as e:
+                recommendation_result = e
+        results = (insert_result, cache_result, rollup_result, recommendation_result)
+        if any(isinstance(result, BaseException) for result in results):
+            try:
+                await self.redis.delete(self._today_key(user_id, local_today(tz)))
+                await self.recommendations.invalidate(user_id)
+            except Exception:
+                pass
+        if isinstance(rollup_result, BaseException):
+            # Part of the rollup may have been written; only a rebuild is sure to fix it.
+            await mark_dirty(user_id, self.redis)
+        if isinstance(insert_result, BaseException):
+            if not isinstance(rollup_result, BaseException):
+                try:
+                    await self.rollups.apply_sessions(user_id, [doc], sign=-1)
+                except Exception:
+                    await mark_dirty(user_id, self.redis)
+            raise insert_result
+        await self._bump_version(user_id)
+        return str(insert_result.inserted_id)
+
+    async def log_sessions_batch(self, user_id: str, items: list[dict[str, Any]]) -> SessionBatchResponse:
+        results = [SessionBatchItemResult(index=index) for index in range(len(items))]
+        tz = await user_timezones.get(user_id)
+        docs: list[dict[str, Any]] = []
+        doc_indexes: list[int] = []
+        for index, raw in enumerate(items):
+            try:
+                payload = SessionCreate.model_validate(raw)
+            except ValidationError as e:
+                error = e.errors()[0]
+                field = ".".join(str(part) for part in error["loc"])
+                results[index].error = f"{field}: {error['msg']}" if field else error["msg"]
+                continue
+            docs.append(self._build_doc(user_id, payload, tz))
+            doc_indexes.append(index)
+
+        failed_docs: dict[int, str] = {}
+        if docs:
+            # Unordered: one bad document does not stop the rest of the batch.
+            # insert_many assigns each doc its _id before sending.
+            try:
+                await self.collection.insert_many(docs, ordered=False)
+            except BulkWriteError as e:
+                for write_error in e.details.get("writeErrors", []):
+                    failed_docs[write_error["index"]] = write_error.get("errmsg", "write failed")
+
+        inserted = []
+        for position, doc in enumerate(docs):
+            index = doc_indexes[position]
+            if position in failed_docs:
+                results[index].error = failed_docs[position]
+            else:
+                results[index].id = str(doc["_id"])
+                inserted.append(doc)
+
+        if inserted:
+            cache_result, rollup_result, recommendation_result = await asyncio.gather(
+                self._update_today_cache(user_id, inserted, tz),
+                self.rollups.apply_sessions(user_id, inserted),
+                self.recommendations.apply_sessions(user_id, inserted),
+                return_exceptions=True,
+            )
+            if isinstance(rollup_result, BaseException):
+                await mark_dirty(user_id, self.redis)
+            if isinstance(cache_result, BaseException):
+                await self.redis.delete(self._today_key(user_id, local_today(tz)))
+            if isinstance(recommendation_result, BaseException):
+                await self.recommendations.invalidate(user_id)
+            await self._bump_version(user_id)
+
+        return SessionBatchResponse(
+            inserted=len(inserted),
+            failed=len(items) - len(inserted),
+            results=results,
+        )
 
     async def get_today_summary(self, user_id: str) -> TodaySummaryResponse:
-        cache_key = self._today_key(user_id)
-        cached = await self.redis.hgetall(cache_key)
+        tz = await user_timezones.get(user_id)
+        today = local_today(tz)
+        cache_key = self._today_key(user_id, today)
+        cached = await client_cache.hgetall(cache_key)
         if cached:
             return TodaySummaryResponse(
                 current_mood=int(cached.get("current_mood")) if cached.get("current_mood") else None,
@@ -47,22 +171,8 @@ class SessionsService:
                 total_focus_minutes=int(cached.get("total_focus_minutes", 0)),
             )
 
-        start, end = self._today_bounds()
-        pipeline = [
-            {"$match": {"user_id": user_id, "timestamp": {"$gte": start, "$lt": end}}},
-            {
-                "$group": {
-                    "_id": None,
-                    "sessions_today": {"$sum": 1},
-                    "total_focus_minutes": {"$sum": "$duration_minutes"},
-                    "last_mood": {"$last": "$mood"},
-                    "last_energy": {"$last": "$energy"},
-                }
-            },
-        ]
-        cursor = self.collection.aggregate(pipeline)
-        summary = await cursor.to_list(length=1)
-        if not summary:
+        data = await self.rollups.read_day(user_id, day_key(today))
+        if not data or not data.get("total_sessions"):
             return TodaySummaryResponse(
                 current_mood=None,
                 current_energy=None,
@@ -70,14 +180,14 @@ class SessionsService:
                 total_focus_minutes=0,
             )
 
-        data = summary[0]
+        last = data.get("last") or {}
         response = TodaySummaryResponse(
-            current_mood=data.get("last_mood"),
-            current_energy=data.get("last_energy"),
-            sessions_today=data.get("sessions_today", 0),
+            current_mood=last.get("mood"),
+            current_energy=last.get("energy"),
+            sessions_today=data.get("total_sessions", 0),
             total_focus_minutes=data.get("total_focus_minutes", 0),
         )
-        await self._cache_today_summary(user_id, response)
+        await self._cache_today_summary(cache_key, response, end_of_local_day(today, tz))
         return response
 
     async def get_history(self, user_id: str, limit: int, cursor: str | None) -> SessionHistoryResponse:
@@ -110,6 +220,54 @@ class SessionsService:
 
         return SessionHistoryResponse(items=items, nextCursor=next_cursor)
 
+    async def export_sessions(self, user_id: str, fmt: str, compress: bool) -> AsyncIterator[bytes]:
+        """Stream every session of a user as NDJSON or CSV, optionally gzipped, in constant memory."""
+        cursor = (
+            self.collection.find({"user_id": user_id}, EXPORT_PROJECTION)
+            .sort("timestamp", 1)
+            .batch_size(settings.SESSION_EXPORT_BATCH_SIZE)
+        )
+        # wbits=31 produces a gzip container rather than a raw zlib stream.
+        compressor = zlib.compressobj(wbits=31) if compress else None
+        buffer = io.StringIO()
+        writer = csv.writer(buffer) if fmt == "csv" else None
+        if writer:
+            writer.writerow(EXPORT_FIELDS)
+
+        async for doc in cursor:
+            timestamp = doc.get("timestamp")
+            if timestamp and timestamp.tzinfo is None:
+                # Mongo hands back naive UTC datetimes; export them with their offset.
+                timestamp = timestamp.replace(tzinfo=timezone.utc)
+            row = {
+                "id": str(doc["_id"]),
+                "timestamp": timestamp.isoformat() if timestamp else None,
+                "task_type": doc.get("task_type"),
+                "mood": doc.get("mood"),
+                "energy": doc.get("energy"),
+                "duration_minutes": doc.get("duration_minutes"),
+                "good_session": doc.get("good_session"),
+            }
+            if writer:
+                writer.writerow([row[field] for field in EXPORT_FIELDS])
+            else:
+                buffer.write(json.dumps(row))
+                buffer.write("\n")
+
+            if buffer.tell() >= EXPORT_CHUNK_BYTES:
+                chunk = buffer.getvalue().encode("utf-8")
+                buffer.seek(0)
+                buffer.truncate()
+                chunk = compressor.compress(chunk) if compressor else chunk
+                if chunk:
+                    yield chunk
+
+        tail = buffer.getvalue().encode("utf-8")
+        if compressor:
+            tail = compressor.compress(tail) + compressor.flush()
+        if tail:
+            yield tail
+
     async def get_detail(self, user_id: str, session_id: str) -> SessionDetailResponse | None:
         doc = await self.collection.find_one({"_id": ObjectId(session_id), "user_id": user_id})
         if not doc:
@@ -125,15 +283,42 @@ class SessionsService:
             goodSession=doc.get("good_session"),
         )
 
-    async def _update_today_cache(self, user_id: str, payload: SessionCreate, timestamp: datetime) -> None:
-        cache_key = self._today_key(user_id)
-        await self.redis.hincrby(cache_key, "sessions_today", 1)
-        await self.redis.hincrby(cache_key, "total_focus_minutes", payload.duration_minutes)
-        await self.redis.hset(cache_key, mapping={"current_mood": payload.mood, "current_energy": payload.energy})
-        await self.redis.expireat(cache_key, int(self._end_of_day(timestamp).timestamp()))
+    def _build_doc(self, user_id: str, payload: SessionCreate, tz: tzinfo) -> dict[str, Any]:
+        timestamp = payload.timestamp or datetime.now(tz=timezone.utc)
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        return {
+            "user_id": user_id,
+            "mood": payload.mood,
+            "energy": payload.energy,
+            "task_type": payload.task_type,
+            "duration_minutes": payload.duration_minutes or 0,
+            "good_session": payload.good_session,
+            "timestamp": timestamp,
+            **local_fields(timestamp, tz),
+            "tz": str(tz),
+        }
+
+    async def _update_today_cache(self, user_id: str, docs: list[dict[str, Any]], tz: tzinfo) -> None:
+        today = local_today(tz)
+        # Backdated sessions do not belong in today's summary.
+        todays = [doc for doc in docs if doc["local_date"] == today.isoformat()]
+        if not todays:
+            return
+        latest = max(todays, key=lambda doc: doc["timestamp"])
+        await update_today_script(
+            keys=[self._today_key(user_id, today)],
+            args=[
+                len(todays),
+                sum(doc["duration_minutes"] for doc in todays),
+                latest["mood"],
+                latest["energy"],
+                int(end_of_local_day(today, tz).timestamp()),
+            ],
+            client=self.redis,
+        )
 
-    async def _cache_today_summary(self, user_id: str, summary: TodaySummaryResponse) -> None:
-        cache_key = self._today_key(user_id)
+    async def _cache_today_summary(self, cache_key: str, summary: TodaySummaryResponse, expires_at: datetime) -> None:
         await self.redis.hset(
             cache_key,
             mapping={
@@ -143,17 +328,15 @@ class SessionsService:
                 "total_focus_minutes": summary.total_focus_minutes,
             },
         )
-        await self.redis.expireat(cache_key, int(self._end_of_day(datetime.now(tz=timezone.utc)).timestamp()))
-
-    def _today_key(self, user_id: str) -> str:
-        date_key = datetime.now(tz=timezone.utc).date().isoformat()
-        return f"user:{user_id}:today:{date_key}"
+        await self.redis.expireat(cache_key, int(expires_at.timestamp()))
 
-    def _today_bounds(self) -> tuple[datetime, datetime]:
-        now = datetime.now(tz=timezone.utc)
-        start = datetime(year=now.year, month=now.month, day=now.day, tzinfo=timezone.utc)
-        return start, start + timedelta(days=1)
+    async def _bump_version(self, user_id: str) -> None:
+        # After the writes, so a reader never pairs the new version with old data.
+        # A failed bump only delays revalidation until the next write or day.
+        try:
+            await bump_version(user_id, self.redis)
+        except Exception:
+            pass
 
-    def _end_of_day(self, timestamp: datetime) -> datetime:
-        start = datetime(year=timestamp.year, month=timestamp.month, day=timestamp.day, tzinfo=timezone.utc)
-        return start + timedelta(days=1)
+    def _today_key(self, user_id: str, today: date) -> str:
+        return f"user:{user_id}:today:{today.isoformat()}"
@@ -0,0 +1,198 @@
+"""
+Background pre-generation of weekly AI summaries.
+
+Shortly after a week starts, one worker walks the users active in the last
+AI_PREGEN_ACTIVE_DAYS (from daily_summaries, in user_id order) in batches,
+builds their weekly data and calls Gemini through a QuotaLimiter that caps
+concurrency and spaces calls to AI_PREGEN_REQUESTS_PER_MINUTE, backing off
+further when Gemini answers 429. Results land in the same `ai:summary:*` keys
+the endpoint reads, through the same fenced lock, so a user who asks while
+their summary is being pre-generated simply waits for it.
+
+Progress is checkpointed in `ai:pregen:{week}` after every batch (cursor =
+last user id finished), so a restarted job resumes where it stopped. Failed
+users are left to the lazy path; fallbacks are never pre-generated, but a
+cached fallback is replaced.
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+import httpx
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from redis.asyncio import Redis
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.redis_Client import redisClient
+from app.core.singleflight import RedisLock
+from app.services.ai_summary_service import AISummaryService, summary_key, week_start_key
+from app.services.gemini_service import GeminiService
+from app.services.rollup_service import day_start
+
+PROGRESS_TTL_SECONDS = 8 * 24 * 3600
+DEFAULT_PAUSE_SECONDS = 60
+
+
+class QuotaLimiter:
+    """Caps concurrent calls and spaces their starts to a requests-per-minute quota."""
+
+    def __init__(self, concurrency: int, per_minute: int) -> None:
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._interval = 60 / per_minute
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    @asynccontextmanager
+    async def slot(self):
+        async with self._semaphore:
+            async with self._lock:
+                now = time.monotonic()
+                wait = self._next - now
+                self._next = max(now, self._next) + self._interval
+            if wait > 0:
+                await asyncio.sleep(wait)
+            yield
+
+    def pause(self, seconds: float) -> None:
+        """Push the next start out, e.g. after a 429."""
+        self._next = max(self._next, time.monotonic() + seconds)
+
+
+class SummaryPregenerator:
+    def __init__(
+        self,
+        mongo: AsyncIOMotorDatabase,
+        redis: Redis = redisClient,
+        gemini: GeminiService | None = None,
+    ) -> None:
+        self.mongo = mongo
+        self.redis = redis
+        self.summaries = AISummaryService(mongo, redis, gemini)
+        self.gemini = self.summaries.gemini
+        self.limiter = QuotaLimiter(settings.AI_PREGEN_CONCURRENCY, settings.AI_PREGEN_REQUESTS_PER_MINUTE)
+
+    async def run(self, week_start: str | None = None) -> dict[str, Any]:
+        """Generate (or resume generating) every active user's summary for the week; returns the progress."""
+        week = week_start or week_start_key()
+        key = progress_key(week)
+        progress = await self.redis.hgetall(key)
+        if progress.get("status") == "done":
+            return progress
+        if not self.gemini.is_configured():
+            raise RuntimeError("Gemini API key not configured")
+
+        await self.redis.hset(key, mapping={"status": "running", "started_at": progress.get("started_at") or _now()})
+        await self.redis.expire(key, PROGRESS_TTL_SECONDS)
+
+        batch: list[str] = []
+        async for user_id in self._active_users(progress.get("cursor", "")):
+            batch.append(user_id)
+            if len(batch) >= settings.AI_PREGEN_BATCH_SIZE:
+                await self._run_batch(week, batch)
+                batch = []
+        if batch:
+            await self._run_batch(week, batch)
+
+        await self.redis.hset(key, mapping={"status": "done", "finished_at": _now()})
+        return await self.redis.hgetall(key)
+
+    async def _active_users(self, after: str):
+        since = day_start(datetime.now(tz=timezone.utc)) - timedelta(days=settings.AI_PREGEN_ACTIVE_DAYS)
+        pipeline = [
+            {"$match": {"day": {"$gte": since}, "user_id": {"$gt": after}}},
+            {"$group": {"_id": "$user_id"}},
+            {"$sort": {"_id": 1}},
+        ]
+        async for group in self.mongo.get_collection("daily_summaries").aggregate(pipeline, allowDiskUse=True):
+            yield group["_id"]
+
+    async def _run_batch(self, week: str, user_ids: list[str]) -> None:
+        outcomes = await asyncio.gather(*[self._generate(week, user_id) for user_id in user_ids])
+        counts = {outcome: outcomes.count(outcome) for outcome in set(outcomes)}
+        key = progress_key(week)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            for outcome, count in counts.items():
+                pipe.hincrby(key, outcome, count)
+            # Users are processed in id order and the whole batch is finished here.
+            pipe.hset(key, mapping={"cursor": user_ids[-1], "updated_at": _now()})
+            pipe.expire(key, PROGRESS_TTL_SECONDS)
+            await pipe.execute()
+        for outcome, count in counts.items():
+            metrics.incr(f"ai_pregen.{outcome}", count)
+
+    async def _generate(self, week: str, user_id: str) -> str:
+        key = summary_key(user_id, week)
+        entry = await self.summaries.read_entry(key)
+        if entry and entry["source"] == "gemini":
+            return "skipped"
+        # Waiting for a slot can take minutes at the quota; take the lock only
+        # once it is our turn, so it is held just for the generation itself.
+        async with self.limiter.slot():
+            lock = RedisLock(key, settings.AI_SUMMARY_LOCK_TTL_SECONDS, self.redis)
+            if not await lock.acquire():
+                # The endpoint is generating it right now.
+                return "skipped"
+            try:
+                # It may have been generated while we waited for the slot.
+                entry = await self.summaries.read_entry(key)
+                if entry and entry["source"] == "gemini":
+                    return "skipped"
+                data = await self.summaries.weekly_data(user_id)
+                deadline = time.monotonic() + settings.AI_SUMMARY_DEADLINE_SECONDS
+                summary = await self.gemini.generate_weekly_summary(data, deadline=deadline)
+                _, stored = await self.summaries.store(lock, key, summary, "gemini")
+                # Not stored: the endpoint took over after our lock expired and wrote first.
+                return "generated" if stored else "skipped"
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code == 429:
+                    retry_after = e.response.headers.get("retry-after", "")
+                    self.limiter.pause(float(retry_after) if retry_after.isdigit() else DEFAULT_PAUSE_SECONDS)
+                return "failed"
+            except Exception as e:
+                print(f"❌ Summary pre-generation failed for {user_id}: {e}")
+                return "failed"
+            finally:
+                await lock.release()
+
+
+def progress_key(week: str) -> str:
+    return f"ai:pregen:{week}"
+
+
+def _now() -> str:
+    return datetime.now(tz=timezone.utc).isoformat()
+
+
+async def _keep_alive(lock: RedisLock, every: float) -> None:
+    # A crashed worker's lock expires within one interval and another worker resumes from the checkpoint.
+    while await lock.extend():
+        await asyncio.sleep(every)
+
+
+async def run_pregenerator(mongo: AsyncIOMotorDatabase) -> None:
+    """Background loop started from the app lifespan; one worker runs the job per week."""
+    pregenerator = SummaryPregenerator(mongo)
+    interval = settings.AI_PREGEN_CHECK_INTERVAL_SECONDS
+    while True:
+        try:
+            now = datetime.now(tz=timezone.utc)
+            week_started = day_start(now) - timedelta(days=now.weekday())
+            in_window = now - week_started < timedelta(hours=settings.AI_PREGEN_WINDOW_HOURS)
+            lock = RedisLock("ai:pregen", ttl_seconds=interval)
+            if in_window and pregenerator.gemini.is_configured() and await lock.acquire():
+                heartbeat = asyncio.create_task(_keep_alive(lock, interval / 3))
+                try:
+                    progress = await pregenerator.run()
+                    print(
+                        f"🗓️ Weekly summaries pre-generated: {progress.get('generated', 0)} generated, "
+                        f"{progress.get('skipped', 0)} skipped, {progress.get('failed', 0)} failed"
+                    )
+                finally:
+                    heartbeat.cancel()
+                    await lock.release()
+        except Exception as e:
+            print(f"❌ Weekly summary pre-generation failed: {e}")
+        await asyncio.sleep(interval)
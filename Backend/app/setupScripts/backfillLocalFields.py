@@ -0,0 +1,126 @@
+"""
+Script to backfill local_date, local_hour, local_weekday and tz on work_sessions
+written before log_session stored them, using each user's
+UserPreferences.timezone (UTC when unset). Users are processed several at a
+time, each in batches of --batch-size sessions; the script can be interrupted
+and re-run, since it only touches sessions that still lack local_date.
+
+Once a user is backfilled their rollups are rebuilt on local days and their
+cached today summary, recommendation table and data version are reset, unless
+--skip-rollups is given.
+
+Usage:
+    python -m app.setupScripts.backfillLocalFields [--concurrency 8] [--batch-size 1000] [--skip-rollups]
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+# Add the parent directory to the path so we can import app modules
+sys.path.append(str(Path(__file__).parent))
+
+from pymongo import UpdateOne
+
+from app.core.data_version import bump_version
+from app.core.redis_Client import close_redis, redisClient
+from app.core.user_timezone import local_fields, local_today, resolve_timezone
+from app.db.mongo import client, get_mongo_db
+from app.db.mongo_indexes import ensure_indexes
+from app.db.postgres import AsyncSessionLocal, engine
+from app.repositories.users import UserRepository
+from app.services.recommendation_service import RecommendationService
+from app.services.rollup_service import RollupService
+
+MISSING = {"local_date": {"$exists": False}}
+
+
+async def _pending_user_ids(sessions):
+    async for group in sessions.aggregate([{"$match": MISSING}, {"$group": {"_id": "$user_id"}}], allowDiskUse=True):
+        yield group["_id"]
+
+
+async def backfill_local_fields(concurrency: int, batch_size: int, skip_rollups: bool) -> int:
+    print("🔧 Backfilling user-local session fields...")
+    db = get_mongo_db()
+    sessions = db.get_collection("work_sessions")
+    rollups = RollupService(db)
+    recommendations = RecommendationService(db, redisClient)
+    semaphore = asyncio.Semaphore(concurrency)
+    users = failures = updated = 0
+
+    async def backfill(user_id: str, tz_name: str | None) -> None:
+        nonlocal users, failures, updated
+        tz = resolve_timezone(tz_name)
+        try:
+            while True:
+                batch = (
+                    await sessions.find({"user_id": user_id, **MISSING}, {"timestamp": 1})
+                    .limit(batch_size)
+                    .to_list(length=batch_size)
+                )
+                if not batch:
+                    break
+                await sessions.bulk_write(
+                    [
+                        UpdateOne(
+                            {"_id": doc["_id"]},
+                            {"$set": {**local_fields(doc["timestamp"], tz), "tz": str(tz)}},
+                        )
+                        for doc in batch
+                    ],
+                    ordered=False,
+                )
+                updated += len(batch)
+
+            if not skip_rollups:
+                await rollups.rebuild_user(user_id)
+                await recommendations.invalidate(user_id)
+                await redisClient.delete(f"user:{user_id}:today:{local_today(tz).isoformat()}")
+                await bump_version(user_id)
+            users += 1
+        except Exception as e:
+            failures += 1
+            print(f"   ❌ {user_id}: {e}")
+        finally:
+            semaphore.release()
+
+    try:
+        await ensure_indexes(db)
+        async with AsyncSessionLocal() as session:
+            timezones = await UserRepository(session).get_timezones()
+        print(f"📍 {len(timezones)} users have a timezone preference")
+
+        tasks = []
+        async for user_id in _pending_user_ids(sessions):
+            await semaphore.acquire()
+            tasks.append(asyncio.create_task(backfill(user_id, timezones.get(user_id))))
+            tasks = [task for task in tasks if not task.done()]
+        await asyncio.gather(*tasks)
+
+        print(f"✅ Backfilled {updated} sessions for {users} users")
+        if failures:
+            print(f"❌ {failures} users failed; re-run to retry them")
+            return 1
+        print("\n🎉 Local fields backfilled!")
+        return 0
+
+    except Exception as e:
+        print(f"\n❌ Error backfilling local fields: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+
+    finally:
+        client.close()
+        await engine.dispose()
+        await close_redis()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=8, help="users backfilled in parallel")
+    parser.add_argument("--batch-size", type=int, default=1000, help="sessions updated per bulk write")
+    parser.add_argument("--skip-rollups", action="store_true", help="do not rebuild rollups and caches")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(backfill_local_fields(args.concurrency, args.batch_size, args.skip_rollups)))
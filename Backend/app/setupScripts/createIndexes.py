@@ -0,0 +1,40 @@
+"""
+Script to create the MongoDB indexes.
+Index creation is idempotent; the app also runs it in the background at
+startup unless MONGO_ENSURE_INDEXES_ON_STARTUP is false. The query plans the
+indexes exist for are checked by tests/test_query_plans.py.
+
+Usage:
+    python -m app.setupScripts.createIndexes
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+# Add the parent directory to the path so we can import app modules
+sys.path.append(str(Path(__file__).parent))
+
+from app.db.mongo import client, get_mongo_db
+from app.db.mongo_indexes import ensure_indexes
+
+
+async def create_indexes() -> int:
+    print("🔧 Creating MongoDB indexes...")
+    try:
+        created = await ensure_indexes(get_mongo_db())
+        for collection, names in created.items():
+            print(f"✅ {collection}: {', '.join(names)}")
+        return 0
+
+    except Exception as e:
+        print(f"\n❌ Error creating indexes: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(create_indexes()))
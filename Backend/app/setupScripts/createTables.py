@@ -30,11 +30,11 @@ async def create_tables():
             future=True
         )
         
-        # Import all models so they're registered with Base.metadata
+        # Import all models so they're registered with Base.metadata. These are
+        # the models the app runs against, including the partitioned auth_sessions.
         print("\n📦 Importing models...")
-        from app.models.base import Base
-        from app.models.users import User
-        from app.models.auth_session import AuthSession
+        from app.models.sqlalchemy_models import Base
+        from app.services.session_retention_service import SessionRetentionService
         # Import any other models you have here
         # from app.models.moods import Mood
         # from app.models.journal_entries import JournalEntry
@@ -51,6 +51,10 @@ async def create_tables():
             # Create all tables
             await conn.run_sync(Base.metadata.create_all)
             print("✅ All tables created successfully")
+
+        # auth_sessions is partitioned; without partitions every insert fails.
+        partitions = await SessionRetentionService(engine).ensure_partitions()
+        print(f"✅ auth_sessions partitions ready: {', '.join(partitions)}")
         
         # Close the engine
         await engine.dispose()
@@ -0,0 +1,81 @@
+"""
+Script to (re)create auth_sessions as a monthly range-partitioned table.
+Safe to run repeatedly: an already partitioned table only gets its upcoming
+partitions created. A plain auth_sessions table is rebuilt and only its live
+(non-revoked, unexpired) rows are carried over.
+
+Usage:
+    python -m app.setupScripts.partitionAuthSessions
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+# Add the parent directory to the path so we can import app modules
+sys.path.append(str(Path(__file__).parent))
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.config import settings
+from app.models.sqlalchemy_models import Base
+from app.services.session_retention_service import SessionRetentionService
+
+COLUMNS = (
+    'id, user_id, refresh_token_hash, device_name, device_id, ip_address, '
+    'user_agent, is_revoked, expires_at, "createdAt", revoked_at'
+)
+
+
+async def partition_auth_sessions():
+    print("🔧 Partitioning auth_sessions...")
+    print(f"📍 Database URL: {settings.DATABASE_URL.split('@')[-1]}")  # Hide password
+
+    engine = create_async_engine(settings.DATABASE_URL, future=True)
+    try:
+        async with engine.begin() as conn:
+            result = await conn.execute(text("SELECT relkind FROM pg_class WHERE relname = 'auth_sessions'"))
+            relkind = result.scalar_one_or_none()
+
+            carried = False
+            if relkind == "r":
+                print("📦 Found a plain auth_sessions table, carrying over live sessions...")
+                await conn.execute(text("DROP TABLE IF EXISTS auth_sessions_carry"))
+                await conn.execute(
+                    text(
+                        "CREATE TABLE auth_sessions_carry AS SELECT * FROM auth_sessions "
+                        "WHERE is_revoked = false AND expires_at > now()"
+                    )
+                )
+                await conn.execute(text("DROP TABLE auth_sessions"))
+                carried = True
+            elif relkind == "p":
+                print("✅ auth_sessions is already partitioned")
+
+            await conn.run_sync(Base.metadata.create_all)
+
+        created = await SessionRetentionService(engine).ensure_partitions()
+        print(f"✅ Partitions ready: {', '.join(created)}")
+
+        if carried:
+            async with engine.begin() as conn:
+                result = await conn.execute(
+                    text(f"INSERT INTO auth_sessions ({COLUMNS}) SELECT {COLUMNS} FROM auth_sessions_carry")
+                )
+                await conn.execute(text("DROP TABLE auth_sessions_carry"))
+            print(f"✅ Carried over {result.rowcount} live sessions")
+
+        print("\n🎉 auth_sessions partitioning complete!")
+
+    except Exception as e:
+        print(f"\n❌ Error partitioning auth_sessions: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(partition_auth_sessions())
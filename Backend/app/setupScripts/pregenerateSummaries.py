@@ -0,0 +1,58 @@
+"""
+Script to pre-generate weekly AI summaries for recently active users.
+Runs the same job as the AI_PREGEN_ENABLED background loop, outside its
+window. Progress is checkpointed in Redis, so an interrupted run resumes where
+it stopped; pass --restart to walk every user again.
+
+Point GEMINI_BASE_URL at `python -m benchmarks.gemini_client --serve PORT`
+(with GEMINI_API_KEY=stub) to exercise it end to end without calling Google.
+
+Usage:
+    python -m app.setupScripts.pregenerateSummaries [--week 2026-10-12] [--restart]
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+# Add the parent directory to the path so we can import app modules
+sys.path.append(str(Path(__file__).parent))
+
+from app.core.http_clients import gemini_http
+from app.core.redis_Client import redisClient
+from app.db.mongo import client, get_mongo_db
+from app.services.ai_summary_service import week_start_key
+from app.services.summary_pregeneration_service import SummaryPregenerator, progress_key
+
+
+async def pregenerate_summaries(week: str, restart: bool) -> int:
+    print(f"🔧 Pre-generating weekly summaries for the week of {week}...")
+    pregenerator = SummaryPregenerator(get_mongo_db())
+    try:
+        if restart:
+            await redisClient.delete(progress_key(week))
+        progress = await pregenerator.run(week)
+        print(
+            f"✅ {progress.get('generated', 0)} generated, {progress.get('skipped', 0)} skipped, "
+            f"{progress.get('failed', 0)} failed"
+        )
+        print("\n🎉 Weekly summaries pre-generated!")
+        return 0
+
+    except Exception as e:
+        print(f"\n❌ Error pre-generating weekly summaries: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+
+    finally:
+        await gemini_http.aclose()
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--week", default=week_start_key(), help="week start date (Monday, YYYY-MM-DD)")
+    parser.add_argument("--restart", action="store_true", help="ignore the saved checkpoint")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(pregenerate_summaries(args.week, args.restart)))
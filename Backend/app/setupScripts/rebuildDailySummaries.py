@@ -0,0 +1,89 @@
+"""
+Script to backfill or rebuild the daily_summaries and hourly_buckets rollups
+from work_sessions.
+Each user's rollups are recomputed and replaced independently, several users
+at a time. Sessions logged for a user while that user is being rebuilt may be
+miscounted, so run it before enabling rollup reads or re-run it for those users.
+
+Usage:
+    python -m app.setupScripts.rebuildDailySummaries [--concurrency 8] [--user USER_ID ...]
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+# Add the parent directory to the path so we can import app modules
+sys.path.append(str(Path(__file__).parent))
+
+from app.db.mongo import client, get_mongo_db
+from app.db.mongo_indexes import ensure_indexes
+from app.services.rollup_service import RollupService
+
+
+async def _user_ids(db):
+    # Streams distinct ids instead of materialising them with distinct().
+    async for group in db.get_collection("work_sessions").aggregate(
+        [{"$group": {"_id": "$user_id"}}], allowDiskUse=True
+    ):
+        yield group["_id"]
+
+
+async def rebuild_daily_summaries(concurrency: int, user_ids: list[str]) -> int:
+    print("🔧 Rebuilding daily summaries...")
+    db = get_mongo_db()
+    rollups = RollupService(db)
+    semaphore = asyncio.Semaphore(concurrency)
+    users = failures = days = 0
+
+    async def rebuild(user_id: str) -> None:
+        nonlocal users, failures, days
+        try:
+            days += await rollups.rebuild_user(user_id)
+            users += 1
+        except Exception as e:
+            failures += 1
+            print(f"   ❌ {user_id}: {e}")
+        finally:
+            semaphore.release()
+
+    try:
+        # The unique (user_id, day) index must exist before concurrent upserts run.
+        await ensure_indexes(db)
+
+        tasks = []
+        source = _user_ids(db) if not user_ids else None
+        pending = iter(user_ids)
+        while True:
+            await semaphore.acquire()
+            user_id = next(pending, None) if source is None else await anext(source, None)
+            if user_id is None:
+                semaphore.release()
+                break
+            tasks.append(asyncio.create_task(rebuild(user_id)))
+            tasks = [task for task in tasks if not task.done()]
+        await asyncio.gather(*tasks)
+
+        print(f"✅ Rebuilt {days} daily summaries for {users} users")
+        if failures:
+            print(f"❌ {failures} users failed")
+            return 1
+        print("\n🎉 Daily summaries rebuilt!")
+        return 0
+
+    except Exception as e:
+        print(f"\n❌ Error rebuilding daily summaries: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=8, help="users rebuilt in parallel")
+    parser.add_argument("--user", action="append", default=[], help="rebuild only this user id")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(rebuild_daily_summaries(args.concurrency, args.user)))
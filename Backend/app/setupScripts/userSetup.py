@@ -16,10 +16,9 @@ sys.path.append(str(Path(__file__).parent))
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from app.core.config import settings
-from app.models.base import Base
-from app.models.users import User
-from app.models.auth_session import AuthSession
+from app.models.sqlalchemy_models import Base, User
 from app.core.security import hash_password
+from app.services.session_retention_service import SessionRetentionService
 
 
 async def init():
@@ -48,6 +47,8 @@ async def init():
         print("\n🔨 Creating database schemas...")
         async with engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
+        # auth_sessions is partitioned; without partitions every insert fails.
+        await SessionRetentionService(engine).ensure_partitions()
         print("✅ Database schemas created!")
         
         # Create session for seeding
@@ -78,9 +79,7 @@ async def init():
                     first_name="David",
                     last_name="Umunna",
                     email=email,
-                    password_hash=hashed_password,
-                    is_active=True,
-                    is_verified=True  # Auto-verify seed user
+                    hashed_password=hashed_password,
                 )
                 
                 session.add(user)
@@ -102,7 +101,7 @@ async def init():
                 for idx, u in enumerate(users, 1):
                     print(f"{idx}. {u.first_name} {u.last_name} ({u.email})")
                     print(f"   ID: {u.user_id}")
-                    print(f"   Active: {u.is_active} | Verified: {u.is_verified}")
+                    print(f"   Onboarded: {u.has_onboarded}")
                     print(f"   Created: {u.createdAt}")
                     print("-" * 60)
             else:
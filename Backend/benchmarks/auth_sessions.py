@@ -0,0 +1,105 @@
+"""
+Generates millions of auth_sessions rows and measures lookup latency as the
+table grows, to check that refresh and active-session lookups stay flat.
+
+Rows are generated server-side with generate_series, spread over the last
+12 months; most of them are revoked or expired like real traffic.
+
+Usage:
+    python -m benchmarks.auth_sessions [--steps 1000000 2000000 5000000]
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.config import settings
+from app.services.session_retention_service import SessionRetentionService
+
+GENERATE_SQL = text(
+    """
+    INSERT INTO auth_sessions (id, user_id, refresh_token_hash, is_revoked, expires_at, "createdAt", revoked_at)
+    SELECT gen_random_uuid(), CAST(:user_id AS uuid), md5(random()::text || g::text),
+           random() < 0.8,
+           now() - interval '365 days' * random() + interval '14 days',
+           now(), NULL
+    FROM generate_series(1, :count) g
+    """
+)
+
+LIVE_SQL = text(
+    """
+    INSERT INTO auth_sessions (id, user_id, refresh_token_hash, is_revoked, expires_at, "createdAt")
+    VALUES (CAST(:id AS uuid), CAST(:user_id AS uuid), :hash, false, now() + interval '14 days', now())
+    """
+)
+
+ROTATE_LOOKUP_SQL = text(
+    """
+    SELECT 1 FROM auth_sessions
+    WHERE id = CAST(:id AS uuid) AND refresh_token_hash = :hash
+      AND is_revoked = false AND expires_at > now()
+    """
+)
+
+ACTIVE_SQL = text(
+    "SELECT count(*) FROM auth_sessions WHERE user_id = CAST(:user_id AS uuid) "
+    "AND is_revoked = false AND expires_at > now()"
+)
+
+
+async def _time(conn, statement, params, runs: int = 200) -> float:
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        await conn.execute(statement, params)
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--steps", type=int, nargs="+", default=[1_000_000, 2_000_000, 5_000_000])
+    args = parser.parse_args()
+
+    engine = create_async_engine(settings.DATABASE_URL)
+    await SessionRetentionService(engine).ensure_partitions(months_back=12)
+
+    user_id = str(uuid.uuid4())
+    live_id = str(uuid.uuid4())
+    async with engine.begin() as conn:
+        await conn.execute(
+            text("INSERT INTO users (user_id, email, password_hash, has_onboarded, generation) "
+                 "VALUES (CAST(:id AS uuid), :email, 'x', false, 0)"),
+            {"id": user_id, "email": f"bench-{user_id[:8]}@example.com"},
+        )
+        await conn.execute(LIVE_SQL, {"id": live_id, "user_id": user_id, "hash": "bench-live"})
+
+    total = 0
+    print(f"{'rows':>12} {'rotate lookup':>15} {'active sessions':>17}")
+    for target in args.steps:
+        async with engine.begin() as conn:
+            await conn.execute(GENERATE_SQL, {"user_id": user_id, "count": target - total})
+            await conn.execute(text("ANALYZE auth_sessions"))
+        total = target
+
+        async with engine.connect() as conn:
+            rotate_ms = await _time(conn, ROTATE_LOOKUP_SQL, {"id": live_id, "hash": "bench-live"})
+            active_ms = await _time(conn, ACTIVE_SQL, {"user_id": user_id}, runs=20)
+        print(f"{total:>12,} {rotate_ms:>12.2f} ms {active_ms:>14.2f} ms")
+
+    async with engine.begin() as conn:
+        await conn.execute(text("DELETE FROM users WHERE user_id = CAST(:id AS uuid)"), {"id": user_id})
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,126 @@
+"""
+Compares the deep-work slot query on raw work_sessions with the read over the
+hourly_buckets rollup for heavy users. Each user gets --sessions synthetic
+sessions spread over the last 30 days; the rollups are rebuilt from them, both
+queries are timed and their results compared. Synthetic data is removed at the
+end.
+
+Usage:
+    python -m benchmarks.deep_work_slots [--sessions 1000 10000 50000] [--runs 50]
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from app.db.mongo import client, get_mongo_db
+from app.db.mongo_indexes import ensure_indexes
+from app.services.rollup_service import RollupService, day_start
+
+TASK_TYPES = ("Deep work", "Meetings", "Admin", "Learning")
+
+
+def raw_pipeline(user_id: str, start: datetime) -> list[dict]:
+    # The pipeline AnalyticsService._deep_work_slots ran before the rollup.
+    return [
+        {"$match": {"user_id": user_id, "task_type": "Deep work", "timestamp": {"$gte": start}}},
+        {
+            "$group": {
+                "_id": {"dayOfWeek": {"$dayOfWeek": "$timestamp"}, "hour": {"$hour": "$timestamp"}},
+                "avg_duration": {"$avg": "$duration_minutes"},
+                "count": {"$sum": 1},
+            }
+        },
+        {
+            "$project": {
+                "_id": 0,
+                "dayOfWeek": {"$subtract": ["$_id.dayOfWeek", 1]},
+                "hour": "$_id.hour",
+                "score": {"$add": ["$avg_duration", "$count"]},
+            }
+        },
+        {"$sort": {"score": -1}},
+    ]
+
+
+async def _time(runs: int, query) -> tuple[list[float], object]:
+    latencies = []
+    result = None
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = await query()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return sorted(latencies), result
+
+
+def _report(label: str, latencies: list[float]) -> None:
+    print(
+        f"  {label:<8} p50 {statistics.median(latencies):7.2f} ms"
+        f"  p95 {latencies[int(len(latencies) * 0.95) - 1]:7.2f} ms"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+
+    db = get_mongo_db()
+    sessions = db.get_collection("work_sessions")
+    rollups = RollupService(db)
+    await ensure_indexes(db)
+
+    # Both queries cover whole UTC days so their results are comparable.
+    start = day_start(datetime.now(tz=timezone.utc)) - timedelta(days=30)
+    user_ids = []
+    try:
+        for count in args.sessions:
+            user_id = f"bench-{uuid.uuid4()}"
+            user_ids.append(user_id)
+            docs = [
+                {
+                    "user_id": user_id,
+                    "mood": random.randint(1, 5),
+                    "energy": random.choice(("low", "medium", "high")),
+                    "task_type": random.choice(TASK_TYPES),
+                    "duration_minutes": random.randint(10, 120),
+                    "good_session": None,
+                    "timestamp": start + timedelta(seconds=random.randint(0, 30 * 24 * 3600)),
+                }
+                for _ in range(count)
+            ]
+            for offset in range(0, len(docs), 5000):
+                await sessions.insert_many(docs[offset : offset + 5000], ordered=False)
+            await rollups.rebuild_user(user_id)
+
+            raw_latencies, raw = await _time(
+                args.runs, lambda: sessions.aggregate(raw_pipeline(user_id, start)).to_list(length=None)
+            )
+            rollup_latencies, buckets = await _time(
+                args.runs, lambda: rollups.read_slots(user_id, "Deep work", start)
+            )
+
+            expected = {(row["dayOfWeek"], row["hour"]): round(row["score"], 6) for row in raw}
+            actual = {
+                (row["dayOfWeek"], row["hour"]): round(row["duration_sum"] / row["count"] + row["count"], 6)
+                for row in buckets
+            }
+            print(f"{count} sessions, {len(buckets)} slots, results {'match' if expected == actual else 'DIFFER'}")
+            _report("raw", raw_latencies)
+            _report("rollup", rollup_latencies)
+    finally:
+        for collection in ("work_sessions", "daily_summaries", "hourly_buckets"):
+            await db.get_collection(collection).delete_many({"user_id": {"$in": user_ids}})
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
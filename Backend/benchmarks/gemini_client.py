@@ -0,0 +1,126 @@
+"""
+Exercises GeminiService against a local stub of the generateContent endpoint.
+
+The stub (tests/gemini_stub.py, shared with the test suite) answers each
+request according to a scripted sequence of behaviours (ok, slow:SECONDS, an
+HTTP status such as 429 or 500, 429:RETRY_AFTER, reset), so retries, backoff
+and deadlines can be checked without calling Google. It then compares latency
+of the shared keep-alive client with a new client per call, as the service
+used to do.
+
+With --serve the stub just keeps listening (every request answered "ok"
+after --latency seconds), to stand in for Gemini in end-to-end runs of the
+app or the summary pre-generation job:
+    GEMINI_BASE_URL=http://127.0.0.1:8765 GEMINI_API_KEY=stub ...
+
+Usage:
+    python -m benchmarks.gemini_client [--requests 200]
+    python -m benchmarks.gemini_client --serve 8765 [--latency 0.5]
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import httpx
+
+from app.core import metrics
+from app.services.gemini_service import GeminiService
+from tests.gemini_stub import StubGemini
+
+async def scenario(stub: StubGemini, service: GeminiService, name: str, script: list[str], budget: float) -> None:
+    stub.script = list(script)
+    stub.requests = 0
+    retries = metrics.get("gemini.retries")
+    started = time.perf_counter()
+    try:
+        await service.generate_weekly_summary({}, deadline=time.monotonic() + budget)
+        outcome = "ok"
+    except Exception as e:
+        outcome = type(e).__name__
+    elapsed = time.perf_counter() - started
+    print(
+        f"  {name:<28} {outcome:<26} attempts {stub.requests}  "
+        f"retries {metrics.get('gemini.retries') - retries}  {elapsed * 1000:7.1f} ms (budget {budget:.1f}s)"
+    )
+
+
+async def latency(service_factory, requests: int) -> list[float]:
+    latencies = []
+    for _ in range(requests):
+        service, client = service_factory()
+        started = time.perf_counter()
+        await service.generate_weekly_summary({})
+        latencies.append((time.perf_counter() - started) * 1000)
+        if client is not None:
+            await client.aclose()
+    return sorted(latencies)
+
+
+async def serve(port: int, latency: float) -> None:
+    stub = StubGemini(default=f"slow:{latency}" if latency else "ok")
+    server = await asyncio.start_server(stub.handle, "127.0.0.1", port)
+    print(f"Stub Gemini listening on http://127.0.0.1:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--serve", type=int, metavar="PORT", help="only run the stub on PORT")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds the stub takes per request with --serve")
+    args = parser.parse_args()
+    if args.serve:
+        await serve(args.serve, args.latency)
+        return
+
+    stub = StubGemini()
+    server = await asyncio.start_server(stub.handle, "127.0.0.1", 0)
+    base_url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+
+    shared = httpx.AsyncClient(base_url=base_url, timeout=httpx.Timeout(None, connect=5))
+    service = GeminiService(api_key="stub", client=shared)
+    try:
+        print("Retry and deadline scenarios:")
+        await scenario(stub, service, "healthy", [], 5)
+        await scenario(stub, service, "429 then ok", ["429", "ok"], 5)
+        await scenario(stub, service, "500 x2 then ok", ["500", "500", "ok"], 10)
+        await scenario(stub, service, "connection reset then ok", ["reset", "ok"], 5)
+        await scenario(stub, service, "500 until retries run out", ["500"] * 10, 30)
+        await scenario(stub, service, "slow beyond the budget", ["slow:3"], 1)
+        await scenario(stub, service, "slow, retry within budget", ["slow:1.5", "ok"], 3)
+        chunks = [text async for text in service.stream_weekly_summary({})]
+        print(f"  {'streamed':<28} {len(chunks)} chunks: {''.join(chunks)!r}")
+
+        print(f"\nLatency over {args.requests} sequential calls:")
+        stub.connections = 0
+        pooled = await latency(lambda: (service, None), args.requests)
+        pooled_connections = stub.connections
+
+        def fresh():
+            client = httpx.AsyncClient(base_url=base_url, timeout=20.0)
+            return GeminiService(api_key="stub", client=client), client
+
+        stub.connections = 0
+        per_call = await latency(fresh, args.requests)
+        for label, values, connections in (
+            ("shared client", pooled, pooled_connections),
+            ("client per call", per_call, stub.connections),
+        ):
+            print(
+                f"  {label:<16} p50 {statistics.median(values):6.2f} ms  "
+                f"p95 {values[int(len(values) * 0.95) - 1]:6.2f} ms  connections {connections}"
+            )
+    finally:
+        await shared.aclose()
+        server.close()
+        await server.wait_closed()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,77 @@
+"""
+Benchmark for the bcrypt hashing pool.
+Runs a burst of concurrent verifications for several worker counts while a
+ticker measures how late the event loop wakes up (loop stall).
+
+Usage:
+    python -m benchmarks.hashing [--requests 64] [--executor thread|process]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from app.core.hashing import HashingPool
+from app.core.security import hash_password, verify_password
+
+
+async def _ticker(stop: asyncio.Event, interval: float, lags: list[float]) -> None:
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, loop.time() - expected))
+
+
+async def run(executor: str, workers: int, requests: int, hashed: str, inline: bool) -> None:
+    pool = HashingPool(kind=executor, workers=workers, max_queue=requests, timeout=120)
+    stop = asyncio.Event()
+    lags: list[float] = []
+    ticker = asyncio.create_task(_ticker(stop, 0.01, lags))
+
+    started = time.perf_counter()
+    if inline:
+        # Baseline: what the handlers used to do, directly on the loop.
+        for _ in range(requests):
+            verify_password("correct horse battery staple", hashed)
+            await asyncio.sleep(0)
+    else:
+        await asyncio.gather(
+            *[pool.run(verify_password, "correct horse battery staple", hashed) for _ in range(requests)]
+        )
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await ticker
+    pool.shutdown()
+
+    label = "inline" if inline else f"{executor} x{workers}"
+    worst = max(lags) * 1000 if lags else 0.0
+    print(f"{label:<14} {requests / elapsed:8.1f} logins/s   max loop stall {worst:8.1f} ms")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--executor", default="thread", choices=["thread", "process"])
+    args = parser.parse_args()
+
+    hashed = hash_password("correct horse battery staple")
+    cores = os.cpu_count() or 1
+
+    print("=" * 60)
+    print(f"  bcrypt verify benchmark ({args.requests} requests, {cores} cores)")
+    print("=" * 60)
+    await run(args.executor, 1, args.requests, hashed, inline=True)
+    workers = 1
+    while workers <= cores:
+        await run(args.executor, workers, args.requests, hashed, inline=False)
+        workers *= 2
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
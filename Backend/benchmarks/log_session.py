@@ -0,0 +1,78 @@
+"""
+End-to-end benchmark for POST /sessions and POST /sessions/batch against a
+running server. Run it on two revisions to compare write-path latency at a
+given concurrency, or with --batch-size to measure bulk ingestion throughput.
+Raise RATE_LIMIT_API_MAX_REQUESTS on the server first, or the limiter will
+answer most requests with 429.
+
+Usage:
+    BASE_URL=http://localhost:8000 python -m benchmarks.log_session [--concurrency 200] [--requests 5000]
+    BASE_URL=http://localhost:8000 python -m benchmarks.log_session --batch-size 500 --concurrency 8
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+import uuid
+
+import httpx
+
+BASE_URL = os.getenv("BASE_URL", "http://localhost:8000")
+
+
+async def _access_token(client: httpx.AsyncClient) -> str:
+    email = f"bench-{uuid.uuid4().hex[:8]}@example.com"
+    response = await client.post("/auth/register", json={"email": email, "password": "benchmark-password"})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=1)
+    args = parser.parse_args()
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=BASE_URL, limits=limits, timeout=60) as client:
+        token = await _access_token(client)
+        headers = {"Authorization": f"Bearer {token}"}
+        body = {"mood": 4, "energy": "high", "taskType": "Deep work", "durationMinutes": 25}
+
+        # Build today's cached summary first so every write exercises the cache update.
+        await client.get("/sessions/today", headers=headers)
+
+        latencies: list[float] = []
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def one() -> None:
+            async with semaphore:
+                started = time.perf_counter()
+                if args.batch_size > 1:
+                    response = await client.post(
+                        "/sessions/batch", json={"items": [body] * args.batch_size}, headers=headers
+                    )
+                else:
+                    response = await client.post("/sessions", json=body, headers=headers)
+                latencies.append((time.perf_counter() - started) * 1000)
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*[one() for _ in range(args.requests)])
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    sessions = args.requests * args.batch_size
+    print(
+        f"{args.requests} requests x {args.batch_size} sessions at concurrency {args.concurrency}: "
+        f"{args.requests / elapsed:.0f} req/s, {sessions / elapsed:.0f} sessions/s"
+    )
+    print(f"  p50 {statistics.median(latencies):.1f} ms")
+    print(f"  p95 {latencies[int(len(latencies) * 0.95) - 1]:.1f} ms")
+    print(f"  p99 {latencies[int(len(latencies) * 0.99) - 1]:.1f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,75 @@
+"""
+Benchmark for refresh-token rotation against a running server.
+
+1. Races several refreshes of the same token and checks exactly one succeeds.
+2. Rotates many independent sessions concurrently and reports latency percentiles.
+
+Usage:
+    BASE_URL=http://localhost:8000 python -m benchmarks.refresh [--sessions 50] [--rounds 5]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+import uuid
+
+import httpx
+
+BASE_URL = os.getenv("BASE_URL", "http://localhost:8000")
+PASSWORD = "benchmark-password"
+
+
+async def _login(client: httpx.AsyncClient, email: str) -> str:
+    response = await client.post("/auth/login", json={"email": email, "password": PASSWORD})
+    response.raise_for_status()
+    return response.json()["refresh_token"]
+
+
+async def race_same_token(client: httpx.AsyncClient, email: str, racers: int) -> None:
+    token = await _login(client, email)
+    responses = await asyncio.gather(
+        *[client.post("/auth/refresh", json={"refresh_token": token}) for _ in range(racers)]
+    )
+    winners = sum(1 for r in responses if r.status_code == 200)
+    print(f"same-token race: {racers} concurrent refreshes -> {winners} succeeded (expected 1)")
+
+
+async def rotate(client: httpx.AsyncClient, token: str, latencies: list[float]) -> str:
+    started = time.perf_counter()
+    response = await client.post("/auth/refresh", json={"refresh_token": token})
+    latencies.append((time.perf_counter() - started) * 1000)
+    response.raise_for_status()
+    return response.json()["refresh_token"]
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    limits = httpx.Limits(max_connections=args.sessions, max_keepalive_connections=args.sessions)
+    async with httpx.AsyncClient(base_url=BASE_URL, limits=limits, timeout=30) as client:
+        email = f"bench-{uuid.uuid4().hex[:8]}@example.com"
+        response = await client.post("/auth/register", json={"email": email, "password": PASSWORD})
+        response.raise_for_status()
+
+        await race_same_token(client, email, racers=10)
+
+        tokens = [await _login(client, email) for _ in range(args.sessions)]
+        latencies: list[float] = []
+        started = time.perf_counter()
+        for _ in range(args.rounds):
+            tokens = await asyncio.gather(*[rotate(client, t, latencies) for t in tokens])
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"{len(latencies)} rotations with {args.sessions} concurrent sessions in {elapsed:.2f}s")
+    print(f"  p50 {statistics.median(latencies):.1f} ms")
+    print(f"  p95 {latencies[int(len(latencies) * 0.95) - 1]:.1f} ms")
+    print(f"  p99 {latencies[int(len(latencies) * 0.99) - 1]:.1f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,5 +1,7 @@
+import asyncio
 from collections.abc import AsyncIterator
-from fastapi import FastAPI, HTTPException, Request
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.responses import JSONResponse
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from fastapi.middleware.cors import CORSMiddleware
@@ -10,41 +12,91 @@ from app.routers import analytics
 from app.routers import recommendation
 from app.routers import ai
 from app.routers import onboarding
-from app.core.redis_Client import connect_redis, redisClient
-from tortoise.contrib.fastapi import register_tortoise
-from app.tortoise_config import TORTOISE_ORM
+from app.routers import metrics
+from app.core.hashing import hashing_pool
+from app.core.resources import resources
+from app.middlewares.ratelimiter import RateLimitMiddleware
+from app.core.config import settings
+from app.db.mongo import get_mongo_db
+from app.db.mongo_indexes import ensure_indexes
+from app.db.postgres import engine
+from app.services.ai_summary_service import run_summary_jobs
+from app.services.rollup_service import run_rollup_repairer
+from app.services.session_retention_service import SessionRetentionService, run_sweeper
+from app.services.summary_pregeneration_service import run_pregenerator
+
+
+
+async def ensure_session_partitions() -> None:
+    # Logins insert into auth_sessions, which needs its partitions before the
+    # sweeper (which only runs where it wins the Redis lock) gets to them.
+    try:
+        await SessionRetentionService(engine).ensure_partitions()
+    except Exception as e:
+        print(f"❌ auth_sessions partition check failed: {e}")
+
 
+async def build_indexes() -> None:
+    try:
+        await ensure_indexes(get_mongo_db())
+        print("✅ MongoDB indexes ensured")
+    except Exception as e:
+        print(f"❌ MongoDB index creation failed: {e}")
 
 
+@asynccontextmanager
 async def life_span(app: FastAPI) -> AsyncIterator[None]:
+    # Startup: warm the Postgres, Mongo and Redis pools
+    await resources.startup()
 
-    await connect_redis()
-    try:
-        # Startup: try to connect Redis
-        await connect_redis()
-        print("✅ Redis connected")
-    except Exception as e:
-        print(f"❌ Redis connection failed: {e}")
+    await ensure_session_partitions()
+
+    # Index builds can take minutes on large collections; serve while they run.
+    index_builder = asyncio.create_task(build_indexes()) if settings.MONGO_ENSURE_INDEXES_ON_STARTUP else None
+    sweeper = asyncio.create_task(run_sweeper(engine))
+    rollup_repairer = asyncio.create_task(run_rollup_repairer(get_mongo_db()))
+    pregenerator = (
+        asyncio.create_task(run_pregenerator(get_mongo_db())) if settings.AI_PREGEN_ENABLED else None
+    )
+    llm_consumers = [
+        asyncio.create_task(run_summary_jobs(get_mongo_db())) for _ in range(settings.LLM_QUEUE_WORKERS)
+    ]
        
     yield  
 
+    if index_builder:
+        index_builder.cancel()
+    sweeper.cancel()
+    rollup_repairer.cancel()
+    if pregenerator:
+        pregenerator.cancel()
+    for consumer in llm_consumers:
+        consumer.cancel()
+    hashing_pool.shutdown()
+    await resources.shutdown()
+
 app = FastAPI(title="MoodSync",lifespan=life_span)
 
 
-@app.exception_handler(StarletteHTTPException)
-async def http_exception_handler(request: Request, exc: StarletteHTTPException):
+def http_error_response(exc: StarletteHTTPException) -> Response:
+    # A 304 has no body (RFC 9110 15.4.5); its ETag and Cache-Control still matter.
+    if exc.status_code == 304:
+        return Response(status_code=304, headers=exc.headers)
     return JSONResponse(
         status_code=exc.status_code,
         content={"error": exc.detail, "status_code": exc.status_code},
+        headers=exc.headers,
     )
 
 
+@app.exception_handler(StarletteHTTPException)
+async def http_exception_handler(request: Request, exc: StarletteHTTPException):
+    return http_error_response(exc)
+
+
 @app.exception_handler(HTTPException)
 async def fastapi_http_exception_handler(request: Request, exc: HTTPException):
-    return JSONResponse(
-        status_code=exc.status_code,
-        content={"error": exc.detail, "status_code": exc.status_code},
-    )
+    return http_error_response(exc)
 
 
 @app.exception_handler(Exception)
@@ -54,6 +106,9 @@ async def unhandled_exception_handler(request: Request, exc: Exception):
         content={"error": "Internal server error", "status_code": 500},
     )
 
+# Added before CORS so that 429 responses still carry CORS headers.
+app.add_middleware(RateLimitMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -74,14 +129,7 @@ app.include_router(analytics.router)
 app.include_router(recommendation.router)
 app.include_router(ai.router)
 app.include_router(onboarding.router)
-
-register_tortoise(
-    app,
-    config=TORTOISE_ORM,
-    generate_schemas=True,  # Automatically create tables
-    add_exception_handlers=True
-)
-
+app.include_router(metrics.router)
 
 @app.get("/")
 def root():
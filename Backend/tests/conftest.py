@@ -0,0 +1,165 @@
+"""
+Shared fixtures.
+
+Tests that need Redis, MongoDB or PostgreSQL use a real server: one started
+from the redis-server / mongod / initdb and postgres binaries on PATH, or an
+existing one given by TEST_REDIS_URL / TEST_MONGO_URL / TEST_POSTGRES_URL (a
+postgresql+asyncpg:// URL whose user may create databases). Without either
+they are skipped.
+"""
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pytest
+from motor.motor_asyncio import AsyncIOMotorClient
+from redis.asyncio import ConnectionPool, Redis
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_port(port: int, timeout: float = 10) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"server on port {port} did not start")
+
+
+@pytest.fixture(scope="session")
+def redis_url():
+    if os.getenv("TEST_REDIS_URL"):
+        yield os.environ["TEST_REDIS_URL"]
+        return
+    binary = shutil.which("redis-server")
+    if binary is None:
+        pytest.skip("needs redis-server on PATH or TEST_REDIS_URL")
+    port = _free_port()
+    process = subprocess.Popen(
+        [binary, "--port", str(port), "--save", "", "--appendonly", "no"],
+        stdout=subprocess.DEVNULL,
+    )
+    try:
+        _wait_for_port(port)
+        yield f"redis://127.0.0.1:{port}/0"
+    finally:
+        process.terminate()
+        process.wait()
+
+
+@pytest.fixture(scope="session")
+def mongo_url():
+    if os.getenv("TEST_MONGO_URL"):
+        yield os.environ["TEST_MONGO_URL"]
+        return
+    binary = shutil.which("mongod")
+    if binary is None:
+        pytest.skip("needs mongod on PATH or TEST_MONGO_URL")
+    port = _free_port()
+    with tempfile.TemporaryDirectory() as dbpath:
+        process = subprocess.Popen(
+            [binary, "--port", str(port), "--dbpath", dbpath, "--bind_ip", "127.0.0.1"],
+            stdout=subprocess.DEVNULL,
+        )
+        try:
+            _wait_for_port(port, timeout=30)
+            yield f"mongodb://127.0.0.1:{port}"
+        finally:
+            process.terminate()
+            process.wait()
+
+
+@pytest.fixture(scope="session")
+def postgres_url():
+    if os.getenv("TEST_POSTGRES_URL"):
+        yield os.environ["TEST_POSTGRES_URL"]
+        return
+    initdb, postgres = shutil.which("initdb"), shutil.which("postgres")
+    if initdb is None or postgres is None:
+        pytest.skip("needs initdb and postgres on PATH or TEST_POSTGRES_URL")
+    port = _free_port()
+    with tempfile.TemporaryDirectory() as datadir:
+        subprocess.run(
+            [initdb, "-D", datadir, "-U", "postgres", "--auth=trust"], check=True, stdout=subprocess.DEVNULL
+        )
+        process = subprocess.Popen(
+            [postgres, "-D", datadir, "-p", str(port), "-k", datadir, "-c", "listen_addresses=127.0.0.1"],
+            stdout=subprocess.DEVNULL,
+        )
+        try:
+            _wait_for_port(port, timeout=30)
+            yield f"postgresql+asyncpg://postgres@127.0.0.1:{port}/postgres"
+        finally:
+            process.terminate()
+            process.wait()
+
+
+@pytest.fixture
+def redis_client(redis_url, monkeypatch):
+    """A client for the test server, swapped in for the app's shared redisClient and redisPool.
+
+    Create and use it inside a single asyncio.run; connections bind to that loop.
+    """
+    from app.core import redis_Client
+
+    shared_client, shared_pool = redis_Client.redisClient, redis_Client.redisPool
+    pool = ConnectionPool.from_url(redis_url, decode_responses=True)
+    client = Redis(connection_pool=pool)
+    for module in list(sys.modules.values()):
+        if getattr(module, "redisClient", None) is shared_client:
+            monkeypatch.setattr(module, "redisClient", client)
+        if getattr(module, "redisPool", None) is shared_pool:
+            monkeypatch.setattr(module, "redisPool", pool)
+    return client
+
+
+@pytest.fixture
+def mongo_db(mongo_url):
+    """A fresh database on the test server; use it inside a single asyncio.run."""
+    name = f"moodsync_test_{os.getpid()}_{time.monotonic_ns()}"
+    client = AsyncIOMotorClient(mongo_url)
+    yield client[name]
+    client.close()
+    cleanup = AsyncIOMotorClient(mongo_url)
+    try:
+        import asyncio
+
+        asyncio.run(cleanup.drop_database(name))
+    finally:
+        cleanup.close()
+
+
+@pytest.fixture
+def postgres_db(postgres_url):
+    """URL of a fresh database on the test server; create engines on it inside a single asyncio.run."""
+    import asyncio
+
+    import asyncpg
+
+    admin_url = postgres_url.replace("postgresql+asyncpg://", "postgresql://")
+    name = f"moodsync_test_{os.getpid()}_{time.monotonic_ns()}"
+
+    async def admin(statement: str) -> None:
+        conn = await asyncpg.connect(admin_url)
+        try:
+            await conn.execute(statement)
+        finally:
+            await conn.close()
+
+    asyncio.run(admin(f"CREATE DATABASE {name}"))
+    yield postgres_url.rsplit("/", 1)[0] + f"/{name}"
+    asyncio.run(admin(f"DROP DATABASE IF EXISTS {name} WITH (FORCE)"))
@@ -0,0 +1,64 @@
+"""
+A local stand-in for Gemini's generateContent and streamGenerateContent.
+
+Each request is answered according to `script`, a sequence of behaviours
+(ok, slow:SECONDS, an HTTP status such as 429 or 500, 429:RETRY_AFTER, reset),
+then `default` once it runs out. Serve it with asyncio.start_server(stub.handle, ...).
+Also used by benchmarks/gemini_client.py.
+"""
+import asyncio
+import json
+from http import HTTPStatus
+
+OK_BODY = json.dumps({"candidates": [{"content": {"parts": [{"text": "stub summary"}]}}]}).encode()
+# streamGenerateContent with alt=sse: one event per chunk of text.
+STREAM_BODY = "".join(
+    "data: " + json.dumps({"candidates": [{"content": {"parts": [{"text": word}]}}]}) + "\r\n\r\n"
+    for word in ("stub ", "streamed ", "summary")
+).encode()
+
+
+class StubGemini:
+    def __init__(self, default: str = "ok") -> None:
+        self.default = default
+        self.script: list[str] = []
+        self.requests = 0
+        self.connections = 0
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.decode().split("\r\n"):
+                    if line.lower().startswith("content-length:"):
+                        length = int(line.split(":", 1)[1])
+                await reader.readexactly(length)
+                self.requests += 1
+
+                behaviour = self.script.pop(0) if self.script else self.default
+                if behaviour == "reset":
+                    writer.close()
+                    return
+                if behaviour.startswith("slow"):
+                    await asyncio.sleep(float(behaviour.split(":")[1]))
+                if behaviour[:3].isdigit():
+                    code, _, retry_after = behaviour.partition(":")
+                    body = b'{"error": "stub"}'
+                    status = f"{code} {HTTPStatus(int(code)).phrase}"
+                    extra = f"Retry-After: {retry_after or 0}\r\n" if code == "429" else ""
+                else:
+                    body, status, extra = OK_BODY, "200 OK", ""
+                content_type = "application/json"
+                if status == "200 OK" and b":streamGenerateContent" in head.split(b"\r\n", 1)[0]:
+                    body, content_type = STREAM_BODY, "text/event-stream"
+                writer.write(
+                    f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n{extra}"
+                    f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
@@ -0,0 +1,66 @@
+import uuid
+from datetime import timezone
+
+import pytest
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from starlette.exceptions import HTTPException as StarletteHTTPException
+
+import main
+from app.dependencies import etag
+from app.dependencies.auth import get_current_user
+from app.schemas.auth import Principal
+
+
+@pytest.fixture
+def client(monkeypatch):
+    async def version(user_id: str) -> str:
+        return "7"
+
+    async def tz(user_id: str):
+        return timezone.utc
+
+    monkeypatch.setattr(etag, "current_version", version)
+    monkeypatch.setattr(etag.user_timezones, "get", tz)
+
+    app = FastAPI()
+    app.add_exception_handler(StarletteHTTPException, main.http_exception_handler)
+    app.add_exception_handler(HTTPException, main.fastapi_http_exception_handler)
+    app.dependency_overrides[get_current_user] = lambda: Principal(user_id=uuid.uuid4(), email="a@example.com")
+
+    @app.get("/today", dependencies=[Depends(etag.etag_guard("sessions.today"))])
+    async def today():
+        return {"sessions_today": 3}
+
+    @app.get("/limited")
+    async def limited():
+        raise HTTPException(status_code=429, detail="slow down", headers={"Retry-After": "30"})
+
+    return TestClient(app)
+
+
+def test_matching_etag_is_answered_with_a_bodiless_304(client):
+    first = client.get("/today")
+    assert first.status_code == 200
+    assert first.json() == {"sessions_today": 3}
+    etag_value = first.headers["etag"]
+
+    second = client.get("/today", headers={"If-None-Match": etag_value})
+    assert second.status_code == 304
+    assert second.content == b""
+    assert second.headers["etag"] == etag_value
+    assert second.headers["cache-control"] == "private, no-cache"
+    assert "content-type" not in second.headers
+
+
+def test_stale_etag_gets_the_full_response(client):
+    response = client.get("/today", headers={"If-None-Match": 'W/"stale"'})
+    assert response.status_code == 200
+    assert response.json() == {"sessions_today": 3}
+
+
+def test_error_headers_are_forwarded(client):
+    response = client.get("/limited")
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "30"
+    assert response.json() == {"error": "slow down", "status_code": 429}
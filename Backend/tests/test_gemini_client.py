@@ -0,0 +1,114 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.prompt_cache import prompt_cache
+from app.services.gemini_service import GeminiDeadlineExceeded, GeminiService
+from tests.gemini_stub import StubGemini
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(settings, "GEMINI_MAX_RETRIES", 3)
+    monkeypatch.setattr(settings, "GEMINI_BACKOFF_BASE_SECONDS", 0.01)
+    monkeypatch.setattr(settings, "GEMINI_BACKOFF_MAX_SECONDS", 0.05)
+    # Every call must reach the stub.
+    monkeypatch.setattr(prompt_cache, "enabled", False)
+
+
+def _run(script: list[str], call, budget: float = 5):
+    """Run `call(service, deadline)` against a fresh stub; returns (outcome, stub, retries)."""
+
+    async def scenario():
+        stub = StubGemini()
+        stub.script = list(script)
+        server = await asyncio.start_server(stub.handle, "127.0.0.1", 0)
+        base_url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+        client = httpx.AsyncClient(base_url=base_url, timeout=httpx.Timeout(None, connect=5))
+        retries = metrics.get("gemini.retries")
+        try:
+            outcome = await call(GeminiService(api_key="stub", client=client), time.monotonic() + budget)
+        except Exception as e:
+            outcome = e
+        finally:
+            await client.aclose()
+            server.close()
+            await server.wait_closed()
+        return outcome, stub, metrics.get("gemini.retries") - retries
+
+    return asyncio.run(scenario())
+
+
+def _generate(service: GeminiService, deadline: float):
+    return service.generate_weekly_summary({}, deadline=deadline)
+
+
+@pytest.mark.parametrize(
+    "script",
+    [["429", "ok"], ["500", "500", "ok"], ["reset", "ok"]],
+    ids=["429", "5xx", "reset"],
+)
+def test_transient_failures_are_retried(script):
+    outcome, stub, retries = _run(script, _generate)
+    assert outcome == "stub summary"
+    assert stub.requests == len(script)
+    assert retries == len(script) - 1
+
+
+def test_gives_up_after_max_retries():
+    outcome, stub, retries = _run(["500"] * 10, _generate)
+    assert isinstance(outcome, httpx.HTTPStatusError)
+    assert outcome.response.status_code == 500
+    assert stub.requests == settings.GEMINI_MAX_RETRIES + 1
+    assert retries == settings.GEMINI_MAX_RETRIES
+
+
+def test_client_errors_are_not_retried():
+    outcome, stub, _ = _run(["404"], _generate)
+    assert isinstance(outcome, httpx.HTTPStatusError)
+    assert stub.requests == 1
+
+
+def test_retry_after_is_honoured():
+    async def timed(service: GeminiService, deadline: float):
+        started = time.monotonic()
+        text = await _generate(service, deadline)
+        return text, time.monotonic() - started
+
+    (text, elapsed), stub, retries = _run(["429:0.5", "ok"], timed)
+    assert text == "stub summary"
+    assert retries == 1
+    # Far above the 0.05s backoff cap, so the wait came from Retry-After.
+    assert elapsed >= 0.5
+
+
+def test_slow_attempt_is_cut_at_the_deadline():
+    async def timed(service: GeminiService, deadline: float):
+        started = time.monotonic()
+        # Whichever fires first: httpx's read timeout, sized to the budget, or the deadline itself.
+        with pytest.raises((httpx.TimeoutException, asyncio.TimeoutError, GeminiDeadlineExceeded)):
+            await _generate(service, deadline)
+        return time.monotonic() - started
+
+    elapsed, stub, _ = _run(["slow:3"], timed, budget=1)
+    assert 0.9 < elapsed < 1.5
+    assert stub.requests == 1
+
+
+def test_no_attempt_starts_past_the_deadline():
+    outcome, stub, _ = _run([], _generate, budget=0.1)
+    assert isinstance(outcome, GeminiDeadlineExceeded)
+    assert stub.requests == 0
+
+
+def test_stream_yields_every_chunk():
+    async def stream(service: GeminiService, deadline: float):
+        return [text async for text in service.stream_weekly_summary({}, deadline=deadline)]
+
+    outcome, stub, _ = _run([], stream)
+    assert outcome == ["stub ", "streamed ", "summary"]
+    assert stub.requests == 1
@@ -0,0 +1,53 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.hashing import HashingPool
+
+
+def test_timed_out_call_keeps_its_slot_until_it_finishes():
+    async def scenario():
+        pool = HashingPool("thread", workers=1, max_queue=0, timeout=0.05)
+        try:
+            with pytest.raises(HTTPException) as timed_out:
+                await pool.run(time.sleep, 0.4)
+            assert "timed out" in timed_out.value.detail
+
+            # The sleep is still running on the only worker, so there is no room.
+            with pytest.raises(HTTPException) as rejected:
+                await pool.run(time.sleep, 0)
+            assert "busy" in rejected.value.detail
+
+            await asyncio.sleep(0.5)
+            await pool.run(time.sleep, 0)
+            return pool.stats()
+        finally:
+            pool.shutdown()
+
+    stats = asyncio.run(scenario())
+    assert stats["completed"] == 1
+    assert stats["timeouts"] == 1
+    assert stats["rejected"] == 1
+    assert stats["queue_depth"] == 0
+
+
+def test_failed_calls_are_not_counted_as_completed():
+    def boom():
+        raise ValueError("bad hash")
+
+    async def scenario():
+        pool = HashingPool("thread", workers=2, max_queue=2, timeout=1)
+        try:
+            with pytest.raises(ValueError):
+                await pool.run(boom)
+            await asyncio.sleep(0.05)
+            return pool.stats()
+        finally:
+            pool.shutdown()
+
+    stats = asyncio.run(scenario())
+    assert stats["completed"] == 0
+    assert stats["failed"] == 1
+    assert stats["in_flight"] == 0
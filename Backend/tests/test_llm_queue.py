@@ -0,0 +1,83 @@
+import asyncio
+import uuid
+
+import pytest
+
+from app.core import llm_queue
+from app.core.llm_queue import BACKGROUND, INTERACTIVE, LLMJobQueue
+
+
+@pytest.fixture
+def queue(redis_client, monkeypatch):
+    # A queue of its own, so a shared test server's other keys are left alone.
+    monkeypatch.setattr(llm_queue, "QUEUE_KEY", f"llm:queue:test:{uuid.uuid4()}")
+    return LLMJobQueue(redis_client)
+
+
+@pytest.fixture
+def key():
+    # Job hashes are keyed by job id alone; a fresh key per test keeps them apart.
+    return f"ai:summary:{uuid.uuid4()}"
+
+
+def test_enqueue_coalesces_and_raises_priority(queue, key):
+    async def scenario():
+        first = await queue.enqueue(key, BACKGROUND, user_id="u1")
+        second = await queue.enqueue(key, INTERACTIVE, user_id="u1")
+        score = await queue.redis.zscore(llm_queue.QUEUE_KEY, first)
+        return first, second, await queue.depth(), score
+
+    first, second, depth, score = asyncio.run(scenario())
+    assert first == second
+    assert depth == 1
+    assert score < 10**13
+
+
+def test_pop_marks_the_job_running(queue, key):
+    async def scenario():
+        job_id = await queue.enqueue(key, INTERACTIVE, user_id="u1")
+        popped = await queue.pop()
+        return job_id, popped, await queue.get(job_id)
+
+    job_id, (popped_id, job), stored = asyncio.run(scenario())
+    assert popped_id == job_id
+    assert job["status"] == stored["status"] == "running"
+    assert job["user_id"] == "u1"
+    assert float(job["started_at"]) > 0
+
+
+def test_enqueue_during_a_pop_does_not_requeue_the_job(queue, key):
+    async def scenario():
+        job_id = await queue.enqueue(key, BACKGROUND, user_id="u1")
+        # A consumer has taken the id off the queue but not yet claimed it.
+        await queue.redis.zpopmin(llm_queue.QUEUE_KEY)
+        again = await queue.enqueue(key, INTERACTIVE, user_id="u1")
+        depth = await queue.depth()
+        claimed = await llm_queue.claim_script(keys=[queue._job_key(job_id)], args=["1"], client=queue.redis)
+        return job_id, again, depth, claimed
+
+    job_id, again, depth, claimed = asyncio.run(scenario())
+    assert again == job_id
+    assert depth == 0
+    assert claimed
+
+
+def test_a_job_is_claimed_once(queue, key):
+    async def scenario():
+        job_id = await queue.enqueue(key, INTERACTIVE, user_id="u1")
+        job_key = queue._job_key(job_id)
+        first = await llm_queue.claim_script(keys=[job_key], args=["1"], client=queue.redis)
+        second = await llm_queue.claim_script(keys=[job_key], args=["2"], client=queue.redis)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first
+    assert second is None
+
+
+def test_pop_skips_an_expired_job(queue):
+    async def scenario():
+        await queue.redis.zadd(llm_queue.QUEUE_KEY, {"gone": 1})
+        return await queue.pop()
+
+    assert asyncio.run(scenario()) is None
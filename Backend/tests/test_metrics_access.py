@@ -0,0 +1,30 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.routers import metrics
+
+
+def _client(host: str = "127.0.0.1") -> TestClient:
+    app = FastAPI()
+    app.include_router(metrics.router)
+    return TestClient(app, client=(host, 50000))
+
+
+def test_metrics_need_the_token_when_one_is_set(monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "scraper-secret")
+    client = _client("10.0.0.7")
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    response = client.get("/metrics", headers={"Authorization": "Bearer scraper-secret"})
+    assert response.status_code == 200
+    assert "counters" in response.json()
+
+
+def test_without_a_token_metrics_are_local_only(monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", None)
+    assert _client("127.0.0.1").get("/metrics").status_code == 200
+    assert _client("10.0.0.7").get("/metrics").status_code == 403
+    # Relayed by a reverse proxy on the same host.
+    proxied = _client("127.0.0.1").get("/metrics", headers={"X-Forwarded-For": "203.0.113.9"})
+    assert proxied.status_code == 403
@@ -0,0 +1,96 @@
+import asyncio
+import uuid
+
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+import app.db.postgres  # noqa: F401  registers the invalidation listeners
+from app.core import principal_cache as principal_cache_module
+from app.core.config import settings
+from app.core.principal_cache import principal_cache
+from app.core.security import create_access_token
+from app.dependencies.auth import get_current_user
+from app.models.sqlalchemy_models import User
+from app.schemas.auth import Principal
+
+
+def _cache(user_id: uuid.UUID) -> None:
+    principal_cache._store_local(str(user_id), Principal(user_id=user_id, email="a@example.com"))
+
+
+def test_committed_user_update_drops_cached_principal():
+    engine = create_engine("sqlite://")
+    User.__table__.create(engine)
+    with Session(engine, expire_on_commit=False) as session:
+        user = User(email="a@example.com", hashed_password="x")
+        session.add(user)
+        session.commit()
+        other = uuid.uuid4()
+        _cache(user.user_id)
+        _cache(other)
+
+        user.first_name = "Ada"
+        session.commit()
+
+    assert str(user.user_id) not in principal_cache._entries
+    assert str(other) in principal_cache._entries
+
+
+def test_rolled_back_update_keeps_cached_principal():
+    engine = create_engine("sqlite://")
+    User.__table__.create(engine)
+    with Session(engine, expire_on_commit=False) as session:
+        user = User(email="b@example.com", hashed_password="x")
+        session.add(user)
+        session.commit()
+        user_id = user.user_id
+        _cache(user_id)
+
+        user.first_name = "Grace"
+        session.flush()
+        session.rollback()
+
+    assert str(user_id) in principal_cache._entries
+
+
+def test_invalidate_survives_redis_errors(monkeypatch):
+    class BrokenRedis:
+        async def delete(self, key):
+            raise ConnectionError("redis down")
+
+    monkeypatch.setattr(principal_cache_module, "redisClient", BrokenRedis())
+    user_id = uuid.uuid4()
+    _cache(user_id)
+
+    asyncio.run(principal_cache.invalidate(str(user_id)))
+
+    assert str(user_id) not in principal_cache._entries
+
+
+def test_claims_from_an_older_generation_are_rejected(redis_client, monkeypatch):
+    monkeypatch.setattr(settings, "ACCESS_TOKEN_CLAIMS_ONLY", True)
+    user_id = uuid.uuid4()
+    stale = create_access_token(user_id, "c@example.com", False, 0)["token"]
+    fresh = create_access_token(user_id, "c@example.com", True, 1)["token"]
+
+    async def authenticate(token: str):
+        credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+        try:
+            return await get_current_user(credentials)
+        except HTTPException as e:
+            return e.status_code
+
+    async def scenario():
+        before = await authenticate(stale)
+        await principal_cache.record_generation(str(user_id), 1)
+        # Another worker only sees the recorded generation through Redis.
+        principal_cache._generations.clear()
+        return before, await authenticate(stale), await authenticate(fresh)
+
+    before, after, fresh_principal = asyncio.run(scenario())
+    assert before.has_onboarded is False
+    assert after == 401
+    assert fresh_principal.has_onboarded is True
+    assert fresh_principal.generation == 1
@@ -0,0 +1,116 @@
+import asyncio
+import uuid
+
+import httpx
+import pytest
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.prompt_cache import prompt_cache
+from app.services.gemini_service import GeminiService, weekly_summary_payload
+from tests.gemini_stub import StubGemini
+
+
+@pytest.fixture(autouse=True)
+def cache_on(redis_client, monkeypatch):
+    monkeypatch.setattr(prompt_cache, "enabled", True)
+    monkeypatch.setattr(settings, "GEMINI_MAX_RETRIES", 0)
+
+
+def _week(**stats) -> dict:
+    # A task name of its own keeps the prompt apart from other tests' on a shared server.
+    return {"total_sessions": 12, "top_task_type": f"task-{uuid.uuid4()}", **stats}
+
+
+def _key(data: dict) -> str:
+    return prompt_cache.key("model", weekly_summary_payload(data))
+
+
+def _generate_all(weeks: list[dict]) -> tuple[list[str], StubGemini]:
+    async def scenario():
+        stub = StubGemini()
+        server = await asyncio.start_server(stub.handle, "127.0.0.1", 0)
+        base_url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+        client = httpx.AsyncClient(base_url=base_url, timeout=httpx.Timeout(None, connect=5))
+        try:
+            service = GeminiService(api_key="stub", client=client)
+            return [await service.generate_weekly_summary(data) for data in weeks], stub
+        finally:
+            await client.aclose()
+            server.close()
+            await server.wait_closed()
+
+    return asyncio.run(scenario())
+
+
+def test_identical_prompts_share_one_generation():
+    week = _week(total_focus_minutes=300, average_mood=4.0)
+    hits, misses = metrics.get("prompt_cache.hits"), metrics.get("prompt_cache.misses")
+
+    texts, stub = _generate_all([week, dict(week), week])
+
+    assert texts == ["stub summary"] * 3
+    assert stub.requests == 1
+    assert metrics.get("prompt_cache.hits") - hits == 2
+    assert metrics.get("prompt_cache.misses") - misses == 1
+
+
+def test_hit_rate_counts_every_lookup(monkeypatch):
+    # Counters are process-wide; count this test's lookups on their own.
+    counts = {"prompt_cache.hits": 0, "prompt_cache.misses": 0}
+
+    def incr(name: str, amount: int = 1) -> None:
+        counts[name] += amount
+
+    monkeypatch.setattr(metrics, "incr", incr)
+    monkeypatch.setattr(metrics, "get", counts.get)
+    key = _key(_week())
+
+    async def scenario():
+        assert await prompt_cache.get(key) is None
+        await prompt_cache.set(key, "cached text")
+        return [await prompt_cache.get(key) for _ in range(3)]
+
+    assert asyncio.run(scenario()) == ["cached text"] * 3
+    stats = prompt_cache.stats()
+    assert stats["llm_calls_avoided"] == 3
+    assert stats["hit_rate"] == 0.75
+
+
+def test_quantized_stats_render_the_same_prompt(monkeypatch):
+    week = _week()
+    near = [
+        {**week, "total_focus_minutes": 298, "average_mood": 3.9, "average_energy": 2.1},
+        {**week, "total_focus_minutes": 303, "average_mood": 4.1, "average_energy": 1.9},
+    ]
+    apart = {**week, "total_focus_minutes": 320, "average_mood": 3.9, "average_energy": 2.1}
+
+    monkeypatch.setattr(settings, "AI_PROMPT_QUANTIZE", False)
+    assert _key(near[0]) != _key(near[1])
+
+    monkeypatch.setattr(settings, "AI_PROMPT_QUANTIZE", True)
+    monkeypatch.setattr(settings, "AI_PROMPT_QUANTIZE_MINUTES", 15)
+    assert _key(near[0]) == _key(near[1])
+    assert _key(near[0]) != _key(apart)
+
+    texts, stub = _generate_all(near)
+    assert texts == ["stub summary"] * 2
+    assert stub.requests == 1
+
+
+def test_redis_errors_are_a_miss(monkeypatch):
+    class BrokenRedis:
+        async def get(self, key):
+            raise ConnectionError("redis down")
+
+        async def set(self, key, value, ex=None):
+            raise ConnectionError("redis down")
+
+    monkeypatch.setattr("app.core.prompt_cache.redisClient", BrokenRedis())
+    key = _key(_week())
+
+    async def scenario():
+        await prompt_cache.set(key, "text")
+        return await prompt_cache.get(key)
+
+    assert asyncio.run(scenario()) is None
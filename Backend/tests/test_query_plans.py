@@ -0,0 +1,124 @@
+"""Every query the services run must be answered from an index: no collection scan, no in-memory sort.
+
+The services themselves are called with Mongo's profiler on, so the plans
+checked are those of the real filters, sorts and pipelines rather than copies
+of them.
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from bson import ObjectId
+
+from app.core.user_timezone import local_fields, user_timezones
+from app.db.mongo_indexes import OBSOLETE_INDEXES, ensure_indexes
+from app.services.analytics_service import AnalyticsService
+from app.services.recommendation_service import RecommendationService
+from app.services.rollup_service import RollupService
+from app.services.sessions_service import SessionsService
+from app.services.summary_pregeneration_service import SummaryPregenerator
+
+USER = "plan-user"
+COLLECTIONS = ("work_sessions", "daily_summaries", "hourly_buckets")
+
+
+async def _consume(stream) -> None:
+    async for _ in stream:
+        pass
+
+
+def _calls(mongo_db, redis_client) -> dict:
+    sessions = SessionsService(mongo_db, redis_client)
+    analytics = AnalyticsService(mongo_db)
+    rollups = RollupService(mongo_db)
+    now = datetime.now(tz=timezone.utc)
+    return {
+        "sessions.history": lambda: sessions.get_history(USER, 20, None),
+        "sessions.history_cursor": lambda: sessions.get_history(USER, 20, str(ObjectId())),
+        "sessions.detail": lambda: sessions.get_detail(USER, str(ObjectId())),
+        "sessions.export": lambda: _consume(sessions.export_sessions(USER, "ndjson", False)),
+        "sessions.today_rollup": lambda: rollups.read_day(USER, now),
+        "analytics.weekly": lambda: analytics.weekly_summary_data(USER),
+        "analytics.insights": lambda: analytics.build_insights(USER),
+        "recommendation.rebuild": lambda: RecommendationService(mongo_db, redis_client).rebuild(USER),
+        "rollups.rebuild": lambda: rollups.rebuild_user(USER),
+        "pregen.active_users": lambda: _consume(SummaryPregenerator(mongo_db, redis_client)._active_users("")),
+    }
+
+
+async def _seed(mongo_db) -> None:
+    start = datetime.now(tz=timezone.utc) - timedelta(days=40)
+    docs = []
+    for i in range(2000):
+        timestamp = start + timedelta(minutes=29 * i)
+        docs.append(
+            {
+                "user_id": USER if i % 4 == 0 else f"other-{i % 50}",
+                "timestamp": timestamp,
+                "task_type": ("Deep work", "Email", "Meetings")[i % 3],
+                "mood": i % 5 + 1,
+                "energy": ("low", "medium", "high")[i % 3],
+                "duration_minutes": 25,
+                **local_fields(timestamp, timezone.utc),
+            }
+        )
+    await mongo_db.work_sessions.insert_many(docs)
+    rollups = RollupService(mongo_db)
+    for user_id in {doc["user_id"] for doc in docs}:
+        await rollups.apply_sessions(user_id, [doc for doc in docs if doc["user_id"] == user_id])
+
+
+@pytest.fixture
+def profiles(mongo_db, redis_client, monkeypatch):
+    """Profiler entries of each service call, keyed by call name."""
+    monkeypatch.setattr(user_timezones, "get", lambda _: asyncio.sleep(0, timezone.utc))
+    namespaces = [f"{mongo_db.name}.{name}" for name in COLLECTIONS]
+
+    async def run_all():
+        await ensure_indexes(mongo_db)
+        # A second run must be a no-op, as the app runs it on every start.
+        await ensure_indexes(mongo_db)
+        await _seed(mongo_db)
+        await mongo_db.command("profile", 2)
+        profile = mongo_db.get_collection("system.profile")
+        entries = {}
+        for name, call in _calls(mongo_db, redis_client).items():
+            # system.profile is capped, so natural order is the order of the operations.
+            seen = await profile.count_documents({})
+            await call()
+            entries[name] = [
+                entry
+                async for entry in profile.find({}).skip(seen)
+                if entry.get("ns") in namespaces and entry.get("planSummary")
+            ]
+        await mongo_db.command("profile", 0)
+        return entries
+
+    return asyncio.run(run_all())
+
+
+def test_every_service_query_is_index_backed(profiles):
+    problems = {}
+    for name, entries in profiles.items():
+        if not entries:
+            problems[name] = "no query profiled"
+        for entry in entries:
+            plan = entry["planSummary"]
+            if "COLLSCAN" in plan:
+                problems[name] = f"collection scan: {entry.get('command')}"
+            elif entry.get("hasSortStage"):
+                problems[name] = f"in-memory sort: {entry.get('command')}"
+            elif not any(stage in plan for stage in ("IXSCAN", "IDHACK", "EXPRESS")):
+                problems[name] = f"no index used ({plan}): {entry.get('command')}"
+    assert not problems, problems
+
+
+def test_obsolete_indexes_are_dropped(mongo_db):
+    async def scenario():
+        sessions = mongo_db.get_collection("work_sessions")
+        await sessions.create_index([("user_id", 1), ("local_date", 1)])
+        await sessions.create_index([("user_id", 1), ("local_weekday", 1), ("local_hour", 1)])
+        await ensure_indexes(mongo_db)
+        return set(await sessions.index_information())
+
+    assert not asyncio.run(scenario()) & set(OBSOLETE_INDEXES["work_sessions"])
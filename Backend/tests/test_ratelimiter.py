@@ -0,0 +1,132 @@
+import asyncio
+import uuid
+
+from redis.asyncio import Redis
+
+from app.core import metrics
+from app.middlewares.ratelimiter import RateLimitMiddleware, RateLimitPolicy
+
+
+async def _ok(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+def _policy(limit: int, window_seconds: int) -> RateLimitPolicy:
+    # Keys are per policy name; a fresh one keeps runs apart on a shared server.
+    return RateLimitPolicy(f"test-{uuid.uuid4()}", ("/",), limit, window_seconds)
+
+
+async def _request(middleware: RateLimitMiddleware, client: str = "10.0.0.1", method: str = "GET"):
+    """Status and headers of one request through the middleware."""
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    scope = {"type": "http", "method": method, "path": "/sessions", "client": (client, 1234), "headers": []}
+    await middleware(scope, receive, send)
+    start = sent[0]
+    return start["status"], {name.decode(): value.decode() for name, value in start["headers"]}
+
+
+def test_burst_up_to_the_limit_then_denied_with_retry_after(redis_client):
+    policy = _policy(limit=3, window_seconds=60)
+    # Two workers, so neither pre-filter sees more than the limit and Redis decides.
+    workers = [RateLimitMiddleware(_ok, (policy,), redis=redis_client) for _ in range(2)]
+
+    async def scenario():
+        return [await _request(workers[i % 2]) for i in range(4)]
+
+    denied_before = metrics.get("ratelimit.denied")
+    responses = asyncio.run(scenario())
+    assert [status for status, _ in responses] == [200, 200, 200, 429]
+    # One request is let through every window / limit = 20 seconds.
+    assert responses[3][1]["retry-after"] == "20"
+    assert metrics.get("ratelimit.denied") - denied_before == 1
+
+
+def test_denied_keys_are_rejected_locally_until_retry_after(redis_client):
+    policy = _policy(limit=1, window_seconds=60)
+    middleware = RateLimitMiddleware(_ok, (policy,), redis=redis_client)
+    other_worker = RateLimitMiddleware(_ok, (policy,), redis=redis_client)
+
+    async def scenario():
+        await _request(middleware)
+        # Denied by Redis on another worker, then remembered there.
+        denied = await _request(other_worker)
+        prefiltered_before = metrics.get("ratelimit.prefiltered")
+        again = await _request(other_worker)
+        return denied, again, metrics.get("ratelimit.prefiltered") - prefiltered_before
+
+    denied, again, prefiltered = asyncio.run(scenario())
+    assert denied[0] == again[0] == 429
+    assert prefiltered == 1
+    assert 0 < int(again[1]["retry-after"]) <= int(denied[1]["retry-after"]) == 60
+
+
+def test_limit_is_shared_by_workers(redis_client):
+    policy = _policy(limit=2, window_seconds=60)
+    # Two workers: separate local pre-filters, one Redis.
+    workers = [RateLimitMiddleware(_ok, (policy,), redis=redis_client) for _ in range(2)]
+
+    async def scenario():
+        return [(await _request(worker))[0] for worker in (workers[0], workers[1], workers[1])]
+
+    assert asyncio.run(scenario()) == [200, 200, 429]
+
+
+def test_requests_are_let_through_again_at_the_emission_rate(redis_client):
+    policy = _policy(limit=2, window_seconds=1)
+
+    async def scenario():
+        middleware = RateLimitMiddleware(_ok, (policy,), redis=redis_client)
+        burst = [(await _request(middleware))[0] for _ in range(3)]
+        await asyncio.sleep(0.55)
+        # Another worker, so only the GCRA state in Redis decides.
+        later = RateLimitMiddleware(_ok, (policy,), redis=redis_client)
+        return burst, [(await _request(later))[0] for _ in range(2)]
+
+    burst, later = asyncio.run(scenario())
+    assert burst == [200, 200, 429]
+    # 500ms per request: one more was earned, not a whole new burst.
+    assert later == [200, 429]
+
+
+def test_clients_are_limited_separately(redis_client):
+    policy = _policy(limit=1, window_seconds=60)
+    middleware = RateLimitMiddleware(_ok, (policy,), redis=redis_client)
+
+    async def scenario():
+        return [(await _request(middleware, client))[0] for client in ("10.0.0.1", "10.0.0.1", "10.0.0.2")]
+
+    assert asyncio.run(scenario()) == [200, 429, 200]
+
+
+def test_preflight_requests_are_not_counted(redis_client):
+    policy = _policy(limit=1, window_seconds=60)
+    middleware = RateLimitMiddleware(_ok, (policy,), redis=redis_client)
+
+    async def scenario():
+        preflights = [(await _request(middleware, method="OPTIONS"))[0] for _ in range(3)]
+        return preflights, (await _request(middleware))[0]
+
+    assert asyncio.run(scenario()) == ([200, 200, 200], 200)
+
+
+def test_fails_open_without_redis():
+    middleware = RateLimitMiddleware(_ok, (_policy(limit=1, window_seconds=60),))
+
+    async def scenario():
+        middleware.redis = Redis.from_url("redis://127.0.0.1:1", socket_connect_timeout=0.2)
+        try:
+            return (await _request(middleware))[0]
+        finally:
+            await middleware.redis.aclose()
+
+    errors_before = metrics.get("ratelimit.redis_errors")
+    assert asyncio.run(scenario()) == 200
+    assert metrics.get("ratelimit.redis_errors") - errors_before == 1
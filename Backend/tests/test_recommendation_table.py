@@ -0,0 +1,80 @@
+import asyncio
+import uuid
+from datetime import datetime, timezone
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.services.recommendation_service import RecommendationService
+
+SESSION = {
+    "mood": 4,
+    "energy": "high",
+    "local_hour": 9,
+    "task_type": "Deep work",
+    "duration_minutes": 50,
+    "timestamp": datetime(2026, 3, 2, 9, 30, tzinfo=timezone.utc),
+}
+COUNT_FIELD = "c|4|high|9|Deep work"
+
+
+def _service(redis_client) -> RecommendationService:
+    # The table builds are scripted below; Mongo is never reached.
+    return RecommendationService(AsyncIOMotorClient("mongodb://127.0.0.1:1")["unused"], redis_client)
+
+
+def test_rebuild_that_raced_an_update_is_redone(redis_client, monkeypatch):
+    user_id = str(uuid.uuid4())
+    service = _service(redis_client)
+    builds = []
+
+    async def build_table(_):
+        builds.append(1)
+        if len(builds) == 1:
+            # The session is logged while this build reads Mongo, just too late to be seen.
+            await service.apply_sessions(user_id, [SESSION])
+            return {"built": 1}
+        return {"built": 2, COUNT_FIELD: 1}
+
+    monkeypatch.setattr(service, "_build_table", build_table)
+
+    async def scenario():
+        await service.rebuild(user_id)
+        return await redis_client.hgetall(service._key(user_id))
+
+    table = asyncio.run(scenario())
+    assert len(builds) == 2
+    assert table == {"built": "2", COUNT_FIELD: "1"}
+
+
+def test_update_lands_on_a_rebuilt_table(redis_client, monkeypatch):
+    user_id = str(uuid.uuid4())
+    service = _service(redis_client)
+
+    async def build_table(_):
+        return {"built": 1}
+
+    monkeypatch.setattr(service, "_build_table", build_table)
+
+    async def scenario():
+        await service.rebuild(user_id)
+        await service.apply_sessions(user_id, [SESSION])
+        return await redis_client.hgetall(service._key(user_id))
+
+    table = asyncio.run(scenario())
+    assert table[COUNT_FIELD] == "1"
+    assert table["b|4|high|9"] == "Deep work"
+
+
+def test_invalidate_discards_a_rebuild_in_flight(redis_client):
+    user_id = str(uuid.uuid4())
+    service = _service(redis_client)
+
+    async def scenario():
+        version = await redis_client.get(service._version_key(user_id))
+        await service.invalidate(user_id)
+        written = await service._write_table(user_id, {"built": 1}, version)
+        return written, await redis_client.exists(service._key(user_id))
+
+    written, exists = asyncio.run(scenario())
+    assert not written
+    assert not exists
@@ -0,0 +1,119 @@
+import asyncio
+
+from redis.asyncio import Redis
+
+from app.core.redis_cache import ClientSideCache
+
+
+async def _started(prefixes: list[str], max_bytes: int = 1024 * 1024) -> ClientSideCache:
+    cache = ClientSideCache(prefixes, max_bytes)
+    await cache.start()
+    for _ in range(100):
+        if cache.stats()["enabled"]:
+            return cache
+        await asyncio.sleep(0.05)
+    raise AssertionError("tracking was not enabled")
+
+
+async def _eventually(check) -> None:
+    for _ in range(100):
+        if await check():
+            return
+        await asyncio.sleep(0.02)
+    raise AssertionError("condition not reached")
+
+
+def test_repeated_reads_are_served_locally(redis_client, redis_url):
+    async def scenario():
+        await redis_client.flushdb()
+        await redis_client.set("user:1:today", "a")
+        cache = await _started(["user:"])
+        try:
+            assert await cache.get("user:1:today") == "a"
+            # keyspace_hits counts every read the server answers.
+            monitor = Redis.from_url(redis_url, decode_responses=True)
+            reads_before = (await monitor.info("stats"))["keyspace_hits"]
+            for _ in range(5):
+                assert await cache.get("user:1:today") == "a"
+            reads_after = (await monitor.info("stats"))["keyspace_hits"]
+            await monitor.aclose()
+            return cache.stats(), reads_after - reads_before
+        finally:
+            await cache.stop()
+            await redis_client.aclose()
+
+    stats, server_reads = asyncio.run(scenario())
+    assert server_reads == 0
+    assert stats["hits"] == 5
+    assert stats["misses"] == 1
+
+
+def test_writes_from_another_client_invalidate(redis_client, redis_url):
+    async def scenario():
+        await redis_client.flushdb()
+        await redis_client.hset("user:1:today:2026-10-18", mapping={"sessions_today": "1"})
+        cache = await _started(["user:"])
+        writer = Redis.from_url(redis_url, decode_responses=True)
+        try:
+            assert await cache.hgetall("user:1:today:2026-10-18") == {"sessions_today": "1"}
+            await writer.hset("user:1:today:2026-10-18", "sessions_today", "2")
+
+            async def refreshed():
+                return await cache.hgetall("user:1:today:2026-10-18") == {"sessions_today": "2"}
+
+            await _eventually(refreshed)
+
+            await writer.set("user:2:version", "7")
+            assert await cache.get("user:2:version") == "7"
+            await writer.delete("user:2:version")
+
+            async def deleted():
+                return await cache.get("user:2:version") is None
+
+            await _eventually(deleted)
+            return cache.stats()
+        finally:
+            await writer.aclose()
+            await cache.stop()
+            await redis_client.aclose()
+
+    stats = asyncio.run(scenario())
+    assert stats["invalidations"] >= 2
+
+
+def test_untracked_prefixes_always_go_to_redis(redis_client):
+    async def scenario():
+        await redis_client.flushdb()
+        await redis_client.set("refresh:abc", "1")
+        cache = await _started(["user:"])
+        try:
+            await cache.get("refresh:abc")
+            await cache.get("refresh:abc")
+            return cache.stats()
+        finally:
+            await cache.stop()
+            await redis_client.aclose()
+
+    stats = asyncio.run(scenario())
+    assert stats["entries"] == 0
+    assert stats["hits"] == stats["misses"] == 0
+
+
+def test_memory_budget_evicts_least_recently_used(redis_client):
+    async def scenario():
+        await redis_client.flushdb()
+        for i in range(10):
+            await redis_client.set(f"user:{i}", "x" * 100)
+        cache = await _started(["user:"], max_bytes=1000)
+        try:
+            for i in range(10):
+                await cache.get(f"user:{i}")
+            return cache.stats()
+        finally:
+            await cache.stop()
+            await redis_client.aclose()
+
+    stats = asyncio.run(scenario())
+    assert stats["bytes"] <= 1000
+    assert stats["evictions"] > 0
+    assert 0 < stats["entries"] < 10
@@ -0,0 +1,85 @@
+import asyncio
+import gzip
+import json
+import os
+import tracemalloc
+from datetime import datetime, timedelta
+
+from app.services.sessions_service import SessionsService
+
+# The size the export has to stay flat for; lower it locally for a quicker run.
+LARGE_EXPORT_DOCS = int(os.getenv("TEST_EXPORT_DOCS", "1000000"))
+SMALL_EXPORT_DOCS = 10_000
+
+
+async def _seed(collection, user_id: str, count: int) -> None:
+    start = datetime(2026, 1, 1)
+    batch = []
+    for i in range(count):
+        batch.append(
+            {
+                "user_id": user_id,
+                "timestamp": start + timedelta(minutes=i),
+                "task_type": "deep_work",
+                "mood": 4,
+                "energy": 3,
+                "duration_minutes": 25,
+                "good_session": True,
+                "notes": "not exported",
+            }
+        )
+        if len(batch) == 10_000:
+            await collection.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await collection.insert_many(batch, ordered=False)
+
+
+async def _export_peak(service: SessionsService, user_id: str) -> tuple[int, int]:
+    """Peak traced memory while exporting, and the number of bytes streamed."""
+    streamed = 0
+    tracemalloc.start()
+    try:
+        async for chunk in service.export_sessions(user_id, "ndjson", compress=False):
+            streamed += len(chunk)
+        return tracemalloc.get_traced_memory()[1], streamed
+    finally:
+        tracemalloc.stop()
+
+
+def test_export_memory_stays_flat_as_history_grows(mongo_db):
+    async def scenario():
+        collection = mongo_db.get_collection("work_sessions")
+        await collection.create_index([("user_id", 1), ("timestamp", 1)])
+        await _seed(collection, "small", SMALL_EXPORT_DOCS)
+        await _seed(collection, "large", LARGE_EXPORT_DOCS)
+        service = SessionsService(mongo_db, redis=None)
+        small = await _export_peak(service, "small")
+        large = await _export_peak(service, "large")
+        return small, large
+
+    (small_peak, small_bytes), (large_peak, large_bytes) = asyncio.run(scenario())
+    assert large_bytes > small_bytes * (LARGE_EXPORT_DOCS // SMALL_EXPORT_DOCS) * 0.9
+    # 100x the documents, about the same peak: one cursor batch plus one chunk.
+    assert large_peak < small_peak * 2
+    assert large_peak < 32 * 1024 * 1024
+
+
+def test_export_rows_carry_utc_offsets_and_only_exported_fields(mongo_db):
+    async def scenario():
+        await _seed(mongo_db.get_collection("work_sessions"), "u1", 3)
+        service = SessionsService(mongo_db, redis=None)
+        ndjson = b"".join([chunk async for chunk in service.export_sessions("u1", "ndjson", compress=False)])
+        csv_gz = b"".join([chunk async for chunk in service.export_sessions("u1", "csv", compress=True)])
+        return ndjson, csv_gz
+
+    ndjson, csv_gz = asyncio.run(scenario())
+    rows = [json.loads(line) for line in ndjson.decode().splitlines()]
+    assert len(rows) == 3
+    assert rows[0]["timestamp"] == "2026-01-01T00:00:00+00:00"
+    assert "notes" not in rows[0]
+
+    lines = gzip.decompress(csv_gz).decode().splitlines()
+    assert lines[0] == "id,timestamp,task_type,mood,energy,duration_minutes,good_session"
+    assert len(lines) == 4
+    assert "2026-01-01T00:02:00+00:00" in lines[3]
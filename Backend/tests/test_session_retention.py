@@ -0,0 +1,126 @@
+import asyncio
+import uuid
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.core.config import settings
+from app.models.sqlalchemy_models import AuthSession, Base, User
+from app.services.session_retention_service import SessionRetentionService, partition_name
+
+NOW = datetime.now(tz=timezone.utc)
+
+
+async def _schema(url: str):
+    engine = create_async_engine(url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    return engine
+
+
+async def _add_sessions(engine, *sessions: dict) -> None:
+    async with AsyncSession(engine) as session:
+        user = User(email=f"{uuid.uuid4()}@example.com", hashed_password="x")
+        session.add(user)
+        await session.flush()
+        for i, fields in enumerate(sessions):
+            session.add(AuthSession(user_id=user.user_id, refresh_token_hash=f"hash-{i}", **fields))
+        await session.commit()
+
+
+async def _partitions(engine) -> set[str]:
+    async with engine.connect() as conn:
+        result = await conn.execute(
+            text(
+                "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = 'auth_sessions'"
+            )
+        )
+        return {row[0] for row in result}
+
+
+async def _count(engine) -> int:
+    async with AsyncSession(engine) as session:
+        return await session.scalar(select(func.count()).select_from(AuthSession))
+
+
+def _month(months_back: int) -> date:
+    month = date(NOW.year, NOW.month, 1)
+    for _ in range(months_back):
+        month = date(month.year, month.month, 1) - timedelta(days=1)
+    return date(month.year, month.month, 1)
+
+
+def test_ensure_partitions_makes_the_table_writable(postgres_db):
+    async def scenario():
+        engine = await _schema(postgres_db)
+        try:
+            service = SessionRetentionService(engine)
+            await service.ensure_partitions()
+            # Idempotent: every worker runs it at startup.
+            created = await service.ensure_partitions()
+            await _add_sessions(
+                engine,
+                {"expires_at": NOW + timedelta(days=14)},
+                # Beyond the monthly partitions: lands in the default one.
+                {"expires_at": NOW + timedelta(days=5 * 365)},
+            )
+            return created, await _partitions(engine), await _count(engine)
+        finally:
+            await engine.dispose()
+
+    created, partitions, rows = asyncio.run(scenario())
+    assert created[0] == partition_name(_month(0))
+    assert len(created) == settings.AUTH_SESSION_PARTITIONS_AHEAD + 1
+    assert partitions == set(created) | {"auth_sessions_default"}
+    assert rows == 2
+
+
+def test_expired_partitions_are_dropped(postgres_db):
+    async def scenario():
+        engine = await _schema(postgres_db)
+        try:
+            service = SessionRetentionService(engine)
+            await service.ensure_partitions(months_back=3)
+            old = datetime(_month(3).year, _month(3).month, 10, tzinfo=timezone.utc)
+            await _add_sessions(engine, {"expires_at": old}, {"expires_at": NOW + timedelta(days=1)})
+            dropped = await service.drop_expired_partitions()
+            return dropped, await _partitions(engine), await _count(engine)
+        finally:
+            await engine.dispose()
+
+    dropped, partitions, rows = asyncio.run(scenario())
+    assert partition_name(_month(3)) in dropped
+    assert partition_name(_month(2)) in dropped
+    assert not set(dropped) & partitions
+    assert partition_name(_month(0)) in partitions
+    assert "auth_sessions_default" in partitions
+    assert rows == 1
+
+
+def test_purge_removes_revoked_and_expired_rows_in_batches(postgres_db):
+    retention = timedelta(days=settings.AUTH_SESSION_RETENTION_DAYS)
+
+    async def scenario():
+        engine = await _schema(postgres_db)
+        try:
+            service = SessionRetentionService(engine)
+            await service.ensure_partitions(months_back=2)
+            long_ago = NOW - retention - timedelta(days=3)
+            doomed = [{"expires_at": NOW + timedelta(days=10), "is_revoked": True, "revoked_at": long_ago}] * 3
+            doomed += [{"expires_at": long_ago}] * 2
+            kept = [
+                {"expires_at": NOW + timedelta(days=10), "is_revoked": True, "revoked_at": NOW},
+                {"expires_at": NOW + timedelta(days=10)},
+                {"expires_at": NOW - timedelta(days=1)},
+            ]
+            await _add_sessions(engine, *doomed, *kept)
+            purged = await service.purge_revoked(batch_size=2)
+            return purged, await _count(engine)
+        finally:
+            await engine.dispose()
+
+    purged, rows = asyncio.run(scenario())
+    assert purged == 5
+    assert rows == 3
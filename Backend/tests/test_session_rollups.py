@@ -0,0 +1,144 @@
+import asyncio
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+
+from app.core.data_version import version_key
+from app.core.user_timezone import user_timezones
+from app.schemas.sessions import SessionCreate
+from app.services import rollup_service
+from app.services.rollup_service import RollupService, mark_dirty, repair_dirty
+from app.services.sessions_service import SessionsService
+
+# Backdated, so the today cache is left alone.
+SESSION = {
+    "mood": 4,
+    "energy": "high",
+    "taskType": "Deep work",
+    "durationMinutes": 25,
+    "timestamp": datetime(2026, 3, 2, 9, 30, tzinfo=timezone.utc),
+}
+
+
+@pytest.fixture(autouse=True)
+def dirty_key(monkeypatch):
+    # A set of its own, so users left dirty by one test do not leak into the next.
+    monkeypatch.setattr(rollup_service, "DIRTY_KEY", f"rollups:dirty:test:{uuid.uuid4()}")
+
+
+class _Rollups:
+    def __init__(self, failing: set[str]) -> None:
+        self.failing = failing
+        self.rebuilt: list[str] = []
+
+    async def rebuild_user(self, user_id: str) -> int:
+        if user_id in self.failing:
+            raise RuntimeError("mongo unavailable")
+        self.rebuilt.append(user_id)
+        return 1
+
+
+def test_repair_rebuilds_each_dirty_user_once(redis_client):
+    rollups = _Rollups(failing=set())
+
+    async def scenario():
+        await mark_dirty("u1", redis_client)
+        await mark_dirty("u2", redis_client)
+        await mark_dirty("u1", redis_client)
+        await redis_client.delete(version_key("u1"))
+        repaired = await repair_dirty(rollups, redis_client)
+        return repaired, await redis_client.scard(rollup_service.DIRTY_KEY), await redis_client.get(version_key("u1"))
+
+    repaired, left, version = asyncio.run(scenario())
+    assert (repaired, left) == (2, 0)
+    assert sorted(rollups.rebuilt) == ["u1", "u2"]
+    # ETags derived from the broken rollups stop matching.
+    assert version is not None
+
+
+def test_failed_rebuild_keeps_the_user_dirty(redis_client):
+    rollups = _Rollups(failing={"u1"})
+
+    async def scenario():
+        await mark_dirty("u1", redis_client)
+        with pytest.raises(RuntimeError):
+            await repair_dirty(rollups, redis_client)
+        return await redis_client.smembers(rollup_service.DIRTY_KEY)
+
+    assert asyncio.run(scenario()) == {"u1"}
+
+
+def test_mark_dirty_survives_a_broken_redis():
+    from redis.asyncio import Redis
+
+    broken = Redis(host="127.0.0.1", port=1, socket_connect_timeout=0.2)
+    asyncio.run(mark_dirty("u1", broken))
+
+
+@pytest.mark.parametrize("batch", [False, True], ids=["single", "batch"])
+def test_failed_rollup_write_is_rebuilt(mongo_db, redis_client, monkeypatch, batch):
+    user_id = "rollup-user"
+    monkeypatch.setattr(user_timezones, "get", lambda _: asyncio.sleep(0, timezone.utc))
+
+    async def scenario():
+        service = SessionsService(mongo_db, redis_client)
+        apply_sessions = service.rollups.apply_sessions
+
+        async def fail_after_partial_write(uid, docs, sign=1):
+            partial = {"user_id": uid, "day": datetime(2026, 3, 2), "total_sessions": 7}
+            await service.rollups.collection.insert_one(partial)
+            raise RuntimeError("bulk write failed")
+
+        service.rollups.apply_sessions = fail_after_partial_write
+        if batch:
+            item = SESSION | {"timestamp": SESSION["timestamp"].isoformat()}
+            response = await service.log_sessions_batch(user_id, [item])
+            assert response.inserted == 1
+        else:
+            await service.log_session(user_id, SessionCreate.model_validate(SESSION))
+        service.rollups.apply_sessions = apply_sessions
+
+        assert await redis_client.smembers(rollup_service.DIRTY_KEY) == {user_id}
+        assert await repair_dirty(service.rollups, redis_client) == 1
+        return await service.rollups.read_day(user_id, SESSION["timestamp"])
+
+    day = asyncio.run(scenario())
+    assert day["total_sessions"] == 1
+    assert day["total_focus_minutes"] == 25
+
+
+def test_rebuild_replaces_rollups_in_place(mongo_db):
+    user_id = "rebuild-user"
+    stale_day = datetime(2026, 1, 5)
+
+    async def scenario():
+        rollups = RollupService(mongo_db)
+        session = {
+            "user_id": user_id,
+            "timestamp": datetime(2026, 3, 2, 9, 30),
+            "local_date": "2026-03-02",
+            "local_hour": 9,
+            "task_type": "Deep work",
+            "mood": 4,
+            "energy": 3,
+            "duration_minutes": 25,
+        }
+        await mongo_db.work_sessions.insert_one(session)
+        await rollups.apply_sessions(user_id, [session])
+        # Drift: a miscounted day that still has sessions, and days and buckets that no longer do.
+        await rollups.collection.update_one({"user_id": user_id}, {"$inc": {"total_sessions": 5}})
+        kept_id = (await rollups.collection.find_one({"user_id": user_id}))["_id"]
+        await rollups.collection.insert_one({"user_id": user_id, "day": stale_day, "total_sessions": 2})
+        await rollups.buckets.insert_one(
+            {"user_id": user_id, "task_type": "Email", "day": stale_day, "hour": 8, "count": 1, "duration_sum": 5}
+        )
+
+        assert await rollups.rebuild_user(user_id) == 1
+        days = await rollups.collection.find({"user_id": user_id}).to_list(length=None)
+        buckets = await rollups.buckets.find({"user_id": user_id}).to_list(length=None)
+        return kept_id, days, buckets
+
+    kept_id, days, buckets = asyncio.run(scenario())
+    assert [(day["_id"], day["total_sessions"]) for day in days] == [(kept_id, 1)]
+    assert [(bucket["task_type"], bucket["hour"], bucket["count"]) for bucket in buckets] == [("Deep work", 9, 1)]
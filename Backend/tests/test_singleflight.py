@@ -0,0 +1,77 @@
+import asyncio
+import uuid
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.core.singleflight import RedisLock
+from app.services.ai_summary_service import AISummaryService
+
+WEEK_SECONDS = 7 * 24 * 3600
+
+
+def _key() -> str:
+    return f"ai:summary:{uuid.uuid4()}:2026-03-02"
+
+
+async def _expired_then_taken_over(redis_client, key: str) -> tuple[RedisLock, RedisLock]:
+    """A holder whose lock expired mid-work, and the holder that took over."""
+    stale = RedisLock(key, 0.05, redis_client)
+    assert await stale.acquire()
+    await asyncio.sleep(0.1)
+    current = RedisLock(key, 30, redis_client)
+    assert await current.acquire()
+    return stale, current
+
+
+def test_stale_holder_cannot_overwrite_a_newer_write(redis_client):
+    key = _key()
+
+    async def scenario():
+        stale, current = await _expired_then_taken_over(redis_client, key)
+        assert await current.fenced_hset(key, {"summary": "new"}, WEEK_SECONDS)
+        assert not await stale.fenced_hset(key, {"summary": "old"}, WEEK_SECONDS)
+        return await redis_client.hgetall(key)
+
+    assert asyncio.run(scenario()) == {"summary": "new"}
+
+
+def test_fence_counter_outlives_the_entry(redis_client):
+    key = _key()
+
+    async def scenario():
+        lock = RedisLock(key, 30, redis_client)
+        assert await lock.acquire()
+        assert await lock.fenced_hset(key, {"summary": "new"}, WEEK_SECONDS)
+        await lock.release()
+        after_write = await redis_client.ttl(lock.fence_key)
+        # Acquiring again must not shorten it back to the lock-based default.
+        again = RedisLock(key, 30, redis_client)
+        assert await again.acquire()
+        after_acquire = await redis_client.ttl(again.fence_key)
+        # The next holder's token is newer than the marker, so its refresh is kept.
+        written = await again.fenced_hset(key, {"summary": "refreshed"}, WEEK_SECONDS)
+        return after_write, after_acquire, again.token, written
+
+    after_write, after_acquire, token, written = asyncio.run(scenario())
+    assert after_write >= WEEK_SECONDS - 1
+    assert after_acquire >= WEEK_SECONDS - 1
+    assert token == 2
+    assert written
+
+
+def test_superseded_store_returns_the_newer_entry(redis_client):
+    key = _key()
+
+    async def scenario():
+        mongo = AsyncIOMotorClient("mongodb://127.0.0.1:1")["unused"]
+        service = AISummaryService(mongo, redis_client)
+        stale, current = await _expired_then_taken_over(redis_client, key)
+        newer, stored_newer = await service.store(current, key, "newer summary", "gemini")
+        entry, stored = await service.store(stale, key, "stale summary", "fallback")
+        return newer, stored_newer, entry, stored
+
+    newer, stored_newer, entry, stored = asyncio.run(scenario())
+    assert stored_newer
+    assert not stored
+    assert entry == newer
+    assert entry["summary"] == "newer summary"
@@ -0,0 +1,107 @@
+import asyncio
+import time
+import uuid
+
+import pytest
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.core import llm_queue
+from app.core.config import settings
+from app.core.llm_queue import BACKGROUND, LLMJobQueue
+from app.core.singleflight import RedisLock
+from app.services import ai_summary_service
+from app.services.ai_summary_service import AISummaryService, is_fresh, summary_key
+from app.services.gemini_service import GeminiService
+
+
+@pytest.fixture
+def jobs(redis_client, monkeypatch):
+    monkeypatch.setattr(llm_queue, "QUEUE_KEY", f"llm:queue:test:{uuid.uuid4()}")
+    queue = LLMJobQueue(redis_client)
+    monkeypatch.setattr(ai_summary_service, "llm_jobs", queue)
+    return queue
+
+
+def _service(redis_client, monkeypatch) -> AISummaryService:
+    # Without an API key every generation is the fallback.
+    mongo = AsyncIOMotorClient("mongodb://127.0.0.1:1")["unused"]
+    service = AISummaryService(mongo, redis_client, GeminiService())
+    monkeypatch.setattr(service.gemini, "api_key", "")
+
+    async def weekly_data(_):
+        return {"total_sessions": 3}
+
+    monkeypatch.setattr(service, "weekly_data", weekly_data)
+    return service
+
+
+def _entry(summary: str, source: str, age: float, fresh_for: float) -> dict[str, str]:
+    now = time.time()
+    return {"summary": summary, "source": source, "generated_at": str(now - age), "fresh_until": str(now + fresh_for)}
+
+
+def test_is_fresh_until_fresh_until():
+    assert is_fresh(_entry("s", "gemini", 10, 60))
+    assert not is_fresh(_entry("s", "gemini", 10, -1))
+    assert not is_fresh({"summary": "written before freshness was tracked"})
+
+
+def test_stale_entry_is_served_and_refreshed_once(redis_client, jobs, monkeypatch):
+    user_id = str(uuid.uuid4())
+    key = summary_key(user_id)
+
+    async def scenario():
+        service = _service(redis_client, monkeypatch)
+        await redis_client.hset(key, mapping=_entry("old summary", "gemini", 3600, -1))
+        first = await service.get_summary(user_id, time.monotonic() + 5)
+        second = await service.get_summary(user_id, time.monotonic() + 5)
+        return first, second, await jobs.depth(), await jobs.get(jobs.job_id(key))
+
+    first, second, depth, job = asyncio.run(scenario())
+    assert first["summary"] == second["summary"] == "old summary"
+    assert first["stale"] and first["cached"]
+    assert first["age_seconds"] >= 3599
+    # Both stale reads share one background refresh.
+    assert depth == 1
+    assert job["priority"] == str(BACKGROUND)
+    assert job["user_id"] == user_id
+
+
+def test_fallback_is_fresh_for_the_shorter_ttl(redis_client, monkeypatch):
+    key = summary_key(str(uuid.uuid4()))
+
+    async def scenario():
+        service = _service(redis_client, monkeypatch)
+        lock = RedisLock(key, 30, redis_client)
+        assert await lock.acquire()
+        fallback, _ = await service.store(lock, key, "fallback summary", "fallback")
+        gemini, _ = await service.store(lock, key, "gemini summary", "gemini")
+        return fallback, gemini
+
+    started = time.time()
+    fallback, gemini = asyncio.run(scenario())
+    fallback_ttl = float(fallback["fresh_until"]) - started
+    gemini_ttl = float(gemini["fresh_until"]) - started
+    assert settings.AI_SUMMARY_FALLBACK_FRESH_SECONDS <= fallback_ttl < settings.AI_SUMMARY_FALLBACK_FRESH_SECONDS + 5
+    assert settings.AI_SUMMARY_FRESH_SECONDS <= gemini_ttl < settings.AI_SUMMARY_FRESH_SECONDS + 5
+
+
+def test_refresh_that_only_gets_a_fallback_keeps_the_gemini_summary(redis_client, monkeypatch):
+    user_id = str(uuid.uuid4())
+    key = summary_key(user_id)
+    stale = _entry("older gemini summary", "gemini", 3600, -1)
+
+    async def scenario():
+        service = _service(redis_client, monkeypatch)
+        await redis_client.hset(key, mapping=stale)
+        response = await service._generate_once(user_id, key, time.monotonic() + 5)
+        return response, await redis_client.hgetall(key)
+
+    started = time.time()
+    response, entry = asyncio.run(scenario())
+    assert response["summary"] == entry["summary"] == "older gemini summary"
+    assert response["source"] == entry["source"] == "gemini"
+    assert entry["generated_at"] == stale["generated_at"]
+    # Fresh again, but only until the next retry after the fallback TTL.
+    assert is_fresh(entry)
+    assert float(entry["fresh_until"]) - started < settings.AI_SUMMARY_FALLBACK_FRESH_SECONDS + 5
@@ -0,0 +1,102 @@
+import asyncio
+import time
+import uuid
+from datetime import datetime, timezone
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.core.prompt_cache import prompt_cache
+from app.core.user_timezone import user_timezones
+from app.services.ai_summary_service import summary_key
+from app.services.gemini_service import GeminiService
+from app.services.summary_pregeneration_service import SummaryPregenerator, progress_key
+from tests.gemini_stub import StubGemini
+
+USERS = ["u1", "u2", "u3", "u4", "u5"]
+
+
+@pytest.fixture(autouse=True)
+def pregen_settings(monkeypatch):
+    monkeypatch.setattr(settings, "AI_PREGEN_BATCH_SIZE", 2)
+    monkeypatch.setattr(settings, "AI_PREGEN_CONCURRENCY", 1)
+    monkeypatch.setattr(settings, "AI_PREGEN_REQUESTS_PER_MINUTE", 6000)
+    # A 429 reaches the pre-generator instead of being retried inside GeminiService.
+    monkeypatch.setattr(settings, "GEMINI_MAX_RETRIES", 0)
+    # Users with identical stats render identical prompts; every user must reach the stub.
+    monkeypatch.setattr(prompt_cache, "enabled", False)
+    monkeypatch.setattr(user_timezones, "get", lambda _: asyncio.sleep(0, timezone.utc))
+
+
+def _week() -> str:
+    # Progress and summaries are keyed by week; a unique one keeps runs apart on a shared server.
+    return f"test-{uuid.uuid4()}"
+
+
+async def _run(mongo_db, redis_client, week: str, script: list[str], users: list[str], before=None):
+    """Seed activity for `users`, run the job against a stub Gemini; returns (progress, stub, seconds)."""
+    now = datetime.now(tz=timezone.utc)
+    today = datetime(now.year, now.month, now.day)
+    await mongo_db.daily_summaries.insert_many(
+        [{"user_id": user_id, "day": today, "total_sessions": 1, "mood_sum": 4} for user_id in users]
+    )
+    if before:
+        await before()
+
+    stub = StubGemini()
+    stub.script = list(script)
+    server = await asyncio.start_server(stub.handle, "127.0.0.1", 0)
+    base_url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+    client = httpx.AsyncClient(base_url=base_url, timeout=httpx.Timeout(None, connect=5))
+    try:
+        pregenerator = SummaryPregenerator(mongo_db, redis_client, GeminiService(api_key="stub", client=client))
+        started = time.monotonic()
+        progress = await pregenerator.run(week)
+        return progress, stub, time.monotonic() - started
+    finally:
+        await client.aclose()
+        server.close()
+        await server.wait_closed()
+
+
+def test_resumes_from_the_cursor_and_skips_gemini_summaries(mongo_db, redis_client):
+    week = _week()
+
+    async def interrupted_run():
+        # A previous run finished u1 and u2, and u4 already has a Gemini summary.
+        await redis_client.hset(progress_key(week), mapping={"status": "running", "cursor": "u2", "generated": 2})
+        await redis_client.hset(summary_key("u4", week), mapping={"summary": "earlier", "source": "gemini"})
+
+    async def scenario():
+        progress, stub, _ = await _run(mongo_db, redis_client, week, [], USERS, interrupted_run)
+        summaries = {user_id: await redis_client.hgetall(summary_key(user_id, week)) for user_id in USERS}
+        return progress, stub, summaries
+
+    progress, stub, summaries = asyncio.run(scenario())
+    assert progress["status"] == "done"
+    assert progress["cursor"] == "u5"
+    assert progress["generated"] == "4"
+    assert progress["skipped"] == "1"
+    assert stub.requests == 2
+    assert summaries["u1"] == summaries["u2"] == {}
+    assert summaries["u3"]["summary"] == summaries["u5"]["summary"] == "stub summary"
+    assert summaries["u4"] == {"summary": "earlier", "source": "gemini"}
+
+
+def test_429_pauses_the_quota(mongo_db, redis_client):
+    week = _week()
+
+    async def scenario():
+        progress, stub, elapsed = await _run(mongo_db, redis_client, week, ["429:1"], USERS[:3])
+        generated = [user_id for user_id in USERS[:3] if await redis_client.exists(summary_key(user_id, week))]
+        return progress, stub, elapsed, generated
+
+    progress, stub, elapsed, generated = asyncio.run(scenario())
+    assert progress["status"] == "done"
+    assert progress["failed"] == "1"
+    assert progress["generated"] == "2"
+    assert len(generated) == 2
+    assert stub.requests == 3
+    # The quota is 100 requests a second; only the Retry-After pause takes this long.
+    assert elapsed >= 1
@@ -0,0 +1,96 @@
+import asyncio
+import json
+import uuid
+
+import pytest
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.core import llm_queue
+from app.core.config import settings
+from app.core.llm_queue import LLMJobQueue
+from app.core.singleflight import RedisLock
+from app.services import ai_summary_service
+from app.services.ai_summary_service import AISummaryService, summary_key
+from app.services.gemini_service import GeminiService
+
+
+@pytest.fixture
+def jobs(redis_client, monkeypatch):
+    monkeypatch.setattr(llm_queue, "QUEUE_KEY", f"llm:queue:test:{uuid.uuid4()}")
+    queue = LLMJobQueue(redis_client)
+    monkeypatch.setattr(ai_summary_service, "llm_jobs", queue)
+    monkeypatch.setattr(settings, "AI_SUMMARY_DEADLINE_SECONDS", 1)
+    monkeypatch.setattr(settings, "LLM_QUEUE_POLL_SECONDS", 0.05)
+    # Every miss is deferred to the queue.
+    monkeypatch.setattr(settings, "LLM_QUEUE_DEFER_DEPTH", 0)
+    return queue
+
+
+def _service(redis_client) -> AISummaryService:
+    # Nothing here reaches Mongo or Gemini.
+    mongo = AsyncIOMotorClient("mongodb://127.0.0.1:1")["unused"]
+    return AISummaryService(mongo, redis_client, GeminiService(api_key="stub"))
+
+
+def _parse(event: str) -> tuple[str, dict]:
+    name, data = event.strip().split("\n")
+    return name.removeprefix("event: "), json.loads(data.removeprefix("data: "))
+
+
+async def _events(service: AISummaryService, user_id: str) -> list[tuple[str, dict]]:
+    return [_parse(event) async for event in service.stream_summary(user_id)]
+
+
+def test_queued_summary_is_pending_then_relayed(redis_client, jobs):
+    user_id = str(uuid.uuid4())
+    done = {"summary": "queued summary", "source": "gemini", "cached": False}
+
+    async def consumer():
+        # The queue consumer in another worker.
+        while not (popped := await jobs.pop()):
+            pass
+        await jobs.finish(popped[0], "done", result=json.dumps(done))
+
+    async def scenario():
+        service = _service(redis_client)
+        # Another caller is generating this summary.
+        assert await RedisLock(summary_key(user_id), 30, redis_client).acquire()
+        events, _ = await asyncio.gather(_events(service, user_id), consumer())
+        return events
+
+    events = asyncio.run(scenario())
+    assert [name for name, _ in events] == ["pending", "summary"]
+    assert events[0][1]["status"] in ("queued", "running")
+    assert events[1][1] == done
+
+
+def test_job_still_queued_at_the_deadline_ends_after_pending(redis_client, jobs, monkeypatch):
+    monkeypatch.setattr(settings, "AI_SUMMARY_DEADLINE_SECONDS", 0.3)
+    user_id = str(uuid.uuid4())
+
+    async def scenario():
+        assert await RedisLock(summary_key(user_id), 30, redis_client).acquire()
+        return await _events(_service(redis_client), user_id)
+
+    events = asyncio.run(scenario())
+    assert [name for name, _ in events] == ["pending"]
+    assert "job_id" in events[0][1]
+
+
+def test_failure_after_the_stream_started_still_ends_with_a_summary(redis_client, monkeypatch):
+    user_id = str(uuid.uuid4())
+
+    async def broken_weekly_data(_):
+        raise ConnectionError("mongo down")
+
+    async def scenario():
+        service = _service(redis_client)
+        monkeypatch.setattr(service, "weekly_data", broken_weekly_data)
+        events = await _events(service, user_id)
+        return events, await redis_client.exists(summary_key(user_id))
+
+    events, cached = asyncio.run(scenario())
+    assert [name for name, _ in events] == ["summary"]
+    assert events[0][1]["source"] == "fallback"
+    assert events[0][1]["cached"] is False
+    assert not cached